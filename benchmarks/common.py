@@ -0,0 +1,61 @@
+"""
+Helpers shared by the benchmark scripts in this directory.
+
+The scripts are run directly, e.g. ``python benchmarks/index_plans.py``, and
+never touch the development database: each one points Django at its own
+SQLite file before setting it up.
+"""
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_path=None, throttling=False):
+    """
+    Configure Django with ``core.settings``, optionally using ``db_path`` as
+    the default database. Request throttles are off unless ``throttling`` is
+    true, since benchmarks repeat the same request far above their rates.
+    """
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+    import django
+    from django.conf import settings
+
+    if db_path is not None:
+        settings.DATABASES['default']['NAME'] = str(db_path)
+    if not throttling:
+        settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {}
+    django.setup()
+
+
+def timed(func, repeat):
+    """
+    Call ``func`` ``repeat`` times and return latency percentiles in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    samples = sorted(samples)
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(percentile(50), 3),
+        'p95_ms': round(percentile(95), 3),
+        'p99_ms': round(percentile(99), 3),
+    }
@@ -0,0 +1,321 @@
+"""
+Latency percentiles, queries per request and response size of every endpoint
+in ``projects/urls.py`` and ``users/urls.py``, against a dataset generated
+by ``seed_scale``::
+
+    python benchmarks/endpoints.py
+    python benchmarks/endpoints.py --projects 5000 --comments 200 --json before.json
+    python benchmarks/endpoints.py --json after.json --compare before.json
+
+Requests go through Django's test client (the full WSGI middleware stack,
+no network) as the most popular seeded user, against the project of theirs
+with the most comments. Writes are undone or prepared between timed
+requests, so every request of an endpoint does the same work. The run fails
+if an endpoint has no scenario below, so new endpoints get measured too.
+
+The JSON output records the git commit, so results can be compared across
+commits; ``--compare`` prints the change against an earlier file.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import timedelta
+from itertools import count
+from pathlib import Path
+
+from common import BASE_DIR, setup_django, summarize
+
+PASSWORD = 'password'
+BULK_USERS = 10
+SEARCH_TERM = 'release'
+
+
+class Scenario:
+    """
+    One endpoint: a method, a URL name with its arguments, and an optional
+    request body. ``setup`` runs untimed before every request and may return
+    URL arguments that vary per request; ``body`` may be a callable too.
+    """
+
+    def __init__(self, url_name, method, args=(), query='', body=None, setup=None, status=200,
+                 client='user', slow=False, label=None):
+        self.url_name = url_name
+        self.method = method
+        self.args = args
+        self.query = query
+        self.body = body
+        self.setup = setup
+        self.status = status
+        self.client = client
+        # Hashes a password; run fewer times
+        self.slow = slow
+        self.label = label or f'{method} {url_name}'
+
+
+def build_scenarios(ctx):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from projects.changes import encode_token
+    from projects.models import Project, ProjectUser
+
+    project = ctx.project
+    target = ctx.targets[0]
+    bulk_targets = ctx.targets[1:1 + BULK_USERS]
+    serial = count()
+
+    def without(*users):
+        def setup():
+            ProjectUser.objects.filter(project=project, user__in=users).delete()
+        return setup
+
+    def with_members(*users):
+        def setup():
+            for user in users:
+                ProjectUser.objects.get_or_create(project=project, user=user, defaults={'role': ProjectUser.READER})
+        return setup
+
+    def new_project():
+        created = Project.objects.create(title='Disposable', description='Deleted by the benchmark')
+        ProjectUser.objects.create(project=created, user=ctx.user, role=ProjectUser.OWNER)
+        return (created.pk,)
+
+    def alternate_role():
+        return {'role': ProjectUser.EDITOR if next(serial) % 2 else ProjectUser.READER}
+
+    def bulk_roles():
+        return {'users': [u.username for u in bulk_targets], **alternate_role()}
+
+    def login_client():
+        ctx.clients['session'].force_login(ctx.user)
+
+    def cleanup_registered():
+        User.objects.filter(username__startswith='registered').delete()
+
+    pk = (project.pk,)
+    return [
+        Scenario('project-list', 'GET'),
+        Scenario('project-list', 'GET', query='ordering=activity', label='GET project-list?ordering=activity'),
+        Scenario('project-list', 'POST', body={'title': 'Benchmark project', 'description': 'Created'}, status=201),
+        Scenario('project-search', 'GET', query=f'q={SEARCH_TERM}'),
+        Scenario('project-changes', 'GET'),
+        Scenario('project-changes', 'GET', query=f'since={encode_token(timezone.now() - timedelta(minutes=5))}',
+                 label='GET project-changes?since=<5 minutes ago>'),
+        Scenario('project-detail', 'GET', pk),
+        Scenario('project-detail', 'PUT', pk, body={'title': project.title, 'description': project.description}),
+        Scenario('project-detail', 'PATCH', pk, body={'title': project.title}),
+        Scenario('project-detail', 'DELETE', setup=new_project, status=204),
+        Scenario('project-overview', 'GET', pk),
+        Scenario('project-users', 'GET', pk),
+        Scenario('project-comments', 'GET', pk),
+        Scenario('project-export', 'GET', pk),
+        Scenario('project-add-comment', 'POST', pk, body={'text': 'A comment from the benchmark'}, status=201),
+        Scenario('project-add-user', 'POST', pk, body={'username': target.username, 'role': ProjectUser.READER},
+                 setup=without(target), status=201),
+        Scenario('project-remove-user', 'DELETE', (project.pk, target.pk), setup=with_members(target), status=204),
+        Scenario('project-update-role', 'PATCH', (project.pk, target.pk), body=alternate_role,
+                 setup=with_members(target)),
+        Scenario('project-bulk-add-users', 'POST', pk, body={'users': [u.username for u in bulk_targets]},
+                 setup=without(*bulk_targets)),
+        Scenario('project-bulk-update-roles', 'POST', pk, body=bulk_roles, setup=with_members(*bulk_targets)),
+        Scenario('project-bulk-remove-users', 'POST', pk, body={'users': [u.username for u in bulk_targets]},
+                 setup=with_members(*bulk_targets)),
+        Scenario('register', 'POST', client='anonymous', status=201, slow=True, body=lambda: {
+            'username': f'registered{next(serial)}', 'email': 'registered@example.com',
+            'password': 'a-long-password-1', 'password2': 'a-long-password-1',
+            'first_name': 'Registered', 'last_name': 'User',
+        }),
+        Scenario('login', 'POST', client='anonymous', slow=True,
+                 body={'username': ctx.user.username, 'password': PASSWORD}),
+        Scenario('logout', 'POST', client='session', setup=login_client),
+        Scenario('user-detail', 'GET'),
+        Scenario('user-list', 'GET', query=f'username={target.username}'),
+    ], cleanup_registered
+
+
+def url_endpoints():
+    """Every reachable (URL name, method) of projects/urls.py and users/urls.py."""
+    from django.urls import URLResolver
+
+    import projects.urls
+    import users.urls
+
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns, prefix + str(pattern.pattern))
+            else:
+                yield prefix + str(pattern.pattern), pattern
+
+    endpoints = set()
+    for module in (projects.urls, users.urls):
+        seen = set()
+        for route, pattern in walk(module.urlpatterns, ''):
+            # Skip the format-suffix variants and routes shadowed by an
+            # earlier identical one (the router's api-root)
+            if '(?P<format>' in route or route in seen:
+                continue
+            seen.add(route)
+            actions = getattr(pattern.callback, 'actions', None)
+            if actions is None:
+                view_class = pattern.callback.view_class
+                actions = [m for m in ('get', 'post', 'put', 'patch', 'delete') if hasattr(view_class, m)]
+            endpoints.update((pattern.name, method.upper()) for method in actions)
+    return endpoints
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {'commit': revision, 'dirty': dirty}
+
+
+def measure(scenario, client, repeat, warmup):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    latencies, queries, sizes, errors = [], [], [], 0
+    for i in range(warmup + repeat):
+        args = scenario.args
+        if scenario.setup is not None:
+            args = scenario.setup() or args
+        body = scenario.body() if callable(scenario.body) else scenario.body
+        path = reverse(scenario.url_name, args=args)
+        if scenario.query:
+            path += '?' + scenario.query
+        payload = json.dumps(body) if body is not None else ''
+
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.generic(scenario.method, path, payload, content_type='application/json')
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            elapsed = (time.perf_counter() - start) * 1000
+
+        if i < warmup:
+            continue
+        if response.status_code != scenario.status:
+            errors += 1
+            continue
+        latencies.append(elapsed)
+        queries.append(len(captured))
+        sizes.append(size)
+
+    result = {'method': scenario.method, 'url_name': scenario.url_name, 'status': scenario.status, 'errors': errors}
+    if latencies:
+        result.update(summarize(latencies))
+        result['queries'] = round(sum(queries) / len(queries), 2)
+        result['bytes'] = round(sum(sizes) / len(sizes))
+    return result
+
+
+def print_results(results, baseline=None):
+    header = f"{'endpoint':<42} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'bytes':>9}"
+    print(header)
+    print('-' * len(header))
+    for label, result in results.items():
+        if 'p50_ms' not in result:
+            print(f"{label:<42} failed: {result['errors']} error(s)")
+            continue
+        line = (f"{label:<42} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                f"{result['queries']:>8g} {result['bytes']:>9}")
+        before = (baseline or {}).get(label)
+        if before and 'p50_ms' in before:
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            line += f"   p50 {change:+.0f}%  queries {result['queries'] - before['queries']:+g}"
+        if result['errors']:
+            line += f"   ({result['errors']} error(s))"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--projects', type=int, default=1000)
+    parser.add_argument('--members', type=int, default=15, help='average members per project')
+    parser.add_argument('--comments', type=int, default=100, help='average comments per project')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per endpoint')
+    parser.add_argument('--slow-requests', type=int, default=10, help='timed requests of register and login')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', nargs='+', help='only run the endpoints whose label contains one of these')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='print the change against an earlier --json file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3')
+        import django
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django.db.models import Count
+        from django.test import Client
+
+        from projects.models import Project, ProjectUser
+        from projects.seed import Seeder
+
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = ['testserver']
+        call_command('migrate', verbosity=0)
+        started = time.perf_counter()
+        dataset = Seeder(args.users, args.projects, args.members, args.comments, seed=args.seed,
+                         password=PASSWORD).run()
+        print(f'Seeded {dataset} in {time.perf_counter() - started:.1f}s\n')
+
+        # The busiest user, their busiest project, and users outside it
+        user = User.objects.annotate(n=Count('projectuser')).order_by('-n', 'pk').first()
+        project = Project.objects.filter(projectuser__user=user, projectuser__role=ProjectUser.OWNER) \
+            .order_by('-comment_count', 'pk').first()
+        targets = list(User.objects.exclude(projectuser__project=project).order_by('pk')[:1 + BULK_USERS])
+        if project is None or len(targets) < 1 + BULK_USERS:
+            parser.error('the dataset is too small: raise --users or --projects')
+
+        clients = {name: Client(HTTP_ACCEPT='application/json') for name in ('user', 'anonymous', 'session')}
+        clients['user'].force_login(user)
+        ctx = type('Context', (), {'user': user, 'project': project, 'targets': targets, 'clients': clients})
+        scenarios, cleanup = build_scenarios(ctx)
+
+        missing = url_endpoints() - {(s.url_name, s.method) for s in scenarios}
+        if missing:
+            parser.error('no scenario for ' + ', '.join(f'{m} {n}' for n, m in sorted(missing)))
+
+        results = {}
+        for scenario in scenarios:
+            if args.only and not any(part in scenario.label for part in args.only):
+                continue
+            repeat = args.slow_requests if scenario.slow else args.requests
+            results[scenario.label] = measure(scenario, clients[scenario.client], repeat, args.warmup)
+        cleanup()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.json:
+        meta = {
+            'git': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'args': vars(args),
+            'dataset': dataset,
+        }
+        with open(args.json, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Peak Python memory while exporting a project as NDJSON, for growing numbers
+of comments. A flat peak means the export streams rather than buffering::
+
+    python benchmarks/export_memory.py
+    python benchmarks/export_memory.py --comments 100000 1000000
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from common import setup_django
+
+
+def seed(connection, project_id, comments):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous = OFF')
+        cursor.execute(
+            'INSERT INTO projects_project (id, title, description, created_at, updated_at, comment_count, '
+            "last_activity_at) VALUES (%s, 'Bench', 'Seeded project', '2024-01-01 00:00:00', "
+            "'2024-01-01 00:00:00', 0, '2024-01-01 00:00:00')",
+            [project_id],
+        )
+        cursor.executemany(
+            'INSERT INTO projects_comment (text, created_at, project_id, user_id) VALUES (%s, %s, %s, 1)',
+            ((f'Seeded comment number {i} with a little text', f'2024-01-01 00:00:{i % 60:02d}.{i:06d}', project_id)
+             for i in range(comments)),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, nargs='+', default=[10000, 100000, 500000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3')
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django.db import connection
+
+        from projects.export import export_blocks
+        from projects.models import Project
+
+        call_command('migrate', verbosity=0)
+        User.objects.create(id=1, username='bench')
+
+        for project_id, comments in enumerate(args.comments, start=1):
+            seed(connection, project_id, comments)
+            project = Project.objects.get(pk=project_id)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            size = sum(len(block) for block in export_blocks(project))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'{comments:>9} comments: {size / 2**20:8.1f} MiB exported in {elapsed:6.2f} s, '
+                  f'peak {peak / 2**20:6.2f} MiB')
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Rows per second written by the ``import_projects`` command, at a few batch
+sizes::
+
+    python benchmarks/import_throughput.py
+    python benchmarks/import_throughput.py --projects 200 --comments 2000 --batch-size 1000 5000 20000
+
+Each run imports the same generated NDJSON into a fresh SQLite database.
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from common import setup_django
+
+WORDS = 'alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu'.split()
+
+
+def write_input(path, projects, members, comments):
+    with open(path, 'w') as f:
+        for p in range(projects):
+            f.write(json.dumps({'type': 'export', 'version': 1}) + '\n')
+            f.write(json.dumps({
+                'type': 'project', 'id': p, 'title': f'Project {p}', 'description': 'Imported project',
+                'created_at': '2024-01-01T00:00:00Z', 'updated_at': '2024-01-01T00:00:00Z',
+            }) + '\n')
+            for m in range(members):
+                f.write(json.dumps({
+                    'type': 'member', 'user': {'username': f'user{m}', 'email': f'user{m}@example.com'},
+                    'role': 'owner' if m == 0 else 'reader', 'created_at': '2024-01-01T00:00:00Z',
+                }) + '\n')
+            for c in range(comments):
+                text = ' '.join(WORDS[(c + i) % len(WORDS)] for i in range(8))
+                f.write(json.dumps({
+                    'type': 'comment', 'id': c, 'user': {'username': f'user{c % members}'}, 'text': text,
+                    'created_at': f'2024-01-02T00:00:{c % 60:02d}Z',
+                }) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projects', type=int, default=100)
+    parser.add_argument('--members', type=int, default=20, help='members per project')
+    parser.add_argument('--comments', type=int, default=1000, help='comments per project')
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1000, 5000, 20000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        source = tmp / 'input.ndjson'
+        write_input(source, args.projects, args.members, args.comments)
+        rows = args.projects * (1 + args.members + args.comments)
+        print(f'{rows} rows, {source.stat().st_size / 2**20:.1f} MiB')
+
+        setup_django(tmp / 'bench.sqlite3')
+        from django.core.management import call_command
+        from django.db import connection
+
+        from projects.importer import ProjectImporter
+
+        call_command('migrate', verbosity=0)
+        for batch_size in args.batch_size:
+            with connection.cursor() as cursor:
+                for table in ('projects_comment', 'projects_projectuser', 'projects_project', 'projects_search'):
+                    cursor.execute(f'DELETE FROM {table}')
+
+            importer = ProjectImporter(batch_size=batch_size, create_users=True)
+            start = time.perf_counter()
+            with open(source) as lines:
+                stats = importer.run(lines)
+            elapsed = time.perf_counter() - start
+            written = stats['projects'] + stats['members'] + stats['comments']
+            print(f'batch {batch_size:>6}: {elapsed:6.2f} s  {written / elapsed:>9,.0f} rows/s  '
+                  f'{written / elapsed * 60:>12,.0f} rows/min')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Query plans and latencies for the hot project queries, before and after the
+access-pattern indexes added in projects migration 0004.
+
+Seeds a throwaway SQLite database (about 1M comments and 100k memberships by
+default), migrates it to 0003, measures, applies 0004 and measures again::
+
+    python benchmarks/index_plans.py
+    python benchmarks/index_plans.py --comments 100000 --memberships 20000 --json plans.json
+"""
+import argparse
+import json
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from common import setup_django, timed
+
+BEFORE = '0003_projectuser_updated_at'
+AFTER = '0004_add_access_pattern_indexes'
+MEMBERS_PER_PROJECT = 10
+# The projects_project columns at BEFORE
+PROJECT_COLUMNS = ('id', 'title', 'description', 'created_at', 'updated_at')
+
+
+def seed(connection, users, memberships, comments, heavy_user_projects):
+    rng = random.Random(42)
+    projects = max(1, memberships // MEMBERS_PER_PROJECT)
+    start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def ts(seconds):
+        return (start + timedelta(seconds=seconds)).isoformat(sep=' ')
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous = OFF')
+        cursor.executemany(
+            'INSERT INTO auth_user (id, password, is_superuser, username, first_name, last_name, email, '
+            'is_staff, is_active, date_joined) VALUES (?, "", 0, ?, "Bench", "User", "", 0, 1, ?)',
+            ((i, f'user{i}', ts(i)) for i in range(1, users + 1)),
+        )
+        cursor.executemany(
+            'INSERT INTO projects_project (id, title, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+            ((i, f'Project {i}', 'Seeded project', ts(i), ts(i)) for i in range(1, projects + 1)),
+        )
+
+        # One owner and readers/editors per project; user 1 is in many projects
+        rows = []
+        for project_id in range(1, projects + 1):
+            members = rng.sample(range(2, users + 1), MEMBERS_PER_PROJECT)
+            if project_id <= heavy_user_projects:
+                members[-1] = 1
+            for position, user_id in enumerate(members):
+                role = 'owner' if position == 0 else rng.choice(['editor', 'reader', 'reader'])
+                rows.append((role, ts(project_id), ts(project_id), project_id, user_id))
+        cursor.executemany(
+            'INSERT INTO projects_projectuser (role, created_at, updated_at, project_id, user_id) VALUES (?, ?, ?, ?, ?)',
+            rows,
+        )
+
+        # Project 1 is "hot" and gets a tenth of all comments
+        def comment_rows():
+            for i in range(comments):
+                project_id = 1 if i % 10 == 0 else rng.randint(1, projects)
+                yield ('Seeded comment', ts(i), project_id, rng.randint(1, users))
+        cursor.executemany(
+            'INSERT INTO projects_comment (text, created_at, project_id, user_id) VALUES (?, ?, ?, ?)',
+            comment_rows(),
+        )
+    return projects
+
+
+def build_queries():
+    from django.db.models import Count, Max
+
+    from projects.conditional import _with_owner_membership
+    from projects.models import Comment, Project, ProjectUser
+    from projects.pagination import KeysetPagination
+
+    keyset = KeysetPagination()
+    user_id, hot_project = 1, 1
+    role_map = dict(ProjectUser.objects.filter(user_id=user_id).values_list('project_id', 'role'))
+    project_ids = list(role_map)
+    middle = Comment.objects.filter(project_id=hot_project).order_by('created_at', 'id').values_list(
+        'created_at', 'id'
+    )[Comment.objects.filter(project_id=hot_project).count() // 2]
+
+    return {
+        'permission: role map for a user': ProjectUser.objects.filter(user_id=user_id).values_list('project_id', 'role'),
+        # Only columns that exist at 0003: the measured queries must not
+        # depend on later migrations
+        'list: first page of projects': Project.objects.filter(pk__in=project_ids).order_by('created_at', 'id').values(
+            *PROJECT_COLUMNS
+        )[:51],
+        'list: owner prefetch': ProjectUser.objects.filter(
+            project_id__in=project_ids[:50], role=ProjectUser.OWNER
+        ).select_related('user'),
+        'list: owner validator': _with_owner_membership(Project.objects.filter(pk__in=project_ids)).values(
+            'owner_membership__updated_at'
+        ),
+        'retrieve: owner lookup': ProjectUser.objects.filter(project_id=hot_project, role=ProjectUser.OWNER),
+        'members: first page': ProjectUser.objects.filter(project_id=hot_project).select_related('user').order_by(
+            'created_at', 'id'
+        )[:51],
+        'comments: first page': Comment.objects.filter(project_id=hot_project).select_related('user').order_by(
+            'created_at', 'id'
+        )[:51],
+        'comments: page from the middle': Comment.objects.filter(project_id=hot_project).filter(
+            keyset.get_keyset_filter(list(middle))
+        ).select_related('user').order_by('created_at', 'id')[:51],
+        'comments: validator': Comment.objects.filter(project_id=hot_project).values('project').annotate(
+            count=Count('id'), last=Max('id'), created=Max('created_at')
+        ),
+    }
+
+
+def measure(connection, repeat):
+    results = {}
+    for name, queryset in build_queries().items():
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        results[name] = {'plan': plan, 'latency': timed(lambda: list(queryset.all()), repeat)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--memberships', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=1000000)
+    parser.add_argument('--heavy-user-projects', type=int, default=2000,
+                        help='number of projects the measured user belongs to')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3')
+        from django.core.management import call_command
+        from django.db import connection
+
+        call_command('migrate', 'projects', BEFORE, verbosity=0)
+        call_command('migrate', 'auth', verbosity=0)
+        print(f'Seeding {args.users} users, {args.memberships} memberships, {args.comments} comments...')
+        seed(connection, args.users, args.memberships, args.comments, args.heavy_user_projects)
+
+        before = measure(connection, args.repeat)
+        call_command('migrate', 'projects', AFTER, verbosity=0)
+        after = measure(connection, args.repeat)
+        connection.close()
+
+    report = {name: {'before': before[name], 'after': after[name]} for name in before}
+    for name, result in report.items():
+        print(f'\n{name}')
+        for phase in ('before', 'after'):
+            latency = result[phase]['latency']
+            print(f"  {phase:>6}: p50 {latency['p50_ms']:>9.3f} ms  p95 {latency['p95_ms']:>9.3f} ms")
+            for step in result[phase]['plan']:
+                print(f'          {step}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': report}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
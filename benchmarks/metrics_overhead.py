@@ -0,0 +1,108 @@
+"""
+Per-request cost of ``core.middleware.MetricsMiddleware``::
+
+    python benchmarks/metrics_overhead.py
+    python benchmarks/metrics_overhead.py --requests 5000 --budget-us 50
+
+Two measurements:
+
+* the middleware alone, wrapped around a view that returns at once, with
+  a query recorded per request, against the same loop without it;
+* a real endpoint (``GET /api/auth/me/``, two queries) through the test
+  client, with and without the middleware in ``MIDDLEWARE``.
+
+Exits with status 1 if the middleware alone costs more than ``--budget-us``
+microseconds per request.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import setup_django, summarize
+
+
+def isolated_overhead(iterations):
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from core import metrics
+    from core.middleware import MetricsMiddleware
+
+    response = HttpResponse(b'{"id":1}', content_type='application/json')
+
+    def view(request):
+        # What the query recorder adds to one query
+        metrics.record_query(lambda *args: None, 'SELECT 1', (), False, {})
+        return response
+
+    request = RequestFactory().get('/api/projects/')
+    request.resolver_match = resolve('/api/projects/')
+    middleware = MetricsMiddleware(view)
+
+    def per_call(func):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func(request)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    per_call(middleware)
+    bare, wrapped = min(per_call(view) for _ in range(3)), min(per_call(middleware) for _ in range(3))
+    metrics.registry.clear()
+    return wrapped - bare
+
+
+def endpoint_latency(requests, with_metrics):
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    middleware = [m for m in settings.MIDDLEWARE if m != 'core.middleware.MetricsMiddleware']
+    settings.MIDDLEWARE = (['core.middleware.MetricsMiddleware'] if with_metrics else []) + middleware
+
+    client = Client(HTTP_ACCEPT='application/json')
+    client.force_login(User.objects.get(username='bench'))
+    for _ in range(50):
+        client.get('/api/auth/me/')
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get('/api/auth/me/')
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100000, help='calls of the isolated middleware')
+    parser.add_argument('--requests', type=int, default=2000, help='requests to the real endpoint')
+    parser.add_argument('--budget-us', type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3')
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = ['testserver']
+        call_command('migrate', verbosity=0)
+        User.objects.create_user('bench', password='password')
+
+        overhead = isolated_overhead(args.iterations)
+        print(f'middleware alone: {overhead:.1f} us per request (budget {args.budget_us:g} us)')
+        for with_metrics in (False, True):
+            latency = endpoint_latency(args.requests, with_metrics)
+            print(f"GET /api/auth/me/ {'with' if with_metrics else 'without'} metrics: "
+                  f"mean {latency['mean_ms'] * 1000:.0f} us  p50 {latency['p50_ms'] * 1000:.0f} us  "
+                  f"p99 {latency['p99_ms'] * 1000:.0f} us")
+
+    if overhead > args.budget_us:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Latency of the full-text project search (``GET /api/projects/search/``)
+over a large seeded index, for rare, common and prefix queries::
+
+    python benchmarks/search.py
+    python benchmarks/search.py --comments 200000 --json search.json
+"""
+import argparse
+import json
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from common import setup_django, timed
+
+WORDS = [
+    'alpha', 'budget', 'customer', 'deadline', 'estimate', 'feature', 'release', 'review', 'sprint',
+    'testing', 'design', 'deploy', 'invoice', 'meeting', 'roadmap', 'backlog', 'migration', 'server',
+]
+# Filler vocabulary; word frequencies follow a Zipf-like curve as in real text
+FILLER = [f'word{i}' for i in range(5000)]
+FILLER_WEIGHTS = [1 / (rank + 1) for rank in range(len(FILLER))]
+
+
+def seed(connection, users, projects, comments, member_projects):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def ts(seconds):
+        return (start + timedelta(seconds=seconds)).isoformat(sep=' ')
+
+    def text(words):
+        # Roughly one word in six is a project-management term
+        filler = rng.choices(FILLER, FILLER_WEIGHTS, k=words)
+        return ' '.join(rng.choice(WORDS) if rng.random() < 1 / 6 else word for word in filler)
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous = OFF')
+        cursor.executemany(
+            'INSERT INTO auth_user (id, password, is_superuser, username, first_name, last_name, email, '
+            'is_staff, is_active, date_joined) VALUES (?, "", 0, ?, "Bench", "User", "", 0, 1, ?)',
+            ((i, f'user{i}', ts(i)) for i in range(1, users + 1)),
+        )
+        cursor.executemany(
+            'INSERT INTO projects_project (id, title, description, created_at, updated_at, comment_count, '
+            'last_activity_at) VALUES (?, ?, ?, ?, ?, 0, ?)',
+            ((i, f'Project {i} {text(2)}', text(20), ts(i), ts(i), ts(i)) for i in range(1, projects + 1)),
+        )
+        # User 1 belongs to the first `member_projects` projects
+        cursor.executemany(
+            'INSERT INTO projects_projectuser (role, created_at, updated_at, project_id, user_id) '
+            'VALUES ("reader", ?, ?, ?, 1)',
+            ((ts(i), ts(i), i) for i in range(1, member_projects + 1)),
+        )
+
+        def comment_rows():
+            for i in range(comments):
+                words = text(12)
+                if i % 50000 == 0:
+                    words += ' zeppelin'
+                yield (words, ts(i), rng.randint(1, projects), rng.randint(1, users))
+        cursor.executemany(
+            'INSERT INTO projects_comment (text, created_at, project_id, user_id) VALUES (?, ?, ?, ?)',
+            comment_rows(),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--projects', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=1000000)
+    parser.add_argument('--member-projects', type=int, default=500,
+                        help='number of projects the searching user belongs to')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    queries = {
+        'rare word': 'zeppelin',
+        'common word': 'deadline',
+        'two words': 'customer invoice',
+        'prefix': 'migr',
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3')
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django.db import connection
+
+        from projects import search
+
+        call_command('migrate', verbosity=0)
+        print(f'Seeding {args.projects} projects and {args.comments} comments...')
+        seed(connection, args.users, args.projects, args.comments, args.member_projects)
+        call_command('rebuild_search_index', verbosity=0)
+
+        user = User.objects.get(pk=1)
+        results = {
+            name: timed(lambda q=q: search.search(user, q, 20), args.repeat)
+            for name, q in queries.items()
+        }
+        connection.close()
+
+    for name, latency in results.items():
+        print(f"{name:>12}: p50 {latency['p50_ms']:>9.3f} ms  p95 {latency['p95_ms']:>9.3f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Time to turn many projects and comments into JSON, through the DRF
+serializers and ``JSONRenderer`` versus ``projects.representations`` and
+``core.renderers.FastJSONRenderer``::
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --projects 10000 --comments 100000 --repeat 5
+
+Both paths start from the database, so fetching (model instances versus
+``values()`` rows), building the data and rendering it are timed
+separately. The run fails if the two paths produce different bytes.
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import setup_django
+
+
+def timed(func, repeat):
+    # Best of ``repeat`` runs, in milliseconds, and the last result
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best, result
+
+
+def compare(name, fetch, build, render, fast_fetch, fast_build, fast_render, repeat):
+    results = {}
+    for path, steps in (('serializers', (fetch, build, render)), ('representations', (fast_fetch, fast_build, fast_render))):
+        fetch_ms, rows = timed(steps[0], repeat)
+        build_ms, data = timed(lambda: steps[1](rows), repeat)
+        render_ms, content = timed(lambda: steps[2](data), repeat)
+        results[path] = content
+        total = fetch_ms + build_ms + render_ms
+        print(f'{name:<9} {path:<16} fetch {fetch_ms:>8.1f} ms  build {build_ms:>8.1f} ms  '
+              f'render {render_ms:>7.1f} ms  total {total:>8.1f} ms  ({len(content) / 2**20:.1f} MiB)')
+    return results['serializers'] == results['representations']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projects', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=100000, help='comments in total')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per step; the best one is reported')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3')
+        from django.core.management import call_command
+        from django.test import RequestFactory
+        from rest_framework.renderers import JSONRenderer
+
+        from core.renderers import FastJSONRenderer
+        from projects import representations
+        from projects.models import Comment, Project, ProjectUser
+        from projects.seed import Seeder, _sentence
+        from projects.serializers import CommentSerializer, ProjectSerializer
+
+        call_command('migrate', verbosity=0)
+        # The seeder draws each project's number of comments at random; write
+        # exactly --comments of them instead, spread over the projects
+        Seeder(users=max(args.projects // 10, 10), projects=args.projects, members=3, comments=0).run()
+        owners = list(ProjectUser.objects.filter(role=ProjectUser.OWNER).order_by('project_id')
+                      .values_list('project_id', 'user_id'))
+        rng = random.Random(0)
+        Comment.objects.bulk_create(
+            (Comment(project_id=project_id, user_id=user_id, text=_sentence(rng, 30)[:300])
+             for project_id, user_id in (owners[n % len(owners)] for n in range(args.comments))),
+            batch_size=5000,
+        )
+        Project.objects.rebuild_activity()
+        print(f'{Project.objects.count()} projects, {Comment.objects.count()} comments\n')
+
+        request = RequestFactory().get('/api/projects/')
+        # The role map ProjectSerializer.get_role() reads, as a request would have it
+        request._project_roles = roles = dict.fromkeys(Project.objects.values_list('id', flat=True), 'reader')
+        projects = Project.objects.order_by('id')
+        comments = Comment.objects.order_by('id')
+
+        same = compare(
+            'projects',
+            lambda: list(projects.with_owner()),
+            lambda rows: ProjectSerializer(rows, many=True, context={'request': request}).data,
+            JSONRenderer().render,
+            lambda: (list(projects.values(*representations.project_columns())),
+                     list(representations.owner_rows(list(roles)))),
+            lambda rows: representations.projects(*rows, roles),
+            FastJSONRenderer().render,
+            args.repeat,
+        )
+        same &= compare(
+            'comments',
+            lambda: list(comments.select_related('user')),
+            lambda rows: CommentSerializer(rows, many=True).data,
+            JSONRenderer().render,
+            lambda: list(comments.values(*representations.comment_columns())),
+            representations.comments,
+            FastJSONRenderer().render,
+            args.repeat,
+        )
+
+    print('\nidentical output' if same else '\nOUTPUT DIFFERS')
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
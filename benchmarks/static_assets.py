@@ -0,0 +1,61 @@
+"""
+Bytes sent for the SPA's assets before and after ``collectstatic``, and the
+cost of serving one through ``core.static``::
+
+    python benchmarks/static_assets.py
+    python benchmarks/static_assets.py --requests 5000
+
+Collects the static files into a temporary ``STATIC_ROOT`` and reports, for
+every file the index page loads, its size and the size of its gzip and
+brotli copies (brotli only when the ``brotli`` package is installed). Then
+times requests for the hashed ``js/main.js`` with and without
+``Accept-Encoding``.
+"""
+import argparse
+import json
+import re
+import tempfile
+from pathlib import Path
+
+from common import setup_django, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        setup_django()
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.test import Client
+
+        settings.STATIC_ROOT = str(root)
+        # {% static %} only uses the hashed names outside DEBUG
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = ['testserver']
+        call_command('collectstatic', interactive=False, verbosity=0)
+        paths = json.loads((root / 'staticfiles.json').read_text())['paths']
+
+        client = Client()
+        index = client.get('/').content.decode()
+        print(f'{"file":<40} {"bytes":>8} {"gzip":>8} {"brotli":>8}')
+        for url in re.findall(rf'{settings.STATIC_URL}[^"]+', index):
+            name = url[len(settings.STATIC_URL):]
+            sizes = [root / name, root / f'{name}.gz', root / f'{name}.br']
+            print(f'{name:<40} ' + ' '.join(f'{path.stat().st_size if path.exists() else "-":>8}' for path in sizes))
+
+        url = f'{settings.STATIC_URL}{paths["js/main.js"]}'
+        print()
+        for label, headers in (('identity', {}), ('gzip, br', {'Accept-Encoding': 'gzip, br'})):
+            def request():
+                response = client.get(url, headers=headers)
+                b''.join(response.streaming_content)
+                response.close()
+            print(f'GET main.js ({label}): {timed(request, args.requests)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Cost of one throttle check of ``core.throttling``::
+
+    python benchmarks/throttle_overhead.py
+    python benchmarks/throttle_overhead.py --checks 200000 --keys 10000 --budget-us 20
+
+Times ``allow_request()`` of the per-address and per-user throttles, as
+``LoginView`` runs them, for in-memory buckets and for buckets in Django's
+local-memory cache (the ``THROTTLE_CACHE`` path, without network round
+trips). Requests rotate over ``--keys`` client addresses and usernames.
+For scale, it also times one ``authenticate()`` call, the password hash a
+login attempt costs.
+
+Exits with status 1 if an in-memory check costs more than ``--budget-us``
+microseconds.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import setup_django
+
+
+def check_cost(buckets, anonymous_buckets, checks, keys):
+    from rest_framework.parsers import JSONParser
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from core import throttling
+    from users.views import LoginView
+
+    factory = APIRequestFactory()
+    requests = []
+    for i in range(keys):
+        request = Request(factory.post('/api/auth/login/', {'username': f'user{i}', 'password': 'x'}, format='json',
+                                       REMOTE_ADDR=f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}'),
+                          parsers=[JSONParser()])
+        request.data  # parsed once, as the view would have by then
+        request.user
+        requests.append(request)
+    view = LoginView()
+    throttles = [throttle() for throttle in LoginView.throttle_classes]
+
+    throttling.buckets = buckets
+    throttling.anonymous_buckets = anonymous_buckets
+    start = time.perf_counter()
+    for i in range(checks):
+        request = requests[i % keys]
+        for throttle in throttles:
+            throttle.allow_request(request, view)
+    return (time.perf_counter() - start) / checks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=100000)
+    parser.add_argument('--keys', type=int, default=1000, help='distinct addresses and usernames')
+    parser.add_argument('--budget-us', type=float, default=20.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3', throttling=True)
+        from django.conf import settings
+        from django.contrib.auth import authenticate
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+
+        from core.throttling import CacheBuckets, MemoryBuckets
+
+        call_command('migrate', verbosity=0)
+        # Far above what the checks use, so every one of them is admitted
+        settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].update(login_ip='1000000/s', login_user='1000000/s')
+
+        memory = check_cost(MemoryBuckets(maxsize=100000), MemoryBuckets(maxsize=10000), args.checks, args.keys)
+        cache = check_cost(CacheBuckets('default'), CacheBuckets('default'), args.checks // 10, args.keys)
+        print(f'in-memory buckets:    {memory:.1f} us per login check (budget {args.budget_us:g} us)')
+        print(f'locmem cache buckets: {cache:.1f} us per login check')
+
+        User.objects.create_user('bench', password='password')
+        start = time.perf_counter()
+        authenticate(username='bench', password='password')
+        print(f'authenticate():       {(time.perf_counter() - start) * 1e6:.0f} us')
+
+    if memory > args.budget_us:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
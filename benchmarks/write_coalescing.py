@@ -0,0 +1,140 @@
+"""
+Comment writes per second and latency percentiles with many concurrent
+writers, each request committing its own transaction versus group commit
+through ``projects.coalescer``::
+
+    python benchmarks/write_coalescing.py
+    python benchmarks/write_coalescing.py --writers 50 500 --duration 10 --json writes.json
+
+Every writer is a thread posting to ``add_comment`` through the test client
+(the full middleware stack, as a threaded WSGI server would run it) against
+one on-disk SQLite database. Half of the writers add and remove project
+members instead when ``--mix`` is given. Failed requests, such as
+``database is locked``, are counted as errors.
+"""
+import argparse
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from common import setup_django, summarize
+
+
+def seed(writers):
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+
+    from projects.models import Project, ProjectUser
+
+    owner = User.objects.create_user('owner', password='password')
+    project = Project.objects.create(title='Busy project', description='Written to by every writer')
+    ProjectUser.objects.create(project=project, user=owner, role=ProjectUser.OWNER)
+    User.objects.bulk_create(User(username=f'member{i}') for i in range(writers))
+
+    session = SessionStore()
+    session['_auth_user_id'] = str(owner.pk)
+    session['_auth_user_backend'] = 'django.contrib.auth.backends.ModelBackend'
+    session['_auth_user_hash'] = owner.get_session_auth_hash()
+    session.create()
+    return session.session_key, project
+
+
+def writer(session_key, project, index, mix, stop_at, latencies, errors):
+    from django.db import connection
+    from django.test import Client
+
+    from projects.models import ProjectUser
+
+    client = Client(HTTP_ACCEPT='application/json', raise_request_exception=False)
+    # One shared session: logging in from every thread would contend on writes
+    client.cookies['sessionid'] = session_key
+    add_comment = f'/api/projects/{project.pk}/add_comment/'
+    add_user = f'/api/projects/{project.pk}/add_user/'
+    members = mix and index % 2
+    n = 0
+    try:
+        while time.perf_counter() < stop_at:
+            n += 1
+            start = time.perf_counter()
+            if members:
+                response = client.post(add_user, {'username': f'member{index}', 'role': 'reader'},
+                                       content_type='application/json')
+            else:
+                response = client.post(add_comment, {'text': f'Comment {n} from writer {index}'},
+                                       content_type='application/json')
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code == 201:
+                latencies.append(elapsed)
+            else:
+                errors.append(response.status_code)
+            if members:
+                # Untimed, so the next add_user succeeds again
+                ProjectUser.objects.filter(project=project, user__username=f'member{index}').delete()
+    finally:
+        connection.close()
+
+
+def run(session_key, project, writers, duration, mix):
+    latencies, errors = [], []
+    stop_at = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=writer, args=(session_key, project, i, mix, stop_at, latencies, errors))
+        for i in range(writers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    result = {'writes_per_s': round(len(latencies) / elapsed, 1), 'errors': len(errors)}
+    if latencies:
+        result['latency'] = summarize(latencies)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, nargs='+', default=[50, 100, 250, 500])
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per run')
+    parser.add_argument('--mix', action='store_true', help='half of the writers add members instead')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3')
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.db import connection
+
+        from projects.coalescer import coalescer
+
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = ['testserver']
+        call_command('migrate', verbosity=0)
+        with connection.cursor() as cursor:
+            # What a production SQLite deployment would use
+            cursor.execute('PRAGMA journal_mode = WAL')
+        session_key, project = seed(max(args.writers))
+
+        results = {}
+        for writers in args.writers:
+            for mode in ('direct', 'coalesced'):
+                settings.PROJECT_WRITE_COALESCING = mode == 'coalesced'
+                result = run(session_key, project, writers, args.duration, args.mix)
+                coalescer.stop()
+                results.setdefault(str(writers), {})[mode] = result
+                latency = result.get('latency', {})
+                print(f"{writers:>4} writers  {mode:<9}  {result['writes_per_s']:>8.1f} writes/s  "
+                      f"p50 {latency.get('p50_ms', 0):>8.1f} ms  p99 {latency.get('p99_ms', 0):>8.1f} ms  "
+                      f"errors {result['errors']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
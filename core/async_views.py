@@ -0,0 +1,61 @@
+"""
+Helpers for the native async views served under ASGI (see ``core.urls_asgi``).
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import exceptions
+
+from core.renderers import FastJSONRenderer
+from users.authentication import SignedTokenAuthentication, get_token
+from users.tokens import cached_user
+
+
+def render(data, status=200):
+    """Render ``data`` exactly as DRF's JSONRenderer would (it has no floats)."""
+    renderer = FastJSONRenderer()
+    response = HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+async def get_user(request):
+    """
+    The request's user, resolved like the sync API's authenticators: the
+    session first, then a token. Raises AuthenticationFailed for a bad token.
+    """
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        user = await sync_to_async(auth.get_user)(request)
+        if user.is_authenticated:
+            return user
+    token = get_token(request)
+    if token is None:
+        return AnonymousUser()
+    # A token verified before needs no thread hop
+    user = cached_user(token)
+    if user is None:
+        user, _ = await sync_to_async(SignedTokenAuthentication().authenticate)(request)
+    return user
+
+
+def authenticated(view):
+    """Resolve the request's user off the event loop; 403 for anonymous users."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            request.user = await get_user(request)
+        except exceptions.AuthenticationFailed as exc:
+            return render({'detail': exc.detail}, status=403)
+        if not request.user.is_authenticated:
+            return render({'detail': exceptions.NotAuthenticated.default_detail}, status=403)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def not_found():
+    return render({'detail': exceptions.NotFound.default_detail}, status=404)
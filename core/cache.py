@@ -0,0 +1,47 @@
+"""
+Cache backends used by ``CACHES``.
+"""
+import os
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+_missing = object()
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache that culls the least recently used entries rather than
+    random ones. Reads touch an entry's file, so its modification time is
+    the time it was last used.
+
+    Every process on the host that points at the same directory shares the
+    entries, unlike ``LocMemCache``.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def last_used(fname):
+            try:
+                return os.stat(fname).st_mtime_ns
+            except FileNotFoundError:
+                return 0
+
+        filelist.sort(key=last_used)
+        for fname in filelist[:num_entries // self._cull_frequency]:
+            self._delete(fname)
@@ -0,0 +1,208 @@
+"""
+Per-process request metrics, exposed at ``/metrics`` in the Prometheus text
+format.
+
+Every request is counted under the view and action it resolved to, e.g.
+``view="projects.views.ProjectViewSet", action="list"``. Counters are plain
+numbers behind one lock, so recording a request costs a few microseconds
+(see ``benchmarks/metrics_overhead.py``). Each process keeps its own
+counters; Prometheus sums them across processes when every process is
+scraped.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RequestStats:
+    """Database work of the request being served."""
+    __slots__ = ('queries', 'db_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Set for the duration of a request by MetricsMiddleware. Code run through
+# sync_to_async sees the same object, so queries made by async views count.
+current_request = ContextVar('current_request', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed as an execute wrapper on every database connection
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(connection, **kwargs):
+    # Outermost, so that connection.execute_wrapper() blocks, which pop the
+    # last wrapper on exit, never remove it
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # The last slot counts observations above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class EndpointMetrics:
+    __slots__ = ('statuses', 'duration', 'size', 'queries', 'db_time')
+
+    def __init__(self):
+        self.statuses = {}
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.queries = 0
+        self.db_time = 0.0
+
+
+class Registry:
+    def __init__(self):
+        self._endpoints = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def register_counter(self, name, help_text, value):
+        """Also expose ``name``, a counter whose value ``value()`` returns."""
+        self._counters[name] = (help_text, value)
+
+    def observe(self, labels, status, duration, size, stats):
+        """
+        Record one request. ``labels`` is ``(view, action, method)``; ``size``
+        is ``None`` for streamed responses, whose length is not known.
+        """
+        with self._lock:
+            endpoint = self._endpoints.get(labels)
+            if endpoint is None:
+                endpoint = self._endpoints[labels] = EndpointMetrics()
+            endpoint.statuses[status] = endpoint.statuses.get(status, 0) + 1
+            endpoint.duration.observe(duration)
+            if size is not None:
+                endpoint.size.observe(size)
+            endpoint.queries += stats.queries
+            endpoint.db_time += stats.db_time
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                labels: (dict(m.statuses), list(m.duration.counts), m.duration.sum,
+                         list(m.size.counts), m.size.sum, m.queries, m.db_time)
+                for labels, m in self._endpoints.items()
+            }
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        family('http_requests_total', 'counter', 'Requests by view, action, method and status.')
+        for labels, (statuses, *_) in snapshot:
+            for status, count in sorted(statuses.items()):
+                lines.append(f'http_requests_total{{{_labels(labels, status=status)}}} {count}')
+
+        family('http_request_duration_seconds', 'histogram', 'Time until the response was returned.')
+        for labels, (_, counts, total, *_) in snapshot:
+            _histogram(lines, 'http_request_duration_seconds', labels, DURATION_BUCKETS, counts, total)
+
+        family('http_response_size_bytes', 'histogram', 'Size of non-streaming response bodies.')
+        for labels, (_, _, _, counts, total, *_) in snapshot:
+            _histogram(lines, 'http_response_size_bytes', labels, SIZE_BUCKETS, counts, total)
+
+        family('http_request_db_queries_total', 'counter', 'Database queries run while serving requests.')
+        for labels, (*_, queries, _) in snapshot:
+            lines.append(f'http_request_db_queries_total{{{_labels(labels)}}} {queries}')
+
+        family('http_request_db_seconds_total', 'counter', 'Time spent in database queries while serving requests.')
+        for labels, (*_, db_time) in snapshot:
+            lines.append(f'http_request_db_seconds_total{{{_labels(labels)}}} {db_time:.6f}')
+
+        for name, (help_text, value) in sorted(self._counters.items()):
+            family(name, 'counter', help_text)
+            lines.append(f'{name} {value()}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    view, action, method = labels
+    pairs = [('view', view), ('action', action), ('method', method), *extra.items()]
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+def _histogram(lines, name, labels, buckets, counts, total):
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{_labels(labels, le=f"{bound:g}")}}} {cumulative}')
+    cumulative += counts[-1]
+    lines.append(f'{name}_bucket{{{_labels(labels, le="+Inf")}}} {cumulative}')
+    lines.append(f'{name}_sum{{{_labels(labels)}}} {total}')
+    lines.append(f'{name}_count{{{_labels(labels)}}} {cumulative}')
+
+
+registry = Registry()
+
+
+def endpoint_labels(request):
+    """``(view, action, method)`` of a served request."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return ('', '', request.method)
+    # ViewSets map each method to an action; other views use the method
+    actions = getattr(match.func, 'actions', None)
+    method = request.method.lower()
+    action = actions.get(method, method) if actions else method
+    return (match._func_path, action, request.method)
+
+
+def start():
+    """Install the query recorder on current and future connections."""
+    connection_created.connect(install_query_recorder, dispatch_uid='core.metrics')
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+
+
+def metrics_view(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,129 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics, routers
+
+
+class ASGIURLConfMiddleware:
+    """
+    Route requests served through ASGI with ``settings.ASGI_ROOT_URLCONF`` so
+    they can reach the async event stream; WSGI requests keep ``ROOT_URLCONF``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Django only passes an async get_response when serving ASGI
+        self.urlconf = getattr(settings, 'ASGI_ROOT_URLCONF', None)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.urlconf:
+            request.urlconf = self.urlconf
+        return await self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    Record the count, latency, database queries and database time, and
+    response size of every request in ``core.metrics.registry``, labelled
+    with the view and action that served it. Listed first in MIDDLEWARE so
+    the latency includes the rest of the stack. Streamed responses are timed
+    until their headers are ready; the queries run while streaming and their
+    size are not recorded.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.start()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    def record(self, request, response, duration, stats):
+        size = None if response.streaming else len(response.content)
+        metrics.registry.observe(metrics.endpoint_labels(request), response.status_code, duration, size, stats)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let ``core.routers.ReplicaRouter`` serve the reads of read-only actions
+    from the replica, unless the client wrote recently. A response to a
+    request that wrote pins the client to the primary for
+    ``REPLICA_PIN_SECONDS``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = routers.RoutingState()
+        token = routers.current_routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.current_routing.reset(token)
+        return self.pin(request, response, state)
+
+    async def __acall__(self, request):
+        state = routers.RoutingState()
+        token = routers.current_routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.current_routing.reset(token)
+        return self.pin(request, response, state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = routers.current_routing.get()
+        if state is None or routers.PIN_COOKIE in request.COOKIES or routers.replica_alias() is None:
+            return None
+        # The state object is shared with the view, whichever thread runs it
+        state.use_replica = routers.is_replica_action(view_func, request.method)
+        return None
+
+    def pin(self, request, response, state):
+        if state.wrote and routers.replica_alias() is not None:
+            response.set_cookie(routers.PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,37 @@
+"""
+Renderers used by views with large JSON responses.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer through orjson, when it is installed.
+
+    The bytes are the same as JSONRenderer's for any data without floats,
+    which orjson writes differently (``1e16`` rather than ``1e+16``), so
+    only use it for responses without them. Indented output, non-default
+    ``UNICODE_JSON``/``COMPACT_JSON``/``STRICT_JSON`` settings and data that
+    orjson cannot encode (e.g. integer keys) go through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Datetimes and everything else orjson does not know are encoded
+            # the way JSONRenderer's encoder does
+            ret = orjson.dumps(data, default=_encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these to keep the output valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
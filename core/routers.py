@@ -0,0 +1,74 @@
+"""
+Read-replica routing.
+
+Views list the actions that only read in ``replica_actions`` (a ViewSet's
+action names, or ``'get'`` for other views). While such an action is served,
+``ReplicaRouter`` sends reads to ``settings.REPLICA_DATABASE``; all writes,
+and every read outside those actions, go to the primary (``default``).
+
+A session that wrote is pinned to the primary for
+``settings.REPLICA_PIN_SECONDS`` through a cookie, so it reads its own writes
+while the replica catches up. Without a replica alias in DATABASES every
+query goes to the primary.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_pin'
+
+
+class RoutingState:
+    """Routing of the request being served; see ReplicaRoutingMiddleware."""
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+def replica_alias():
+    """The replica's alias, or None when no replica is configured."""
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    return alias if alias and alias in connections else None
+
+
+def is_replica_action(view_func, method):
+    """Whether ``view_func`` only reads when called with ``method``."""
+    view = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None) or view_func
+    replica_actions = getattr(view, 'replica_actions', ())
+    if not replica_actions:
+        return False
+    method = method.lower()
+    # ViewSets map each method to an action
+    actions = getattr(view_func, 'actions', None)
+    action = actions.get(method) if actions else method
+    return action in replica_actions
+
+
+def reads_from_replica():
+    """Whether the reads of the request being served go to the replica."""
+    state = current_routing.get()
+    return state is not None and state.use_replica and not state.wrote and replica_alias() is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        if state is not None and state.use_replica and not state.wrote:
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
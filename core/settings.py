@@ -35,6 +35,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the recorded latency covers the rest of the stack
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -43,9 +46,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ASGIURLConfMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
+# Used instead of ROOT_URLCONF for requests served through core.asgi, so the
+# read endpoints run as native async views
+ASGI_ROOT_URLCONF = 'core.urls_asgi'
 
 TEMPLATES = [
     {
@@ -73,6 +80,20 @@ DATABASES = {
     }
 }
 
+# Optional read replica: a copy of db.sqlite3 kept current by replication
+# (e.g. Litestream or LiteFS). Read-only actions are served from it and
+# everything else from the primary; see core.routers.
+if os.environ.get('DATABASE_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DATABASE_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_DATABASE = 'replica'
+# How long a client that wrote keeps reading from the primary
+REPLICA_PIN_SECONDS = 5
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -99,6 +120,15 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# collectstatic writes content-hashed names plus gzip/brotli copies, and
+# {% static %} refers to the hashed names (see core.storage)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage'},
+}
+# Serve STATIC_ROOT from Django (see core.static); turn off when a front-end
+# server or CDN serves it
+SERVE_STATIC = True
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -107,11 +137,87 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'users.authentication.SignedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'projects.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # Token buckets of core.throttling, per scope as <scope>_ip / <scope>_user
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_user': '5/min',
+        'register_ip': '10/hour',
+        'project_write_ip': '600/min',
+        'project_write_user': '120/min',
+    },
+}
+
+# Buckets are kept in process memory (at most THROTTLE_MAX_KEYS of them, and
+# THROTTLE_MAX_ANONYMOUS_KEYS for anonymous address+username buckets) unless
+# THROTTLE_CACHE names a cache alias shared by every process.
+THROTTLE_CACHE = None
+THROTTLE_MAX_KEYS = 100000
+THROTTLE_MAX_ANONYMOUS_KEYS = 10000
+
+# Per-process cache of each user's {project_id: role} map used for permission
+# checks. Entries are invalidated by ProjectUser signals; the TTL bounds
+# staleness across processes.
+PROJECT_ROLE_CACHE_SIZE = 10000
+PROJECT_ROLE_CACHE_TTL = 60
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Project list responses per user (see projects.list_cache). LocMemCache
+    # evicts the least recently used entries past MAX_ENTRIES; with several
+    # processes per host, 'core.cache.LRUFileBasedCache' with a directory as
+    # LOCATION shares entries and invalidations between them.
+    'project_lists': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'project-lists',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
+PROJECT_LIST_CACHE = 'project_lists'
+
+# Signed API tokens issued by LoginView (see users.tokens). Verified tokens
+# are cached per process; the cache TTL bounds how long another process can
+# accept a token revoked by logout.
+AUTH_TOKEN_TTL = 60 * 60 * 24 * 14
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 60
+
+# Live project events (/api/projects/<id>/events/, ASGI only): events kept per
+# project for Last-Event-ID resume, events queued per slow client before its
+# stream is reset, how long one stream stays open before the client is asked
+# to reconnect, and how long a project's events are still kept after its last
+# stream closed.
+PROJECT_EVENTS_BUFFER_SIZE = 200
+PROJECT_EVENTS_QUEUE_SIZE = 1000
+PROJECT_EVENTS_STREAM_TIMEOUT = 300
+PROJECT_EVENTS_BUFFER_TTL = 60
+
+# Opt-in group commit of add_comment and add_user writes (see
+# projects.coalescer): writes arriving within the window, up to the batch
+# size, are committed in one transaction by a single writer thread. A write
+# still queued after the timeout is withdrawn and answered with a 503.
+PROJECT_WRITE_COALESCING = False
+PROJECT_WRITE_COALESCING_WINDOW = 0.002
+PROJECT_WRITE_COALESCING_MAX_BATCH = 200
+PROJECT_WRITE_COALESCING_TIMEOUT = 30
+
+# Delta sync of project lists (see projects.changes): how long removals are
+# kept (older sync tokens must resync; run compact_project_changes daily),
+# and how far back a token reaches to cover writes still being committed.
+PROJECT_CHANGES_RETENTION = 60 * 60 * 24 * 30
+PROJECT_CHANGES_MARGIN = 5
+
+# Clients allowed to read /metrics (see core.metrics); None allows anyone
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Only in development 
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Serving of the files ``collectstatic`` wrote to ``STATIC_ROOT``.
+
+A content-hashed name never changes content, so it is sent with a year-long
+``immutable`` ``Cache-Control``; any other name must be revalidated. The
+gzip or brotli copy written by ``core.storage`` is sent instead of the file
+when the client accepts it. A front-end server or CDN may serve
+``STATIC_ROOT`` itself instead, with the same rules.
+"""
+import mimetypes
+import os
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+# In order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def accepted_encodings(request):
+    """The content codings in ``Accept-Encoding``, less those with ``q=0``."""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        weight = next((param[2:] for param in params if param.startswith('q=')), '1')
+        try:
+            weight = float(weight)
+        except ValueError:
+            weight = 0
+        if coding and weight > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+@require_safe
+def serve(request, path):
+    storage = staticfiles_storage
+    try:
+        if not path or path.endswith(('.gz', '.br')) or not storage.exists(path):
+            raise Http404('Static file not found.')
+        full_path = storage.path(path)
+    except SuspiciousFileOperation:
+        raise Http404('Static file not found.')
+
+    accepted = accepted_encodings(request)
+    encoding = None
+    for coding, suffix in ENCODINGS:
+        if coding in accepted and storage.exists(path + suffix):
+            encoding, full_path = coding, full_path + suffix
+            break
+
+    immutable = path in getattr(storage, 'immutable_names', ())
+    modified = os.stat(full_path).st_mtime
+    if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), modified):
+        response = HttpResponseNotModified()
+    else:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        # FileResponse names the file it was given, the compressed copy
+        del response['Content-Disposition']
+        response['Last-Modified'] = http_date(modified)
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if immutable:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,60 @@
+"""
+Static files storage used by ``collectstatic``.
+"""
+import gzip
+import os
+from functools import cached_property
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Formats that are already compressed gain nothing from another pass
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico'}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes a gzip copy (``name.gz``)
+    and, when ``brotli`` is installed, a brotli copy (``name.br``) of every
+    collected text file, so ``core.static.serve`` never compresses on a
+    request. A copy that is not at least ``min_saving`` smaller than the
+    file is not kept.
+    """
+    min_saving = 0.05
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Both the original and the hashed name are collected and served
+        for name in {*self.hashed_files, *self.hashed_files.values()}:
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        """Write the compressed copies of ``name``; return their names."""
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+            return []
+        with self.open(name) as original:
+            content = original.read()
+        copies = [(f'{name}.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            copies.append((f'{name}.br', brotli.compress(content, quality=11)))
+        written = []
+        for compressed_name, compressed in copies:
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            if len(compressed) <= len(content) * (1 - self.min_saving):
+                self._save(compressed_name, ContentFile(compressed))
+                written.append(compressed_name)
+        return written
+
+    @cached_property
+    def immutable_names(self):
+        """The content-hashed names, which can be cached forever."""
+        return frozenset(self.hashed_files.values())
@@ -0,0 +1,164 @@
+"""
+Token-bucket request throttles.
+
+A view opts in with ``throttle_classes`` and a ``throttle_scope``; the rates
+come from ``DEFAULT_THROTTLE_RATES`` as ``<scope>_ip`` and ``<scope>_user``,
+e.g. ``'login_user': '5/min'``. A rate of ``N/period`` allows bursts of N
+requests and refills the bucket at N per period; a scope without a rate is
+not throttled. A throttled request gets a 429 with ``Retry-After``.
+
+Buckets live in process memory unless ``THROTTLE_CACHE`` names a cache
+alias, which the processes of a deployment then share. Anonymous requests
+name their own keys, so their buckets are kept apart, with a cap of their
+own, and cannot push out those of authenticated users or addresses. A check
+costs a few microseconds in memory (see ``benchmarks/throttle_overhead.py``).
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``'5/min'`` -> ``(5, 5 / 60)``: the burst size and tokens per second."""
+    num, period = rate.split('/')
+    return int(num), int(num) / PERIODS[period[0]]
+
+
+class MemoryBuckets:
+    """
+    ``{key: (tokens, updated_at)}`` in process memory, least recently used
+    first.
+
+    Checks hold a lock, so concurrent requests never take the same token and
+    the limit is exact within the process. Past ``maxsize`` keys the least
+    recently used one is dropped, which forgets that client's bucket.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        """Take a token from ``key``'s bucket; return ``(allowed, tokens left)``."""
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBuckets:
+    """
+    Buckets in a Django cache shared by several processes. Like DRF's own
+    throttles, the read and the write are not atomic, so concurrent requests
+    from different processes may overshoot the limit slightly.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, rate, now):
+        key = f'throttle:{key}'
+        tokens, updated_at = self.cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # Kept until the bucket would be full again anyway
+        self.cache.set(key, (tokens, now), timeout=math.ceil(capacity / rate))
+        return allowed, tokens
+
+    def clear(self):
+        self.cache.clear()
+
+
+def _buckets(maxsize):
+    alias = getattr(settings, 'THROTTLE_CACHE', None)
+    if alias:
+        return CacheBuckets(alias)
+    return MemoryBuckets(maxsize)
+
+
+buckets = _buckets(getattr(settings, 'THROTTLE_MAX_KEYS', 100000))
+# Keyed on what anonymous clients submit
+anonymous_buckets = _buckets(getattr(settings, 'THROTTLE_MAX_ANONYMOUS_KEYS', 10000))
+
+
+class TokenBucketThrottle(BaseThrottle):
+    kind = None
+
+    def get_key(self, request, view):
+        """What the bucket is keyed on, or None to not throttle the request."""
+        raise NotImplementedError
+
+    def get_buckets(self, request):
+        return buckets
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.kind}') if scope else None
+        if rate is None:
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        capacity, self.rate = parse_rate(rate)
+        store = self.get_buckets(request)
+        allowed, self.tokens = store.take(f'{scope}:{self.kind}:{key}', capacity, self.rate, time.time())
+        return allowed
+
+    def wait(self):
+        return (1 - self.tokens) / self.rate
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """One bucket per client address (honouring ``NUM_PROXIES``)."""
+    kind = 'ip'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class UserRateThrottle(TokenBucketThrottle):
+    """
+    One bucket per user: the authenticated user, or for anonymous requests
+    the client address and the ``username`` they submit, so that guessing
+    one account's password is throttled below the address's own rate.
+    Anonymous buckets are kept in ``anonymous_buckets``: keying on a
+    client-chosen name alone would let a flood of usernames push other
+    clients' buckets out.
+    """
+    kind = 'user'
+
+    def get_key(self, request, view):
+        if request.user.is_authenticated:
+            return request.user.pk
+        data = request.data
+        username = data.get('username') if hasattr(data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        return f'{self.get_ident(request)}@{username}'
+
+    def get_buckets(self, request):
+        return buckets if request.user.is_authenticated else anonymous_buckets
@@ -2,12 +2,20 @@
 URL configuration for core project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from django.views.generic import TemplateView
 
+from .metrics import metrics_view
+from .static import serve as serve_static
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
     path('api/projects/', include('projects.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('', TemplateView.as_view(template_name='index.html'), name='home'),
-] 
\ No newline at end of file
+]
+
+if getattr(settings, 'SERVE_STATIC', False):
+    urlpatterns.append(re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.+)$', serve_static, name='static')) 
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""
+URL configuration used for requests served through ASGI.
+
+It adds the project event stream, which needs a native async view; every
+other URL is handled by ``core.urls``.
+"""
+from django.urls import path
+
+from projects import async_views as project_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    # Only available through ASGI
+    path('api/projects/<int:pk>/events/', project_views.project_events),
+] + sync_urlpatterns
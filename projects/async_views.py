@@ -0,0 +1,80 @@
+"""
+The project event stream, only served through ASGI (see ``core.urls_asgi``).
+The read endpoints are served by ``ProjectViewSet`` under ASGI too.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from core.async_views import authenticated, not_found
+
+from .events import hub
+from .membership import aget_project_roles
+
+# Sent before the stream closes to make the browser reconnect (with its
+# Last-Event-ID) after this many milliseconds
+RECONNECT_DELAY_MS = 1000
+KEEPALIVE_INTERVAL = 15
+RESET_EVENT = b'event: reset\ndata: {}\n\n'
+
+
+async def event_stream(project_id, last_event_id, user_id=None):
+    """
+    Yield the missed events, then live ones, as Server-Sent Events.
+
+    A ``reset`` event tells the client its Last-Event-ID can no longer be
+    resumed, so it should reload the project and reconnect afresh. Streams
+    end after ``PROJECT_EVENTS_STREAM_TIMEOUT`` seconds and the browser
+    reconnects, which bounds the life of a stream whose client went away
+    without the server noticing. Keep-alive comments make dead connections
+    fail sooner. The hub ends the stream early when ``user_id`` leaves the
+    project or the project is deleted.
+    """
+    subscription, missed = hub.subscribe(project_id, last_event_id, user_id)
+    deadline = time.monotonic() + getattr(settings, 'PROJECT_EVENTS_STREAM_TIMEOUT', 300)
+    try:
+        yield b'retry: %d\n\n' % RECONNECT_DELAY_MS
+        if missed is None:
+            yield RESET_EVENT
+            return
+        for event in missed:
+            yield event.encode()
+
+        while True:
+            if subscription.overflowed:
+                yield RESET_EVENT
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), min(KEEPALIVE_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                yield b': keep-alive\n\n'
+                continue
+            if event is None:
+                # Closed by the hub
+                return
+            yield event.encode()
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@authenticated
+async def project_events(request, pk):
+    """
+    Live ``comment``, ``member``, ``member_removed`` and ``project_deleted``
+    events of a project. Only served through ASGI, where an idle stream costs
+    a suspended coroutine rather than a thread.
+    """
+    if pk not in await aget_project_roles(request):
+        return not_found()
+    # EventSource sends Last-Event-ID itself when it reconnects
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    response = StreamingHttpResponse(event_stream(pk, last_event_id, request.user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,180 @@
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ProjectUser
+from .serializers import ProjectUserSerializer
+from .signals import memberships_changed
+
+# Roles that may be granted through the bulk endpoints. Ownership is never
+# granted in bulk so that each project keeps exactly one owner.
+ASSIGNABLE_ROLES = [ProjectUser.EDITOR, ProjectUser.READER]
+
+
+# The functions below read and write several rows; callers run them inside
+# a single transaction.
+
+
+class BulkEntry:
+    """
+    One item of a bulk request: a username, a user id, or an object with
+    ``username`` or ``id`` and an optional ``role``.
+    """
+
+    def __init__(self, raw, default_role=None):
+        self.raw = raw
+        self.role = default_role
+        self.user = None
+        self.status = None
+        self.detail = None
+        self.membership = None
+
+        value = raw
+        if isinstance(raw, dict):
+            self.role = raw.get('role', default_role)
+            value = raw.get('id', raw.get('username'))
+            self.key = ('id', value) if 'id' in raw else ('username', value)
+        elif isinstance(raw, int) and not isinstance(raw, bool):
+            self.key = ('id', raw)
+        else:
+            self.key = ('username', raw)
+
+        field, value = self.key
+        if field == 'id' and (not isinstance(value, int) or isinstance(value, bool)):
+            self.fail('Invalid user id.')
+        elif field == 'username' and (not isinstance(value, str) or not value):
+            self.fail('Invalid username.')
+
+    @property
+    def pending(self):
+        return self.status is None
+
+    def fail(self, detail):
+        self.status = 'error'
+        self.detail = detail
+
+    def succeed(self, status, membership=None):
+        self.status = status
+        self.membership = membership
+
+    def to_representation(self):
+        result = {'user': self.raw, 'status': self.status}
+        if self.detail is not None:
+            result['detail'] = self.detail
+        if self.membership is not None:
+            result['membership'] = ProjectUserSerializer(self.membership).data
+        return result
+
+
+def parse_entries(raw_entries, default_role=None):
+    entries = [BulkEntry(raw, default_role) for raw in raw_entries]
+    _resolve_users(entries)
+    return entries
+
+
+def _resolve_users(entries):
+    # Resolve every username and id with a single query
+    ids = {e.key[1] for e in entries if e.pending and e.key[0] == 'id'}
+    usernames = {e.key[1] for e in entries if e.pending and e.key[0] == 'username'}
+    if not ids and not usernames:
+        return
+
+    by_key = {}
+    for user in User.objects.filter(Q(id__in=ids) | Q(username__in=usernames)):
+        by_key[('id', user.id)] = user
+        by_key[('username', user.username)] = user
+
+    seen = set()
+    for entry in entries:
+        if not entry.pending:
+            continue
+        entry.user = by_key.get(entry.key)
+        if entry.user is None:
+            entry.fail('User not found.')
+        elif entry.user.id in seen:
+            entry.fail('User is listed more than once.')
+        else:
+            seen.add(entry.user.id)
+
+
+def _memberships(project, entries):
+    user_ids = [e.user.id for e in entries if e.pending]
+    return {
+        pu.user_id: pu
+        for pu in ProjectUser.objects.filter(project=project, user_id__in=user_ids).select_related('user')
+    }
+
+
+def add_members(project, entries):
+    memberships = _memberships(project, entries)
+
+    to_create = []
+    for entry in entries:
+        if not entry.pending:
+            continue
+        if entry.role not in ASSIGNABLE_ROLES:
+            entry.fail('Invalid role.')
+        elif entry.user.id in memberships:
+            entry.fail('User is already in the project.')
+        else:
+            membership = ProjectUser(project=project, user=entry.user, role=entry.role)
+            to_create.append(membership)
+            entry.succeed('added', membership)
+
+    if to_create:
+        ProjectUser.objects.bulk_create(to_create)
+        memberships_changed.send(
+            sender=ProjectUser, project=project, user_ids=[pu.user_id for pu in to_create], memberships=to_create
+        )
+    return [entry.to_representation() for entry in entries]
+
+
+def update_roles(project, entries):
+    memberships = _memberships(project, entries)
+
+    to_update = []
+    now = timezone.now()
+    for entry in entries:
+        if not entry.pending:
+            continue
+        membership = memberships.get(entry.user.id)
+        if membership is None:
+            entry.fail('User is not in the project.')
+        elif membership.role == ProjectUser.OWNER:
+            entry.fail("Cannot change the owner's role.")
+        elif entry.role not in ASSIGNABLE_ROLES:
+            entry.fail('Invalid role.')
+        else:
+            membership.role = entry.role
+            membership.updated_at = now
+            to_update.append(membership)
+            entry.succeed('updated', membership)
+
+    if to_update:
+        ProjectUser.objects.bulk_update(to_update, ['role', 'updated_at'])
+        memberships_changed.send(
+            sender=ProjectUser, project=project, user_ids=[pu.user_id for pu in to_update], memberships=to_update
+        )
+    return [entry.to_representation() for entry in entries]
+
+
+def remove_members(project, entries):
+    memberships = _memberships(project, entries)
+
+    to_delete = []
+    for entry in entries:
+        if not entry.pending:
+            continue
+        membership = memberships.get(entry.user.id)
+        if membership is None:
+            entry.fail('User is not in the project.')
+        elif membership.role == ProjectUser.OWNER:
+            entry.fail('Cannot remove the project owner.')
+        else:
+            to_delete.append(membership.pk)
+            entry.succeed('removed')
+
+    if to_delete:
+        # A single DELETE; it still sends post_delete for every row
+        ProjectUser.objects.filter(pk__in=to_delete).delete()
+    return [entry.to_representation() for entry in entries]
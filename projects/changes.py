@@ -0,0 +1,137 @@
+"""
+Delta sync of a user's project list (``/api/projects/changes/``).
+
+A sync token records when the previous sync read the list, less
+``PROJECT_CHANGES_MARGIN`` seconds so that a write stamped before the read
+but committed after it is still picked up next time. A client may therefore
+get a project twice, and applies ``changed`` as upserts. ``changed`` comes
+in pages in id order; ``next`` carries the first page's token, which is
+the one to sync from next time.
+
+A project in the user's list has changed when its row, the user's
+membership or its owner's membership was updated since the token: created,
+edited, commented on, joined, or a role changed. A project left the list
+when a ``ProjectTombstone`` says so (it was deleted, or the membership
+removed) and it is not back in the list. ``compact_project_changes``
+deletes tombstones older than ``PROJECT_CHANGES_RETENTION``; a token that
+old gets a 410, and the client starts over without ``since``.
+"""
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+from . import representations
+from .membership import query_project_roles
+from .models import Project, ProjectTombstone, ProjectUser
+from .pagination import KeysetPagination
+
+SINCE_PARAM = 'since'
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'The sync token has expired; fetch the whole list again without since.'
+    default_code = 'sync_token_expired'
+
+
+def retention():
+    return datetime.timedelta(seconds=getattr(settings, 'PROJECT_CHANGES_RETENTION', 60 * 60 * 24 * 30))
+
+
+def encode_token(moment):
+    position = [(moment - EPOCH) // MICROSECOND]
+    return urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        position = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+        return EPOCH + position[0] * MICROSECOND
+    except Exception:
+        raise ValidationError({SINCE_PARAM: ['Invalid sync token.']})
+
+
+def record_removals(project_id, user_ids):
+    ProjectTombstone.objects.bulk_create(
+        [ProjectTombstone(user_id=user_id, project_id=project_id) for user_id in user_ids]
+    )
+
+
+class ChangesPagination(KeysetPagination):
+    """
+    Pages of ``changed`` in id order. ``next`` carries the first page's
+    token, so the token a client ends up with predates every page.
+    """
+    ordering = ('id',)
+    token_query_param = 'token'
+    token = None
+
+    def get_next_link(self):
+        link = super().get_next_link()
+        return link and replace_query_param(link, self.token_query_param, self.token)
+
+
+def get_changes(request):
+    """
+    ``{'token', 'next', 'changed', 'removed'}`` for the requesting user: a
+    page of every project in their list without ``since``, otherwise of
+    what changed since it. ``removed`` is only on the first page.
+    """
+    user = request.user
+    params = request.query_params
+    now = timezone.now()
+    # Straight from the primary rather than the per-process role cache: a
+    # cache another process has not invalidated yet would leave a joined
+    # project out of a delta whose token then moves past it
+    roles = dict(query_project_roles(user.pk))
+    projects = Project.objects.for_member(user.pk)
+    removed = []
+    if params.get(SINCE_PARAM) is not None:
+        since = decode_token(params[SINCE_PARAM])
+        if since < now - retention():
+            raise SyncTokenExpired()
+        memberships = ProjectUser.objects.filter(Q(user=user) | Q(role=ProjectUser.OWNER), updated_at__gt=since)
+        projects = projects.filter(
+            Q(updated_at__gt=since) | Q(last_activity_at__gt=since) | Q(pk__in=memberships.values('project_id'))
+        )
+        if ChangesPagination.cursor_query_param not in params:
+            tombstones = ProjectTombstone.objects.filter(user=user, created_at__gt=since)
+            removed = sorted(set(tombstones.values_list('project_id', flat=True)) - set(roles))
+
+    paginator = ChangesPagination()
+    if ChangesPagination.token_query_param in params:
+        decode_token(params[ChangesPagination.token_query_param])
+        paginator.token = params[ChangesPagination.token_query_param]
+    else:
+        margin = datetime.timedelta(seconds=getattr(settings, 'PROJECT_CHANGES_MARGIN', 5))
+        paginator.token = encode_token(now - margin)
+    rows = paginator.paginate_queryset(projects.values(*representations.project_columns()), request)
+    owners = representations.owner_rows([row['id'] for row in rows]) if rows else []
+    return {
+        'token': paginator.token,
+        'next': paginator.get_next_link(),
+        'changed': representations.projects(rows, owners, roles),
+        'removed': removed,
+    }
+
+
+def compact(batch_size=10000):
+    """Delete the tombstones older than the retention; return how many."""
+    old = ProjectTombstone.objects.filter(created_at__lt=timezone.now() - retention())
+    deleted = 0
+    while True:
+        # In batches, so no single transaction holds the write lock for long
+        ids = list(old.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += ProjectTombstone.objects.filter(pk__in=ids).delete()[0]
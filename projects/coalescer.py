@@ -0,0 +1,179 @@
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_STOP = object()
+
+
+class WriteTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The write was not applied in time; it is safe to retry it.'
+    default_code = 'write_timeout'
+
+
+class WriterStopped(Exception):
+    """The writer thread ended before the write was committed."""
+
+
+class WriteCoalescer:
+    """
+    Group commit for small writes on SQLite.
+
+    SQLite lets one writer in at a time, so concurrent requests that each
+    commit their own transaction queue up on the database lock, and some
+    give up with ``database is locked``. Instead, requests hand their write
+    to ``submit()``. A single writer thread collects the writes that arrive
+    within ``window`` seconds (at most ``max_batch`` of them) and runs them
+    in one transaction, each in its own savepoint, so a write that fails is
+    rolled back alone and its exception is raised in the request that
+    submitted it. Results are handed back only once the batch is committed.
+
+    Writes run in the writer thread with its own database connection, so
+    they must not rely on the caller's open transaction. Each one runs in a
+    copy of the caller's context, so request-scoped state kept in context
+    variables (metrics, replica routing) still sees it. Signal handlers and
+    ``on_commit`` callbacks run in the writer thread too.
+
+    A write still queued after ``timeout`` seconds is withdrawn and the
+    request gets a ``WriteTimeout`` (503): nothing was written, so the
+    client can retry it. A write whose batch has already started is
+    waited for, since it may commit. If the writer thread dies, the writes
+    it had not settled fail with ``WriterStopped`` rather than waiting for
+    ever.
+    """
+
+    def __init__(self, window, max_batch, timeout):
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Run ``func(*args, **kwargs)`` in the next batch and return its result."""
+        future = Future()
+        with self._lock:
+            self._ensure_started()
+            self._queue.put((contextvars.copy_context(), func, args, kwargs, future))
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise WriteTimeout()
+            # Its batch is running and will commit or roll back
+            return future.result()
+
+    def _ensure_started(self):
+        # Called with the lock held
+        forked = self._pid != os.getpid()
+        if self._thread is None or forked or not self._thread.is_alive():
+            if self._thread is not None and not forked:
+                # Writes left behind by a writer that died
+                self._fail(self._drain(self._queue), WriterStopped())
+            self._queue = queue.SimpleQueue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name='write-coalescer',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Commit what is queued, then end the writer thread."""
+        with self._lock:
+            thread, work_queue, self._thread = self._thread, self._queue, None
+        if thread is not None and thread.is_alive():
+            work_queue.put(_STOP)
+            thread.join()
+
+    def _run(self, work_queue):
+        batch = []
+        try:
+            while True:
+                batch = self._collect(work_queue)
+                if batch and batch[-1] is _STOP:
+                    batch.pop()
+                    self._commit(batch)
+                    return
+                self._commit(batch)
+        except BaseException:
+            with self._lock:
+                self._fail(batch + self._drain(work_queue), WriterStopped())
+            raise
+        finally:
+            connection.close()
+
+    def _collect(self, work_queue):
+        batch = [work_queue.get()]
+        deadline = time.monotonic() + self.window
+        while batch[-1] is not _STOP and len(batch) < self.max_batch:
+            try:
+                # Take what is already queued, then wait out the window
+                batch.append(work_queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        # Writes withdrawn by a request that timed out are skipped
+        batch = [item for item in batch if item[-1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes = []
+        try:
+            close_old_connections()
+            with transaction.atomic():
+                for context, func, args, kwargs, future in batch:
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, context.run(func, *args, **kwargs), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+        except Exception as exc:
+            # The commit itself failed: nothing in the batch was written
+            for *_, future in batch:
+                future.set_exception(exc)
+            return
+
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, exc in outcomes:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def _drain(self, work_queue):
+        items = []
+        while True:
+            try:
+                items.append(work_queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _fail(self, items, exc):
+        for item in items:
+            if item is _STOP:
+                continue
+            try:
+                item[-1].set_exception(exc)
+            except InvalidStateError:
+                # Already settled, or withdrawn by its request
+                pass
+
+
+coalescer = WriteCoalescer(
+    window=getattr(settings, 'PROJECT_WRITE_COALESCING_WINDOW', 0.002),
+    max_batch=getattr(settings, 'PROJECT_WRITE_COALESCING_MAX_BATCH', 200),
+    timeout=getattr(settings, 'PROJECT_WRITE_COALESCING_TIMEOUT', 30),
+)
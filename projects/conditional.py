@@ -0,0 +1,148 @@
+from functools import wraps
+
+from django.db.models import Count, FilteredRelation, Max, Q, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import md5
+from django.utils.http import http_date
+
+from .membership import get_project_roles
+from .models import Comment, Project, ProjectUser
+
+
+def conditional(validators):
+    """
+    Answer ``If-None-Match`` / ``If-Modified-Since`` for a viewset handler.
+
+    ``validators(view, request, **kwargs)`` returns ``(etag_parts,
+    last_modified)`` computed from cheap aggregate queries, or ``None`` to
+    fall through to the handler (for example when the caller may not see the
+    project, so the handler can answer 404). Unchanged resources are answered
+    with a 304 without running the handler or serializing anything.
+
+    A maximum of timestamps does not move when a row is deleted, so the
+    collections (projects, members, comments) send no ``last_modified`` and
+    are validated by their ETag alone, which counts their rows.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return func(self, request, *args, **kwargs)
+
+            result = validators(self, request, **kwargs)
+            if result is None:
+                return func(self, request, *args, **kwargs)
+
+            etag, timestamp, response = _check_preconditions(request, result)
+            if response is None:
+                response = func(self, request, *args, **kwargs)
+            return _add_validators(response, etag, timestamp)
+        return wrapper
+    return decorator
+
+
+def _check_preconditions(request, result):
+    # Returns the validators and a 304/412 response, or None if the handler
+    # has to run
+    etag_parts, last_modified = result
+    # Responses vary with the query string (cursor, page size)
+    key = repr((request.get_full_path(), etag_parts)).encode('utf-8')
+    etag = 'W/"%s"' % md5(key, usedforsecurity=False).hexdigest()
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+
+    http_request = getattr(request, '_request', request)
+    return etag, timestamp, get_conditional_response(http_request, etag=etag, last_modified=timestamp)
+
+
+def _add_validators(response, etag, timestamp):
+    if response.status_code not in (200, 304, 412):
+        return response
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Let clients keep a copy but make them revalidate before using it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _project_id(request, kwargs):
+    # Returns the project id if the caller is a member, otherwise None
+    try:
+        project_id = int(kwargs['pk'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return project_id if project_id in get_project_roles(request) else None
+
+
+def _with_owner_membership(queryset):
+    # Joins only the owner row, through the (project, role) predicate
+    return queryset.annotate(
+        owner_membership=FilteredRelation('projectuser', condition=Q(projectuser__role=ProjectUser.OWNER))
+    )
+
+
+def _last_modified(stats):
+    timestamps = [stats['updated'], stats['owners'], stats['owner_details'], stats['activity'], stats['member']]
+    return max(filter(None, timestamps), default=None)
+
+
+def project_list_validators(view, request, **kwargs):
+    roles = get_project_roles(request)
+    stats = _with_owner_membership(Project.objects.for_member(request.user.pk)).aggregate(
+        updated=Max('updated_at'),
+        owners=Max('owner_membership__updated_at'),
+        owner_details=Max('owner_membership__user__stamp__updated_at'),
+        activity=Max('last_activity_at'),
+        comments=Sum('comment_count'),
+    )
+    # The role map covers projects gained or lost and role changes
+    return (sorted(roles.items()), stats), None
+
+
+def project_detail_validators(view, request, **kwargs):
+    project_id = _project_id(request, kwargs)
+    if project_id is None:
+        return None
+    queryset = _with_owner_membership(Project.objects.filter(pk=project_id)).annotate(
+        # The caller's own membership, for the role the response shows
+        member_membership=FilteredRelation('projectuser', condition=Q(projectuser__user_id=request.user.pk))
+    )
+    stats = queryset.aggregate(
+        updated=Max('updated_at'),
+        owners=Max('owner_membership__updated_at'),
+        owner_details=Max('owner_membership__user__stamp__updated_at'),
+        activity=Max('last_activity_at'),
+        member=Max('member_membership__updated_at'),
+        comments=Max('comment_count'),
+    )
+    if stats['updated'] is None:
+        return None
+    role = get_project_roles(request)[project_id]
+    return (role, stats), _last_modified(stats)
+
+
+def project_users_validators(view, request, **kwargs):
+    project_id = _project_id(request, kwargs)
+    if project_id is None:
+        return None
+    stats = ProjectUser.objects.filter(project_id=project_id).aggregate(
+        count=Count('id'),
+        last=Max('id'),
+        updated=Max('updated_at'),
+        user_details=Max('user__stamp__updated_at'),
+    )
+    return stats, None
+
+
+def project_comments_validators(view, request, **kwargs):
+    project_id = _project_id(request, kwargs)
+    if project_id is None:
+        return None
+    # Comments are never edited, so count and newest id capture every
+    # change but their authors' details
+    stats = Comment.objects.filter(project_id=project_id).aggregate(
+        count=Count('id'),
+        last=Max('id'),
+        user_details=Max('user__stamp__updated_at'),
+    )
+    return stats, None
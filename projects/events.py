@@ -0,0 +1,212 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+
+
+class Event:
+    __slots__ = ('id', 'type', 'data')
+
+    def __init__(self, id, type, data):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def encode(self):
+        # One Server-Sent Events message
+        payload = json.dumps(self.data, separators=(',', ':'), ensure_ascii=False)
+        return f'id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n'.encode('utf-8')
+
+
+class Subscription:
+    """
+    One open event stream: an asyncio queue owned by the stream's event loop,
+    filled from whichever thread publishes.
+    """
+
+    def __init__(self, project_id, loop, maxsize, user_id=None):
+        self.project_id = project_id
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        # Set when the client fell too far behind and events were dropped
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on self.loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventHub:
+    """
+    In-process publish/subscribe of project events for the SSE endpoint.
+
+    Each project keeps a ring buffer of its latest events so a client that
+    reconnects with ``Last-Event-ID`` receives what it missed. Event ids are
+    ``<epoch>-<sequence>``; the epoch changes with every process, so ids from
+    another process or from before a restart are recognised as unknown and the
+    client is told to reload instead.
+
+    Only projects that are listened to are buffered: those with an open
+    stream, or whose last stream closed less than ``idle_ttl`` seconds ago so
+    the browser can reconnect. Events of any other project are dropped, along
+    with its buffer, so a process that serves no streams (a WSGI worker)
+    keeps nothing.
+    """
+
+    def __init__(self, buffer_size, queue_size, idle_ttl=60):
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.idle_ttl = idle_ttl
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+        self._buffers = {}
+        # Sequence number before the oldest event still in each buffer
+        self._evicted = {}
+        self._subscriptions = {}
+        # When each project last gained or lost a stream
+        self._touched = {}
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+
+    def publish(self, project_id, type, data):
+        """Record an event and wake every stream of the project. Thread-safe."""
+        with self._lock:
+            sequence = next(self._sequence)
+            event = Event(f'{self.epoch}-{sequence}', type, data)
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._sweep(now)
+            if not self._is_listened(project_id, now):
+                self._forget(project_id)
+                return event
+            buffer = self._buffers.get(project_id)
+            if buffer is None:
+                # Earlier events of the project were not kept
+                buffer = self._buffers[project_id] = deque()
+                self._evicted[project_id] = sequence - 1
+            buffer.append((sequence, event))
+            if len(buffer) > self.buffer_size:
+                self._evicted[project_id] = buffer.popleft()[0]
+            subscriptions = list(self._subscriptions.get(project_id, ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The stream's loop has shut down
+                self.unsubscribe(subscription)
+        return event
+
+    def is_listened(self, project_id):
+        """Whether an event published now for the project would be kept."""
+        with self._lock:
+            return self._is_listened(project_id, time.monotonic())
+
+    def touch(self, project_id):
+        """Keep buffering the project's events for the next ``idle_ttl`` seconds."""
+        with self._lock:
+            self._touched[project_id] = time.monotonic()
+
+    def subscribe(self, project_id, last_event_id=None, user_id=None):
+        """
+        Register a stream on the running loop. Returns the subscription and
+        the buffered events after ``last_event_id``, or ``None`` instead of
+        that list if the events since then are no longer all available.
+        """
+        subscription = Subscription(project_id, asyncio.get_running_loop(), self.queue_size, user_id)
+        with self._lock:
+            self._subscriptions.setdefault(project_id, set()).add(subscription)
+            self._touched[project_id] = time.monotonic()
+            missed = self._events_since(project_id, last_event_id)
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.project_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.project_id]
+                    self._touched[subscription.project_id] = time.monotonic()
+
+    def close(self, project_id, user_id=None):
+        """
+        End the project's streams, or only those of ``user_id``, once they
+        have sent the events already published.
+        """
+        with self._lock:
+            subscriptions = [
+                subscription for subscription in self._subscriptions.get(project_id, ())
+                if user_id is None or subscription.user_id == user_id
+            ]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, None)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+    def events_since(self, project_id, last_event_id):
+        with self._lock:
+            return self._events_since(project_id, last_event_id)
+
+    def _events_since(self, project_id, last_event_id):
+        if not last_event_id:
+            return []
+        epoch, _, sequence = last_event_id.partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        if project_id not in self._buffers or sequence < self._evicted[project_id]:
+            # Not buffered, or not from the start of the buffer: events may be missing
+            return None
+        return [event for seq, event in self._buffers[project_id] if seq > sequence]
+
+    def _is_listened(self, project_id, now):
+        if project_id in self._subscriptions:
+            return True
+        touched = self._touched.get(project_id)
+        return touched is not None and now - touched < self.idle_ttl
+
+    def _forget(self, project_id):
+        self._buffers.pop(project_id, None)
+        self._evicted.pop(project_id, None)
+        self._touched.pop(project_id, None)
+
+    def _sweep(self, now):
+        # Drop the buffers of projects nobody has listened to for idle_ttl
+        for project_id in [project_id for project_id in self._touched if not self._is_listened(project_id, now)]:
+            self._forget(project_id)
+        self._next_sweep = now + self.idle_ttl
+
+    def subscriber_count(self, project_id=None):
+        with self._lock:
+            if project_id is not None:
+                return len(self._subscriptions.get(project_id, ()))
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def discard(self, project_id):
+        # Forget the buffered events of a deleted project
+        with self._lock:
+            self._forget(project_id)
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+            self._evicted.clear()
+            self._touched.clear()
+
+
+hub = EventHub(
+    buffer_size=getattr(settings, 'PROJECT_EVENTS_BUFFER_SIZE', 200),
+    queue_size=getattr(settings, 'PROJECT_EVENTS_QUEUE_SIZE', 1000),
+    idle_ttl=getattr(settings, 'PROJECT_EVENTS_BUFFER_TTL', 60),
+)
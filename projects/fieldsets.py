@@ -0,0 +1,85 @@
+"""
+Sparse fieldsets and opt-in expansion for the project read endpoints.
+
+``?fields=id,title`` keeps only the named fields of each object. A relation
+listed in a serializer's ``expandable`` (a project's ``owner``, a comment's
+``user``, a membership's ``user_details``) is embedded only when it is
+expanded: without ``?expand=`` every relation is, as before, while
+``?expand=`` names the ones to embed and the others are reduced to the
+related user's id (or left out, for ``user_details``, whose id is already in
+``user``). Views fetch only the columns and relations the selection needs.
+"""
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class FieldSelection:
+    """``fields`` and ``expand`` are sets of names, or None for all of them."""
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @property
+    def is_default(self):
+        return self.fields is None and self.expand is None
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        return self.includes(name) and (self.expand is None or name in self.expand)
+
+    @classmethod
+    def from_query(cls, query_params, available, expandable):
+        """
+        Parse ``?fields=`` and ``?expand=``; unknown names are a 400. An empty
+        ``fields`` selects every field, an empty ``expand`` expands nothing.
+        """
+        fields = _names(query_params.get(FIELDS_PARAM, '')) or None
+        expand = _names(query_params[EXPAND_PARAM]) if EXPAND_PARAM in query_params else None
+        errors = {}
+        for param, names, known in ((FIELDS_PARAM, fields, available), (EXPAND_PARAM, expand, expandable)):
+            unknown = sorted((names or set()) - set(known))
+            if unknown:
+                errors[param] = [f"Unknown field(s): {', '.join(unknown)}."]
+        if errors:
+            raise ValidationError(errors)
+        return cls(fields, expand)
+
+
+ALL = FieldSelection()
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin applying the FieldSelection in ``context['fields']``.
+    ``collapsed_field(name)`` returns what an unexpanded relation is rendered
+    as, or None to leave it out.
+    """
+    expandable = ()
+
+    def collapsed_field(self, name):
+        return None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.context.get('fields')
+        if selection is None or selection.is_default:
+            return fields
+        for name in list(fields):
+            if not selection.includes(name):
+                del fields[name]
+            elif name in self.expandable and not selection.expands(name):
+                collapsed = self.collapsed_field(name)
+                if collapsed is None:
+                    del fields[name]
+                else:
+                    fields[name] = collapsed
+        return fields
@@ -0,0 +1,386 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .export import EXPORT_VERSION
+from .models import Comment, Project, ProjectUser
+from .signals import memberships_changed
+
+BATCH_SIZE = 5000
+ROLES = {role for role, _ in ProjectUser.ROLE_CHOICES}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class PendingProject:
+    """
+    A ``project`` record of the input and the state needed for the records
+    that follow it. Members are held back until the first comment (or the
+    next project, or until they fill a batch) so the project's single owner
+    can be chosen from all of them before anything is written.
+    """
+
+    def __init__(self, record, line):
+        self.line = line
+        self.project = None
+        self.members = []
+        self.member_ids = set()
+        self.has_owner = False
+        # Set once the members are known; the project is written with the
+        # next batch
+        self.finalized = False
+        self.skipped = False
+        if record is not None:
+            created_at = _timestamp(record.get('created_at'))
+            self.project = Project(
+                title=record.get('title') or '',
+                description=record.get('description') or '',
+                created_at=created_at,
+                updated_at=_timestamp(record.get('updated_at'), created_at),
+                last_activity_at=created_at,
+            )
+
+    @classmethod
+    def restore(cls, state):
+        # The project a checkpoint was taken in the middle of
+        pending = cls(None, None)
+        pending.finalized = True
+        pending.skipped = state['skipped']
+        if not pending.skipped:
+            pending.project = Project.objects.get(pk=state['id'])
+            pending.member_ids = set(
+                ProjectUser.objects.filter(project=pending.project).values_list('user_id', flat=True)
+            )
+            pending.has_owner = ProjectUser.objects.filter(project=pending.project, role=ProjectUser.OWNER).exists()
+        return pending
+
+    def checkpoint_state(self):
+        return {'id': None if self.skipped else self.project.pk, 'skipped': self.skipped}
+
+
+def _timestamp(value, default=None):
+    # fromisoformat() reads the export's timestamps much faster than
+    # parse_datetime() and is tried first
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        return default or timezone.now()
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _username(record):
+    user = record.get('user')
+    username = user.get('username') if isinstance(user, dict) else user
+    return username if isinstance(username, str) and username else None
+
+
+def bulk_create(model, objs, batch_size=None):
+    """
+    ``model.objects.bulk_create(objs)`` keeping the timestamps the rows were
+    given: the insert stamps auto_now/auto_now_add fields with the current
+    time, so they are written again by primary key. One statement run with
+    ``executemany()`` is much faster than ``bulk_update()``'s CASE
+    expressions.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    given = [[getattr(obj, field.attname) for field in fields] for obj in objs]
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    if not fields or not objs:
+        return objs
+
+    rows = []
+    for obj, values in zip(objs, given):
+        for field, value in zip(fields, values):
+            setattr(obj, field.attname, value)
+        rows.append([field.get_db_prep_save(value, connection) for field, value in zip(fields, values)] + [obj.pk])
+    quote = connection.ops.quote_name
+    assignments = ', '.join(f'{quote(field.column)} = %s' for field in fields)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {quote(model._meta.db_table)} SET {assignments} WHERE {quote(model._meta.pk.column)} = %s', rows
+        )
+    return objs
+
+
+class ProjectImporter:
+    """
+    Load projects, members and comments from the NDJSON produced by the
+    export (several exports may be concatenated) with ``bulk_create``.
+
+    Rows are written in batches of about ``batch_size`` records, one
+    transaction per batch. After each batch the number of input lines fully
+    written is saved to ``checkpoint_path``, so an interrupted import resumes
+    where the last batch ended.
+
+    Every imported project gets exactly one owner: the first ``owner`` member
+    of the input. Further owners are imported as editors, and a project
+    without one is owned by ``default_owner`` or skipped.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, create_users=False, default_owner=None,
+                 checkpoint_path=None, progress=None):
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.default_owner = default_owner
+        self.checkpoint_path = checkpoint_path
+        self.progress = progress
+        self.current = None
+        self.stats = {
+            'lines': 0, 'projects': 0, 'members': 0, 'comments': 0, 'users_created': 0,
+            'owners_demoted': 0, 'skipped_projects': 0, 'skipped_records': 0,
+        }
+        self._reset_batch()
+
+    def _reset_batch(self):
+        self._projects = []
+        self._members = []
+        self._comments = []
+
+    @property
+    def _batch_rows(self):
+        rows = len(self._projects) + len(self._members) + len(self._comments)
+        if self.current is not None and not self.current.finalized:
+            rows += len(self.current.members)
+        return rows
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        self.stats.update(state['stats'])
+        if state['current'] is not None:
+            self.current = PendingProject.restore(state['current'])
+        return state['line']
+
+    def _save_checkpoint(self, line):
+        if not self.checkpoint_path:
+            return
+        current = self.current
+        if current is not None and current.finalized:
+            current = current.checkpoint_state()
+        else:
+            current = None
+        tmp = f'{self.checkpoint_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'line': line, 'current': current, 'stats': self.stats}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def run(self, lines, resume=False):
+        """Import ``lines`` (an iterable of str or bytes). Returns the stats."""
+        start_line = self.load_checkpoint() if resume else 0
+        self.started = time.monotonic()
+        self.start_rows = self._written_rows()
+        line_no = 0
+        for line_no, line in enumerate(lines, 1):
+            if line_no <= start_line or not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ImportFormatError(f'Line {line_no}: invalid JSON.')
+            if not isinstance(record, dict):
+                raise ImportFormatError(f'Line {line_no}: expected a JSON object.')
+            self._add(record, line_no)
+            if self._batch_rows >= self.batch_size:
+                if self.current is not None and len(self.current.members) >= self.batch_size:
+                    # Members held back fill a batch on their own: write the
+                    # project with the owner chosen among them
+                    self._finalize_current()
+                self._flush(line_no)
+
+        self._finalize_current()
+        self._flush(max(line_no, start_line))
+        return self.stats
+
+    def _add(self, record, line_no):
+        kind = record.get('type')
+        if kind == 'export':
+            if record.get('version') != EXPORT_VERSION:
+                raise ImportFormatError(f"Line {line_no}: unsupported export version {record.get('version')!r}.")
+        elif kind == 'project':
+            self._finalize_current()
+            self.current = PendingProject(record, line_no)
+        elif self.current is None:
+            raise ImportFormatError(f'Line {line_no}: {kind!r} record before any project.')
+        elif kind == 'member':
+            username = _username(record)
+            if username is None or record.get('role') not in ROLES:
+                self.stats['skipped_records'] += 1
+            elif self.current.finalized:
+                # A member listed after the project's comments
+                if not self.current.skipped:
+                    self._members.append((self.current, username, record))
+            else:
+                self.current.members.append((username, record))
+        elif kind == 'comment':
+            self._finalize_current()
+            username = _username(record)
+            if self.current.skipped:
+                self.stats['skipped_records'] += 1
+            elif username is None or not isinstance(record.get('text'), str):
+                self.stats['skipped_records'] += 1
+            else:
+                self._comments.append((self.current, username, record))
+        else:
+            raise ImportFormatError(f'Line {line_no}: unknown record type {kind!r}.')
+
+    def _finalize_current(self):
+        current = self.current
+        if current is None or current.finalized:
+            return
+        current.finalized = True
+        self._projects.append(current)
+        self._members.extend((current, username, record) for username, record in current.members)
+        current.members = []
+
+    def _resolve_users(self):
+        # One query for every username of the batch
+        records = {}
+        for _, username, record in self._members:
+            records.setdefault(username, record.get('user'))
+        for _, username, _ in self._comments:
+            records.setdefault(username, None)
+        if self.default_owner:
+            records.setdefault(self.default_owner, None)
+
+        users = {user.username: user for user in User.objects.filter(username__in=list(records))}
+        missing = [username for username in records if username not in users]
+        if missing and self.create_users:
+            new_users = []
+            for username in missing:
+                details = records[username] if isinstance(records[username], dict) else {}
+                user = User(
+                    username=username,
+                    email=details.get('email') or '',
+                    first_name=details.get('first_name') or '',
+                    last_name=details.get('last_name') or '',
+                )
+                user.set_unusable_password()
+                new_users.append(user)
+            User.objects.bulk_create(new_users)
+            # bulk_create() on SQLite sets the primary keys
+            users.update((user.username, user) for user in new_users)
+            self.stats['users_created'] += len(new_users)
+        return users
+
+    def _memberships(self, users):
+        # Memberships keep their historical created_at but are stamped as
+        # updated now, so a delta sync (projects.changes) reports the
+        # imported projects to their members
+        now = timezone.now()
+        memberships = {}
+        for pending, username, record in self._members:
+            user = users.get(username)
+            if pending.skipped or user is None or user.pk in pending.member_ids:
+                self.stats['skipped_records'] += 1
+                continue
+            role = record['role']
+            if role == ProjectUser.OWNER:
+                if pending.has_owner:
+                    role = ProjectUser.EDITOR
+                    self.stats['owners_demoted'] += 1
+                pending.has_owner = True
+            pending.member_ids.add(user.pk)
+            created_at = _timestamp(record.get('created_at'))
+            memberships.setdefault(pending, []).append(ProjectUser(
+                project=pending.project, user=user, role=role, created_at=created_at, updated_at=now,
+            ))
+
+        default_owner = users.get(self.default_owner) if self.default_owner else None
+        for pending in self._projects:
+            if pending.has_owner:
+                continue
+            if default_owner is None:
+                pending.skipped = True
+                memberships.pop(pending, None)
+                self.stats['skipped_projects'] += 1
+                continue
+            owned = memberships.setdefault(pending, [])
+            existing = next((pu for pu in owned if pu.user_id == default_owner.pk), None)
+            if existing is not None:
+                existing.role = ProjectUser.OWNER
+            else:
+                pending.member_ids.add(default_owner.pk)
+                owned.append(ProjectUser(
+                    project=pending.project, user=default_owner, role=ProjectUser.OWNER,
+                    created_at=pending.project.created_at, updated_at=now,
+                ))
+            pending.has_owner = True
+        return memberships
+
+    def _flush(self, line_no):
+        if self._batch_rows:
+            with transaction.atomic():
+                self._write_batch()
+        self._reset_batch()
+
+        # Lines of a project whose members are still being collected are
+        # read again on resume
+        if self.current is not None and not self.current.finalized:
+            line_no = self.current.line - 1
+        self.stats['lines'] = line_no
+        self._save_checkpoint(line_no)
+        if self.progress is not None:
+            self.progress(self.stats, self.rows_per_second())
+
+    def _write_batch(self):
+        users = self._resolve_users()
+        memberships = self._memberships(users)
+
+        projects = [pending.project for pending in self._projects if not pending.skipped]
+        bulk_create(Project, projects)
+
+        new_members = [pu for owned in memberships.values() for pu in owned]
+        bulk_create(ProjectUser, new_members)
+
+        comments = []
+        touched = set()
+        for pending, username, record in self._comments:
+            user = users.get(username)
+            if pending.skipped or user is None:
+                self.stats['skipped_records'] += 1
+                continue
+            comments.append(Comment(
+                project=pending.project, user=user, text=record['text'],
+                created_at=_timestamp(record.get('created_at')),
+            ))
+            touched.add(pending.project.pk)
+        bulk_create(Comment, comments)
+
+        # bulk_create() sends no signals: update what the handlers in
+        # signals.py would have
+        if touched:
+            Project.objects.filter(pk__in=touched).rebuild_activity()
+        search.index_many(projects, comments)
+        for pending, owned in memberships.items():
+            memberships_changed.send(
+                sender=ProjectUser, project=pending.project, user_ids=[pu.user_id for pu in owned]
+            )
+
+        self.stats['projects'] += len(projects)
+        self.stats['members'] += len(new_members)
+        self.stats['comments'] += len(comments)
+
+    def _written_rows(self):
+        return self.stats['projects'] + self.stats['members'] + self.stats['comments']
+
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return (self._written_rows() - self.start_rows) / elapsed if elapsed else 0.0
@@ -0,0 +1,130 @@
+"""
+Cache of project list responses, per user.
+
+Each user has a generation number in the cache. Entries are stored under
+the request's absolute URL (cursor, ordering and page size included) and the
+user's current generation, so a lookup costs two cache reads however many
+projects the user has. Writes bump the generation of every user whose list
+shows what changed: the members of the project for its own fields and
+comments, the member alone for a membership. Entries under an old
+generation are never looked up again and age out of the cache's LRU, so
+invalidation needs no key scans.
+
+Lists read from the replica are not stored: the replica may not have the
+writes that the generations already account for.
+
+``PROJECT_LIST_CACHE`` names the cache alias; ``None`` turns the cache off.
+A ``LocMemCache`` only sees the bumps of its own process, so other
+processes serve an entry for at most its ``TIMEOUT``;
+``core.cache.LRUFileBasedCache`` shares entries and generations between the
+processes of one host.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.crypto import md5
+
+from core.metrics import registry
+from core.routers import reads_from_replica
+
+from .models import ProjectUser
+
+
+class ProjectListCache:
+    def __init__(self, alias):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _generation_key(self, user_id):
+        return f'project_list:gen:{user_id}'
+
+    def generation(self, user_id):
+        """The generation of ``user_id``'s lists."""
+        key = self._generation_key(user_id)
+        cache = self.cache
+        generation = cache.get(key)
+        if generation is None:
+            # Start from the clock rather than 0, so a generation that was
+            # evicted never comes back to entries stored before
+            cache.add(key, time.time_ns(), timeout=None)
+            generation = cache.get(key)
+        return generation
+
+    def _entry_key(self, user_id, generation, url):
+        return f'project_list:{user_id}:{generation}:{md5(url.encode(), usedforsecurity=False).hexdigest()}'
+
+    def get(self, user_id, url):
+        """
+        Return ``(data, generation)``: the cached response data for ``url``,
+        or None, and the generation to store a fresh response under.
+        """
+        if self.alias is None:
+            return None, None
+        generation = self.generation(user_id)
+        data = self.cache.get(self._entry_key(user_id, generation, url))
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data, generation
+
+    def set(self, user_id, generation, url, data):
+        # Stored under the generation read before the response was built, so
+        # a write that raced with it leaves the entry unreachable
+        if self.alias is None or generation is None or reads_from_replica():
+            return
+        self.cache.set(self._entry_key(user_id, generation, url), data)
+
+    def bump(self, user_ids):
+        """Make every cached list of ``user_ids`` stale."""
+        if self.alias is None or not user_ids:
+            return
+        # A new clock reading rather than incr(): one call for all the users
+        generation = time.time_ns()
+        self.cache.set_many({self._generation_key(user_id): generation for user_id in user_ids}, timeout=None)
+
+    def clear(self):
+        if self.alias is not None:
+            self.cache.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+project_list_cache = ProjectListCache(alias=getattr(settings, 'PROJECT_LIST_CACHE', None))
+
+registry.register_counter('project_list_cache_hits_total', 'Project list responses served from the cache.',
+                          lambda: project_list_cache.hits)
+registry.register_counter('project_list_cache_misses_total', 'Project list responses built and cached.',
+                          lambda: project_list_cache.misses)
+
+
+def invalidate_users(user_ids):
+    """Bump the lists of ``user_ids`` now and again on commit."""
+    if project_list_cache.alias is None:
+        return
+    user_ids = set(user_ids)
+    project_list_cache.bump(user_ids)
+    # Again on commit, so a request that read the old rows while the
+    # transaction was open cannot leave them cached
+    transaction.on_commit(lambda: project_list_cache.bump(user_ids))
+
+
+def invalidate_projects(project_ids, also=()):
+    """
+    Bump the lists of the members of ``project_ids`` (ids or a
+    ``values_list`` queryset of ids) and of the users in ``also``.
+    """
+    if project_list_cache.alias is None:
+        return
+    members = ProjectUser.objects.filter(project_id__in=project_ids).values_list('user_id', flat=True)
+    invalidate_users([*members, *also])
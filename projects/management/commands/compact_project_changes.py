@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from projects.changes import compact
+
+
+class Command(BaseCommand):
+    help = 'Delete the project list tombstones older than PROJECT_CHANGES_RETENTION. Run it periodically, e.g. daily.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Tombstones deleted per transaction')
+
+    def handle(self, *args, **options):
+        deleted = compact(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstone(s).'))
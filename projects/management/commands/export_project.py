@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.export import CHUNK_SIZE, export_blocks
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Write a project with its members and comments as NDJSON, in the format of /api/projects/<id>/export/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument('-o', '--output', help='Write to this file instead of standard output')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project_id'])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {options['project_id']} does not exist.")
+
+        blocks = export_blocks(project, options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for block in blocks:
+                    output.write(block)
+            return
+
+        # Blocks always end on a line boundary, so they decode on their own
+        stream = self.stdout._out
+        binary = getattr(stream, 'buffer', None)
+        for block in blocks:
+            if binary is not None:
+                binary.write(block)
+            else:
+                stream.write(block.decode('utf-8'))
+        stream.flush()
@@ -0,0 +1,60 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.importer import BATCH_SIZE, ImportFormatError, ProjectImporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Import projects with their members and comments from NDJSON in the format of '
+        '/api/projects/<id>/export/. Several exports may be concatenated into one file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="NDJSON file to import, or '-' for standard input")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Records written per transaction')
+        parser.add_argument('--checkpoint', help='Record progress in this file after every batch')
+        parser.add_argument('--resume', action='store_true', help='Continue from the position saved in --checkpoint')
+        parser.add_argument('--create-users', action='store_true', help='Create users missing from the database')
+        parser.add_argument('--default-owner', help='Owner of projects whose export lists no owner')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if options['resume'] and not options['checkpoint']:
+            raise CommandError('--resume requires --checkpoint.')
+
+        importer = ProjectImporter(
+            batch_size=options['batch_size'],
+            create_users=options['create_users'],
+            default_owner=options['default_owner'],
+            checkpoint_path=options['checkpoint'],
+            progress=self.report,
+        )
+        try:
+            if options['input'] == '-':
+                stats = importer.run(sys.stdin, resume=options['resume'])
+            else:
+                with open(options['input'], encoding='utf-8') as lines:
+                    stats = importer.run(lines, resume=options['resume'])
+        except (ImportFormatError, OSError) as exc:
+            raise CommandError(str(exc))
+
+        if stats['skipped_projects'] or stats['skipped_records'] or stats['owners_demoted']:
+            self.stderr.write(self.style.WARNING(
+                f"Skipped {stats['skipped_projects']} project(s) without an owner and "
+                f"{stats['skipped_records']} record(s); imported {stats['owners_demoted']} extra owner(s) as editors."
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['projects']} project(s), {stats['members']} member(s) and "
+            f"{stats['comments']} comment(s); created {stats['users_created']} user(s)."
+        ))
+
+    def report(self, stats, rows_per_second):
+        if self.verbosity >= 1:
+            self.stdout.write(
+                f"Line {stats['lines']}: {stats['projects']} projects, {stats['members']} members, "
+                f"{stats['comments']} comments ({rows_per_second:,.0f} rows/s)"
+            )
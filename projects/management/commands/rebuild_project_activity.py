@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized comment_count and last_activity_at of projects from their comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_ids', nargs='*', type=int, help='Only rebuild these projects')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['project_ids']:
+            projects = projects.filter(pk__in=options['project_ids'])
+        updated = projects.rebuild_activity()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt activity for {updated} project(s).'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from projects import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of project titles, descriptions and comments.'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Full-text search requires the SQLite database backend.')
+        with transaction.atomic():
+            rows = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {rows} row(s).'))
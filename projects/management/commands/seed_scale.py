@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.seed import BATCH_SIZE, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset of users, projects, memberships and comments for load tests. '
+        'The same --seed always produces the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--projects', type=int, default=500)
+        parser.add_argument('--members', type=int, default=15, help='Average members per project')
+        parser.add_argument('--comments', type=int, default=100, help='Average comments per project')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows written per transaction')
+        parser.add_argument('--password', default='password', help='Password of every generated user')
+        parser.add_argument('--prefix', default='seed', help='Prefix of the generated usernames')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1.')
+        for option in ('projects', 'members', 'comments'):
+            if options[option] < 0:
+                raise CommandError(f'--{option} cannot be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        verbosity = options['verbosity']
+
+        def report(stats):
+            if verbosity >= 2:
+                self.stdout.write(
+                    f"{stats['projects']} projects, {stats['memberships']} memberships, {stats['comments']} comments"
+                )
+
+        started = time.monotonic()
+        stats = Seeder(
+            users=options['users'],
+            projects=options['projects'],
+            members=options['members'],
+            comments=options['comments'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+            prefix=options['prefix'],
+            progress=report,
+        ).run()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['users']} user(s), {stats['projects']} project(s), "
+            f"{stats['memberships']} membership(s) and {stats['comments']} comment(s) in {elapsed:.1f}s."
+        ))
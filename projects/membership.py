@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import ProjectUser
+
+
+class MembershipCache:
+    """
+    Bounded, thread-safe LRU cache of ``{user_id: {project_id: role}}``.
+
+    Entries are dropped by the ``ProjectUser`` signal handlers whenever a
+    membership changes. The TTL bounds how long another process's cache
+    (which never sees this process's signals) can serve a stale role.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a load that raced with a write
+        # does not store what it read before the write.
+        self._invalidations = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            roles, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return roles
+
+    def set(self, user_id, roles, generation):
+        with self._lock:
+            if generation != self._invalidations:
+                return
+            self._entries[user_id] = (roles, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def generation(self):
+        return self._invalidations
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def query_project_roles(user_id):
+    """
+    The ``(project_id, role)`` rows of ``user_id``, uncached. Always from the
+    primary, even while a read-only action is served from the replica: a
+    lagging replica would put a removed member's role back into the cache,
+    and write actions check permissions against it.
+    """
+    return ProjectUser.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).values_list('project_id', 'role')
+
+
+membership_cache = MembershipCache(
+    maxsize=getattr(settings, 'PROJECT_ROLE_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'PROJECT_ROLE_CACHE_TTL', 60),
+)
+
+
+def load_project_roles(user):
+    """
+    Return ``{project_id: role}`` for ``user``, from the cache when possible.
+    """
+    if user.pk is None:
+        return {}
+
+    roles = membership_cache.get(user.pk)
+    if roles is None:
+        generation = membership_cache.generation()
+        roles = dict(query_project_roles(user.pk))
+        membership_cache.set(user.pk, roles, generation)
+    return roles
+
+
+async def aload_project_roles(user):
+    # Same as load_project_roles() for async views
+    if user.pk is None:
+        return {}
+
+    roles = membership_cache.get(user.pk)
+    if roles is None:
+        generation = membership_cache.generation()
+        roles = {project_id: role async for project_id, role in query_project_roles(user.pk)}
+        membership_cache.set(user.pk, roles, generation)
+    return roles
+
+
+def get_project_roles(request):
+    """
+    Return the requesting user's ``{project_id: role}`` map, resolved at most
+    once per request.
+    """
+    # Store on the underlying HttpRequest so DRF and plain Django views share it
+    http_request = getattr(request, '_request', request)
+    roles = getattr(http_request, '_project_roles', None)
+    if roles is None:
+        roles = load_project_roles(request.user)
+        http_request._project_roles = roles
+    return roles
+
+
+async def aget_project_roles(request):
+    """
+    Async counterpart of get_project_roles(); later sync calls for the same
+    request reuse the map it stores.
+    """
+    http_request = getattr(request, '_request', request)
+    roles = getattr(http_request, '_project_roles', None)
+    if roles is None:
+        roles = await aload_project_roles(request.user)
+        http_request._project_roles = roles
+    return roles
+
+
+def get_project_role(request, project_id):
+    return get_project_roles(request).get(project_id)
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_alter_project_description'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectuser',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_projectuser_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projectuser',
+            index=models.Index(fields=['project', 'role'], name='projectuser_project_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectuser',
+            index=models.Index(fields=['user', 'project', 'role'], name='projectuser_user_proj_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['project', 'created_at', 'id'], name='comment_project_created_idx'),
+        ),
+    ]
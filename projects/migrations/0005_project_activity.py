@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:20
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def populate_activity(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    Comment = apps.get_model('projects', 'Comment')
+    comments = Comment.objects.filter(project=OuterRef('pk')).order_by().values('project')
+    Project.objects.update(
+        comment_count=Coalesce(Subquery(comments.annotate(count=Count('id')).values('count')), 0),
+        last_activity_at=Coalesce(
+            Subquery(comments.annotate(latest=Max('created_at')).values('latest')),
+            F('created_at'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_add_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(populate_activity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['last_activity_at', 'id'], name='project_last_activity_idx'),
+        ),
+    ]
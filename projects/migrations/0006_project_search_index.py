@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:05
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite specific; other databases go without search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # rowid is (project_id << 32) | comment_id, with comment_id 0 for the
+    # project's own title and description
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE projects_search USING fts5("
+        "title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO projects_search (rowid, title, body) "
+        "SELECT id << 32, title, description FROM projects_project"
+    )
+    schema_editor.execute(
+        "INSERT INTO projects_search (rowid, title, body) "
+        "SELECT (project_id << 32) | id, '', text FROM projects_comment"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS projects_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_project_activity'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,5 +1,43 @@
 from django.db import models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+class ProjectQuerySet(models.QuerySet):
+    def for_member(self, user_id):
+        """
+        The projects ``user_id`` is a member of, selected with a subquery so
+        the SQL does not grow with the number of projects.
+        """
+        return self.filter(pk__in=ProjectUser.objects.filter(user_id=user_id).values('project_id'))
+
+    def with_owner(self):
+        """
+        Prefetch the owner membership (and its user) in a single extra query.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                'projectuser_set',
+                queryset=ProjectUser.objects.filter(role=ProjectUser.OWNER).select_related('user'),
+                to_attr='owner_memberships',
+            )
+        )
+
+    def rebuild_activity(self):
+        """
+        Recompute ``comment_count`` and ``last_activity_at`` from the comments
+        table with a single UPDATE. Returns the number of projects updated.
+        """
+        comments = Comment.objects.filter(project=OuterRef('pk')).order_by().values('project')
+        return self.update(
+            comment_count=Coalesce(Subquery(comments.annotate(count=Count('id')).values('count')), 0),
+            last_activity_at=Coalesce(
+                Subquery(comments.annotate(latest=Max('created_at')).values('latest')),
+                F('created_at'),
+            ),
+        )
 
 
 class Project(models.Model):
@@ -7,12 +45,28 @@ class Project(models.Model):
     description = models.TextField(max_length=500)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized from Comment; kept in sync by the Comment signal handlers
+    # and rebuilt by the rebuild_project_activity command
+    comment_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(default=timezone.now)
+
+    objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The project list sorted by activity
+            models.Index(fields=['last_activity_at', 'id'], name='project_last_activity_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
     @property
     def owner(self):
+        # Use the owner membership prefetched by ProjectQuerySet.with_owner()
+        # when available, so serializing a list costs no per-row query.
+        if hasattr(self, 'owner_memberships'):
+            return self.owner_memberships[0].user if self.owner_memberships else None
         try:
             return self.projectuser_set.get(role=ProjectUser.OWNER).user
         except ProjectUser.DoesNotExist:
@@ -34,9 +88,16 @@ class ProjectUser(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['project', 'user']
+        indexes = [
+            # Owner lookups: project=? AND role='owner'
+            models.Index(fields=['project', 'role'], name='projectuser_project_role_idx'),
+            # A user's {project: role} map, answered from the index alone
+            models.Index(fields=['user', 'project', 'role'], name='projectuser_user_proj_role_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.project.title} ({self.role})"
@@ -47,6 +108,35 @@ class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField(max_length=300)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # A project's comments in (created_at, id) keyset order
+            models.Index(fields=['project', 'created_at', 'id'], name='comment_project_created_idx'),
+        ]
     
     def __str__(self):
-        return f"Comment by {self.user.username} on {self.project.title}" 
\ No newline at end of file
+        return f"Comment by {self.user.username} on {self.project.title}" 
+
+class ProjectTombstone(models.Model):
+    """
+    A project that left a user's list: deleted, or the user's membership
+    removed. Read by the changes endpoint (see projects.changes) and deleted
+    by the compact_project_changes command once older than
+    ``PROJECT_CHANGES_RETENTION``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Not a foreign key: the project is usually gone
+    project_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # A user's tombstones since a sync token
+            models.Index(fields=['user', 'created_at'], name='tombstone_user_created_idx'),
+            # Compaction
+            models.Index(fields=['created_at'], name='tombstone_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Project {self.project_id} removed for user {self.user_id}"
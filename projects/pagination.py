@@ -0,0 +1,226 @@
+import json
+import operator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import reduce
+from types import SimpleNamespace
+
+from django.db.models import Max, Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor pagination over a unique, ordered key such as
+    ``(created_at, id)``.
+
+    Each page is fetched with a ``WHERE key > last_seen ORDER BY key LIMIT n``
+    query, so page N costs the same as page 1 and no OFFSET scan is needed.
+    Views may override the key by setting ``pagination_ordering``; fields
+    prefixed with ``-`` are walked in descending order. ``base_url`` may be
+    set when a page is embedded in another resource, so that ``next`` points
+    at the endpoint the rest of the list is served from.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = _('Invalid cursor')
+    base_url = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request, view)))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        self.model = queryset.model
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        # Fetch one extra row to find out whether there is a next page
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+
+        return self.page_size
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'pagination_ordering', self.ordering))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.base_url or self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_keyset_filter(self, position):
+        """
+        Build ``(a, b, c) > (x, y, z)`` as
+        ``a >= x AND (a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z))``.
+
+        The redundant ``a >= x`` bound lets SQLite seek the index on the
+        leading key instead of scanning and filtering.
+        """
+        conditions = []
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            conditions.append(equal & Q(**{f'{name}__{lookup}': value}))
+            equal &= Q(**{name: value})
+
+        first = self.ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+        return bound & reduce(operator.or_, conditions)
+
+    def encode_cursor(self, instance):
+        if isinstance(instance, dict):
+            # A values() row
+            instance = SimpleNamespace(**instance)
+        position = [
+            self.model._meta.get_field(field.lstrip('-')).value_to_string(instance)
+            for field in self.ordering
+        ]
+        return self.encode_position(position)
+
+    def encode_position(self, position):
+        return urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        return self.decode_position(request.query_params.get(self.cursor_query_param))
+
+    def decode_position(self, encoded, ordering=None):
+        if encoded is None:
+            return None
+
+        ordering = ordering or self.ordering
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            position = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(position, list) or len(position) != len(ordering):
+                raise ValueError
+            return [
+                self.model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, position)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+
+class SinceCursorPagination(KeysetPagination):
+    """
+    KeysetPagination whose pages also carry ``after``, a position in id
+    order. ``?after=<position>`` returns only the rows with a greater id, so
+    a client that has loaded the whole list fetches just the rows added
+    since instead of the list again.
+
+    Ids rather than ``created_at`` mark what is new: a row is stamped before
+    its transaction commits, so it may become visible after rows stamped
+    later, but SQLite, which serializes writers, hands out ids in commit
+    order.
+
+    The first page of the list carries the newest id at the time it was
+    read, and later pages carry no ``after``. A page of ``?after=`` is walked
+    in id order and carries the last id it returned, or the request's
+    position when it is empty; its ``next`` link is another ``?after=``, and
+    the client keeps the last ``after``. Rows on the pages loaded after the first may come again,
+    so clients skip the ids they already have.
+    """
+    after_query_param = 'after'
+    after_ordering = ('id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.newest = None
+        if self.is_first_page(request):
+            # Before the page, so every row up to it is on one of the pages
+            self.newest = queryset.aggregate(newest=Max('id'))['newest']
+        return super().paginate_queryset(queryset, request, view)
+
+    def is_first_page(self, request):
+        params = request.query_params
+        return self.cursor_query_param not in params and self.after_query_param not in params
+
+    def is_after(self):
+        return self.after_query_param in self.request.query_params
+
+    def get_ordering(self, view):
+        if self.is_after():
+            return self.after_ordering
+        return super().get_ordering(view)
+
+    def decode_cursor(self, request):
+        position = super().decode_cursor(request)
+        if position is None and self.is_after():
+            position = self.decode_position(request.query_params[self.after_query_param])
+        return position
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['after'] = self.get_after()
+        response.data.move_to_end('results')
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'] = {
+            'next': response_schema['properties']['next'],
+            'after': {'type': 'string', 'nullable': True},
+            'results': schema,
+        }
+        return response_schema
+
+    def get_after(self):
+        if not self.is_after():
+            return None if self.newest is None else self.encode_position([str(self.newest)])
+        if self.page:
+            return self.encode_cursor(self.page[-1])
+        params = self.request.query_params
+        return params.get(self.cursor_query_param) or params.get(self.after_query_param)
+
+    def get_next_link(self):
+        link = super().get_next_link()
+        if link and self.is_after():
+            # In id order the last row's position is the next ``after``
+            link = replace_query_param(link, self.after_query_param, self.encode_cursor(self.page[-1]))
+            link = remove_query_param(link, self.cursor_query_param)
+        return link
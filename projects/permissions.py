@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from .models import ProjectUser
+from .membership import get_project_role
 
 
 class IsProjectOwner(permissions.BasePermission):
@@ -7,10 +8,7 @@ class IsProjectOwner(permissions.BasePermission):
     Custom permission to only allow owners of a project to perform certain actions.
     """
     def has_object_permission(self, request, view, obj):
-        try:
-            return obj.projectuser_set.get(user=request.user).role == ProjectUser.OWNER
-        except ProjectUser.DoesNotExist:
-            return False
+        return get_project_role(request, obj.pk) == ProjectUser.OWNER
 
 
 class IsProjectOwnerOrEditor(permissions.BasePermission):
@@ -18,11 +16,7 @@ class IsProjectOwnerOrEditor(permissions.BasePermission):
     Custom permission to allow owners and editors of a project to perform certain actions.
     """
     def has_object_permission(self, request, view, obj):
-        try:
-            role = obj.projectuser_set.get(user=request.user).role
-            return role in [ProjectUser.OWNER, ProjectUser.EDITOR]
-        except ProjectUser.DoesNotExist:
-            return False
+        return get_project_role(request, obj.pk) in [ProjectUser.OWNER, ProjectUser.EDITOR]
 
 
 class HasProjectAccess(permissions.BasePermission):
@@ -30,7 +24,4 @@ class HasProjectAccess(permissions.BasePermission):
     Custom permission to allow users with any role to access a project.
     """
     def has_object_permission(self, request, view, obj):
-        try:
-            return obj.projectuser_set.filter(user=request.user).exists()
-        except:
-            return False 
\ No newline at end of file
+        return get_project_role(request, obj.pk) is not None
\ No newline at end of file
@@ -0,0 +1,142 @@
+import re
+
+from django.db import connection
+
+# FTS5 index over project titles/descriptions and comment texts. The rowid
+# packs the project id into the high 32 bits and the comment id (0 for the
+# project's own row) into the low 32 bits, so access checks and project
+# deletes work on the rowid alone without reading any stored column.
+# Comment ids must stay below 2**32.
+TABLE = 'projects_search'
+PROJECT_SHIFT = 32
+COMMENT_MASK = (1 << PROJECT_SHIFT) - 1
+# Title matches count ten times as much as body matches
+WEIGHTS = (10.0, 1.0)
+MAX_TERMS = 16
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available():
+    # The index is only created on SQLite (see migration 0006)
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(q):
+    """
+    Turn free text into an FTS5 query: every word must match and the last
+    one matches as a prefix, so partially typed words still find results.
+    Operators and quotes in the input are never passed through.
+    """
+    terms = _TERM_RE.findall(q or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    quoted = ['"%s"' % term for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def make_rowid(project_id, comment_id=0):
+    return (project_id << PROJECT_SHIFT) | comment_id
+
+
+def _upsert(rowid, title, body):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+            [rowid, title, body],
+        )
+
+
+def index_project(project):
+    if is_available():
+        _upsert(make_rowid(project.pk), project.title, project.description)
+
+
+def index_many(projects=(), comments=()):
+    """Index rows written with bulk_create(), which sends no signals."""
+    if not is_available():
+        return
+    rows = [(make_rowid(p.pk), p.title, p.description) for p in projects]
+    rows += [(make_rowid(c.project_id, c.pk), '', c.text) for c in comments]
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT OR REPLACE INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)', rows)
+
+
+def remove_project(project_id):
+    """Remove a project together with all of its comments."""
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid BETWEEN %s AND %s',
+                [make_rowid(project_id), make_rowid(project_id, COMMENT_MASK)],
+            )
+
+
+def index_comment(comment):
+    if is_available():
+        _upsert(make_rowid(comment.project_id, comment.pk), '', comment.text)
+
+
+def remove_comment(comment):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [make_rowid(comment.project_id, comment.pk)])
+
+
+def rebuild():
+    """Repopulate the whole index from the projects and comments tables."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, title, body) '
+            f'SELECT id << {PROJECT_SHIFT}, title, description FROM projects_project'
+        )
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, title, body) '
+            f"SELECT (project_id << {PROJECT_SHIFT}) | id, '', text FROM projects_comment"
+        )
+        # Merge the index b-trees so queries touch as few pages as possible
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def search(user, q, limit):
+    """
+    Best matches first, ranked with bm25 (title matches weigh more than body
+    matches), restricted to projects ``user`` is a member of.
+    """
+    match = build_match_query(q)
+    if match is None:
+        return []
+
+    # Ordering by bm25() rather than the built-in rank column lets SQLite
+    # drop inaccessible rows before scoring them. The membership subquery is
+    # answered from the (user, project, role) index.
+    bm25 = f'bm25({TABLE}, %s, %s)' % WEIGHTS
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT m.rowid, p.title, m.snippet, m.score FROM ('
+            f"SELECT rowid, snippet({TABLE}, -1, '', '', '…', 12) AS snippet, {bm25} AS score "
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s '
+            f'AND (rowid >> {PROJECT_SHIFT}) IN (SELECT project_id FROM projects_projectuser WHERE user_id = %s) '
+            f'ORDER BY {bm25} LIMIT %s'
+            f') m JOIN projects_project p ON p.id = m.rowid >> {PROJECT_SHIFT} '
+            f'ORDER BY m.score',
+            [match, user.pk, limit],
+        )
+        rows = cursor.fetchall()
+
+    results = []
+    for rowid, title, snippet, score in rows:
+        comment_id = rowid & COMMENT_MASK
+        results.append({
+            'type': 'comment' if comment_id else 'project',
+            'project': rowid >> PROJECT_SHIFT,
+            'project_title': title,
+            'comment': comment_id or None,
+            'snippet': snippet,
+            'rank': score,
+        })
+    return results
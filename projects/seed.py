@@ -0,0 +1,167 @@
+import math
+import random
+from itertools import accumulate
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .importer import bulk_create
+from .models import Comment, Project, ProjectUser
+
+BATCH_SIZE = 5000
+# Share of the non-owner members who are editors; the rest are readers
+EDITOR_SHARE = 0.15
+# Zipf exponent of user popularity: a few users are in many projects
+USER_SKEW = 1.1
+HISTORY_DAYS = 365
+
+WORDS = (
+    'deadline release review design budget sprint backlog client launch bug fix test deploy meeting '
+    'roadmap feature feedback estimate milestone report draft update migration api database cache '
+    'performance security invoice contract schedule priority blocker handoff onboarding'
+).split()
+
+
+def _sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, words))).capitalize() + '.'
+
+
+def _lognormal_count(rng, mean, upper):
+    # Most projects are small and a few are large, averaging about ``mean``
+    if mean <= 0:
+        return 0
+    sigma = 1.0
+    count = int(rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma))
+    return max(1, min(upper, count))
+
+
+def _pick_members(rng, user_ids, cum_weights, count):
+    # Weighted sampling without replacement, topped up uniformly when the
+    # popular users keep being drawn
+    chosen = {}
+    for _ in range(5):
+        if len(chosen) >= count:
+            break
+        for user_id in rng.choices(user_ids, cum_weights=cum_weights, k=count - len(chosen)):
+            chosen.setdefault(user_id, None)
+    if len(chosen) < count:
+        rest = [user_id for user_id in user_ids if user_id not in chosen]
+        for user_id in rng.sample(rest, count - len(chosen)):
+            chosen.setdefault(user_id, None)
+    return list(chosen)[:count]
+
+
+class Seeder:
+    """
+    Generate a synthetic dataset with ``bulk_create``: ``users`` users,
+    ``projects`` projects with about ``members`` members and ``comments``
+    comments each on average. Membership follows a Zipf-like popularity of
+    users, every project has one owner, ``EDITOR_SHARE`` of the other members
+    are editors, and comments are written by owners and editors. The same
+    ``seed`` produces the same dataset.
+    """
+
+    def __init__(self, users, projects, members, comments, seed=0, batch_size=BATCH_SIZE,
+                 password='password', prefix='seed', progress=None):
+        self.users = users
+        self.projects = projects
+        self.members = members
+        self.comments = comments
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.password = password
+        self.prefix = prefix
+        self.progress = progress
+        self.stats = {'users': 0, 'projects': 0, 'memberships': 0, 'comments': 0}
+
+    def run(self):
+        user_ids = self._create_users()
+        self._create_projects(user_ids)
+        return self.stats
+
+    def _create_users(self):
+        # Hashing is slow on purpose, so every user shares one hash
+        password = make_password(self.password)
+        start = User.objects.filter(username__startswith=self.prefix).count()
+        now = timezone.now()
+        users = [
+            User(username=f'{self.prefix}{start + i}', email=f'{self.prefix}{start + i}@example.com',
+                 first_name='Seed', last_name=f'User {start + i}', password=password, date_joined=now)
+            for i in range(self.users)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=self.batch_size)
+        self.stats['users'] = len(users)
+        return [user.pk for user in users]
+
+    def _create_projects(self, user_ids):
+        rng = self.rng
+        cum_weights = list(accumulate(1 / (rank + 1) ** USER_SKEW for rank in range(len(user_ids))))
+        now = timezone.now()
+        batch = []
+        rows = 0
+        for n in range(self.projects):
+            created_at = now - timedelta(seconds=rng.uniform(0, HISTORY_DAYS * 86400))
+            project = Project(
+                title=_sentence(rng, 6).rstrip('.'), description=_sentence(rng, 40),
+                created_at=created_at, updated_at=created_at, last_activity_at=created_at,
+            )
+            member_ids = _pick_members(rng, user_ids, cum_weights, _lognormal_count(rng, self.members, len(user_ids)))
+            memberships = []
+            writers = []
+            for position, user_id in enumerate(member_ids):
+                if position == 0:
+                    role = ProjectUser.OWNER
+                elif rng.random() < EDITOR_SHARE:
+                    role = ProjectUser.EDITOR
+                else:
+                    role = ProjectUser.READER
+                if role != ProjectUser.READER:
+                    writers.append(user_id)
+                # The owner joins when the project is created, the others later
+                joined = created_at
+                if position:
+                    joined += timedelta(seconds=rng.uniform(0, (now - created_at).total_seconds()))
+                memberships.append(ProjectUser(user_id=user_id, role=role, created_at=joined, updated_at=joined))
+
+            span = (now - created_at).total_seconds()
+            count = int(rng.expovariate(1 / self.comments)) if self.comments > 0 else 0
+            offsets = sorted(rng.uniform(0, span) for _ in range(count))
+            comments = [
+                Comment(user_id=rng.choice(writers), text=_sentence(rng, 30)[:300],
+                        created_at=created_at + timedelta(seconds=offset))
+                for offset in offsets
+            ]
+
+            batch.append((project, memberships, comments))
+            rows += 1 + len(memberships) + len(comments)
+            if rows >= self.batch_size or n == self.projects - 1:
+                self._write(batch)
+                batch, rows = [], 0
+
+    def _write(self, batch):
+        with transaction.atomic():
+            projects = [project for project, _, _ in batch]
+            bulk_create(Project, projects)
+            memberships, comments = [], []
+            for project, project_memberships, project_comments in batch:
+                for row in project_memberships + project_comments:
+                    row.project = project
+                memberships += project_memberships
+                comments += project_comments
+            bulk_create(ProjectUser, memberships, batch_size=self.batch_size)
+            bulk_create(Comment, comments, batch_size=self.batch_size)
+            # bulk_create() sends no signals
+            Project.objects.filter(pk__in=[project.pk for project in projects]).rebuild_activity()
+            search.index_many(projects, comments)
+
+        self.stats['projects'] += len(projects)
+        self.stats['memberships'] += len(memberships)
+        self.stats['comments'] += len(comments)
+        if self.progress is not None:
+            self.progress(self.stats)
+
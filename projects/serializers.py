@@ -1,21 +1,40 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Project, ProjectUser, Comment
+from .fieldsets import SparseFieldsMixin
+from .membership import get_project_role
 from users.serializers import UserSerializer
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
+    role = serializers.SerializerMethodField()
+    expandable = ('owner',)
     
     class Meta:
         model = Project
-        fields = ['id', 'title', 'description', 'created_at', 'updated_at', 'owner']
-        read_only_fields = ['created_at', 'updated_at']
+        fields = [
+            'id', 'title', 'description', 'created_at', 'updated_at',
+            'comment_count', 'last_activity_at', 'owner', 'role',
+        ]
+        read_only_fields = ['created_at', 'updated_at', 'comment_count', 'last_activity_at']
 
+    def get_role(self, obj):
+        # The requesting user's role, from the per-request membership map
+        request = self.context.get('request')
+        if request is None:
+            return None
+        return get_project_role(request, obj.pk)
 
-class ProjectUserSerializer(serializers.ModelSerializer):
+    def collapsed_field(self, name):
+        return serializers.IntegerField(source='owner.id', read_only=True, allow_null=True)
+
+
+class ProjectUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
     user_details = UserSerializer(source='user', read_only=True)
+    # Left out unless expanded: ``user`` already has the id
+    expandable = ('user_details',)
     
     class Meta:
         model = ProjectUser
@@ -26,8 +45,9 @@ class ProjectUserSerializer(serializers.ModelSerializer):
         }
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    expandable = ('user',)
     
     class Meta:
         model = Comment
@@ -35,4 +55,7 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'user']
         extra_kwargs = {
             'project': {'required': False}
-        } 
\ No newline at end of file
+        } 
+
+    def collapsed_field(self, name):
+        return serializers.IntegerField(source='user_id', read_only=True)
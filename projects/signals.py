@@ -0,0 +1,213 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import search
+from .changes import record_removals
+from .events import hub
+from .list_cache import invalidate_projects, invalidate_users
+from .membership import membership_cache
+from .models import Comment, Project, ProjectUser
+from .serializers import CommentSerializer, ProjectUserSerializer
+
+# Sent with ``project``, ``user_ids`` and the changed ``memberships`` after
+# bulk writes to ProjectUser that bypass post_save (bulk_create / bulk_update).
+memberships_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=ProjectUser)
+def invalidate_membership_cache(sender, instance, **kwargs):
+    user_id = instance.user_id
+    membership_cache.invalidate(user_id)
+    # Invalidate again on commit so a request that read the old rows while
+    # the transaction was open cannot leave them cached.
+    transaction.on_commit(lambda: membership_cache.invalidate(user_id))
+
+
+@receiver(memberships_changed)
+def invalidate_bulk_membership_cache(sender, project, user_ids, **kwargs):
+    user_ids = list(user_ids)
+    for user_id in user_ids:
+        membership_cache.invalidate(user_id)
+
+    def invalidate_on_commit():
+        for user_id in user_ids:
+            membership_cache.invalidate(user_id)
+    transaction.on_commit(invalidate_on_commit)
+
+
+def _is_project_delete(origin):
+    # ``origin`` is the instance or queryset whose delete() caused the cascade
+    return isinstance(origin, Project) or (isinstance(origin, QuerySet) and origin.model is Project)
+
+
+def _is_user_delete(origin):
+    return isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User)
+
+
+# Project lists cached per user (see list_cache): bump the lists of the
+# users who see what changed
+
+@receiver(post_save, sender=Project)
+def invalidate_project_lists(sender, instance, **kwargs):
+    invalidate_projects([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def invalidate_project_lists_comment_added(sender, instance, **kwargs):
+    invalidate_projects([instance.project_id])
+
+
+@receiver(post_delete, sender=Comment)
+def invalidate_project_lists_comment_deleted(sender, instance, origin=None, **kwargs):
+    # The deleted project's memberships take care of it
+    if _is_project_delete(origin):
+        return
+    invalidate_projects([instance.project_id])
+
+
+@receiver([post_save, post_delete], sender=ProjectUser)
+def invalidate_project_lists_membership(sender, instance, origin=None, **kwargs):
+    if _is_project_delete(origin):
+        invalidate_users([instance.user_id])
+        return
+    # The member gains or loses the project; an owner change shows in every list
+    invalidate_projects([instance.project_id], also=[instance.user_id])
+
+
+@receiver(memberships_changed)
+def invalidate_bulk_project_lists(sender, project, user_ids, **kwargs):
+    invalidate_projects([project.pk], also=user_ids)
+
+
+@receiver(post_save, sender=User)
+def invalidate_owner_project_lists(sender, instance, created, update_fields=None, **kwargs):
+    # Lists embed each project's owner; logging in only updates last_login
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    owned = ProjectUser.objects.filter(user=instance, role=ProjectUser.OWNER).values_list('project_id', flat=True)
+    invalidate_projects(owned)
+
+
+# Tombstones for the changes endpoint (see changes)
+
+@receiver(pre_delete, sender=Project)
+def record_project_removals(sender, instance, **kwargs):
+    # One insert for all the members, before the cascade deletes them
+    record_removals(instance.pk, ProjectUser.objects.filter(project=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=ProjectUser)
+def record_membership_removal(sender, instance, origin=None, **kwargs):
+    # A deleted project records its members at once, and a deleted user
+    # syncs no more
+    if _is_project_delete(origin) or _is_user_delete(origin):
+        return
+    record_removals(instance.project_id, [instance.user_id])
+
+
+@receiver(post_save, sender=Comment)
+def record_comment_added(sender, instance, created, **kwargs):
+    if not created:
+        return
+    # Greatest() keeps the newest timestamp when comments race each other
+    Project.objects.filter(pk=instance.project_id).update(
+        comment_count=F('comment_count') + 1,
+        last_activity_at=Greatest('last_activity_at', Value(instance.created_at)),
+    )
+
+
+@receiver(post_delete, sender=Comment)
+def record_comment_deleted(sender, instance, origin=None, **kwargs):
+    # Nothing to keep in sync when the project itself is being deleted
+    if _is_project_delete(origin):
+        return
+    newest = Comment.objects.filter(project=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    Project.objects.filter(pk=instance.project_id).update(
+        comment_count=F('comment_count') - 1,
+        last_activity_at=Coalesce(Subquery(newest), F('created_at')),
+    )
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, **kwargs):
+    search.index_project(instance)
+
+
+@receiver(post_delete, sender=Project)
+def unindex_project(sender, instance, **kwargs):
+    search.remove_project(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, origin=None, **kwargs):
+    # A deleted project takes all of its comments out of the index at once
+    if _is_project_delete(origin):
+        return
+    search.remove_comment(instance)
+
+
+# Live events for the SSE stream, published once the change is committed. The
+# payload is only built if the hub keeps the project's events, which it never
+# does in a process without streams.
+
+def _publish_on_commit(project_id, type, get_data):
+    def publish():
+        if hub.is_listened(project_id):
+            hub.publish(project_id, type, get_data())
+    transaction.on_commit(publish)
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment(sender, instance, created, **kwargs):
+    if created:
+        _publish_on_commit(instance.project_id, 'comment', lambda: CommentSerializer(instance).data)
+
+
+@receiver(post_save, sender=ProjectUser)
+def publish_membership(sender, instance, **kwargs):
+    _publish_on_commit(instance.project_id, 'member', lambda: ProjectUserSerializer(instance).data)
+
+
+@receiver(post_delete, sender=ProjectUser)
+def publish_membership_removed(sender, instance, origin=None, **kwargs):
+    if _is_project_delete(origin):
+        return
+    project_id, user_id = instance.project_id, instance.user_id
+
+    def publish():
+        if hub.is_listened(project_id):
+            hub.publish(project_id, 'member_removed', {'project': project_id, 'user': user_id})
+        # The removed user may no longer read the project's events
+        hub.close(project_id, user_id)
+    transaction.on_commit(publish)
+
+
+@receiver(memberships_changed)
+def publish_bulk_memberships(sender, project, memberships=(), **kwargs):
+    project_id = project.pk
+
+    def publish():
+        if hub.is_listened(project_id):
+            for data in ProjectUserSerializer(memberships, many=True).data:
+                hub.publish(project_id, 'member', data)
+    transaction.on_commit(publish)
+
+
+@receiver(post_delete, sender=Project)
+def publish_project_deleted(sender, instance, **kwargs):
+    project_id = instance.pk
+
+    def publish():
+        hub.publish(project_id, 'project_deleted', {'project': project_id})
+        hub.close(project_id)
+        hub.discard(project_id)
+    transaction.on_commit(publish)
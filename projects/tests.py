@@ -1,10 +1,33 @@
+from datetime import timedelta
+
 import pytest
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from .models import Project, ProjectUser, Comment
+from core.throttling import buckets
+from .models import Project, ProjectTombstone, ProjectUser, Comment
+from .list_cache import project_list_cache
+from .membership import load_project_roles, membership_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_membership_cache():
+    # Rolled-back test data can reuse primary keys, so start every test cold
+    membership_cache.clear()
+    project_list_cache.clear()
+    yield
+    membership_cache.clear()
+    project_list_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_throttle_buckets():
+    buckets.clear()
+    yield
+    buckets.clear()
 
 
 @pytest.fixture
@@ -85,7 +108,7 @@ class TestProjectCRUD:
         response = api_client.get(url)
         
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 2  # User should see both projects
+        assert len(response.data['results']) == 2  # User should see both projects
     
     def test_retrieve_project(self, api_client, create_project):
         project, owner = create_project()
@@ -330,4 +353,1961 @@ class TestComments:
         response = api_client.get(url)
         
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 2 
\ No newline at end of file
+        assert len(response.data['results']) == 2 
+
+@pytest.mark.django_db
+class TestProjectQueryCount:
+    def _list_query_count(self, api_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = api_client.get(reverse('project-list'))
+        assert response.status_code == status.HTTP_200_OK
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self, api_client, create_project, create_user):
+        user = create_user()
+        api_client.force_authenticate(user=user)
+
+        create_project(title='Project 0', owner=user)
+        baseline = self._list_query_count(api_client)
+
+        for i in range(1, 20):
+            project, _ = create_project(title=f'Project {i}', owner=create_user(username=f'owner{i}'))
+            ProjectUser.objects.create(project=project, user=user, role=ProjectUser.READER)
+
+        assert self._list_query_count(api_client) == baseline
+
+    def test_list_includes_owner(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-list'))
+        assert response.data['results'][0]['owner']['username'] == owner.username
+
+    def test_sql_does_not_list_project_ids(self, api_client, create_project, create_user):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        user = create_user()
+        api_client.force_authenticate(user=user)
+        projects = [create_project(title=f'Project {i}', owner=user)[0] for i in range(3)]
+        ids = ', '.join(str(project.pk) for project in projects)
+
+        with CaptureQueriesContext(connection) as ctx:
+            assert len(api_client.get(reverse('project-list')).data['results']) == 3
+            assert api_client.get(reverse('project-detail', args=[projects[0].pk])).status_code == status.HTTP_200_OK
+        # Only the page's owners are looked up by id
+        project_queries = [query['sql'] for query in ctx.captured_queries if 'FROM "projects_project"' in query['sql']]
+        assert project_queries
+        assert not [sql for sql in project_queries if f'IN ({ids})' in sql]
+
+
+@pytest.mark.django_db
+class TestPagination:
+    def test_list_role_is_callers_role(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        reader = create_user(username='reader')
+        ProjectUser.objects.create(project=project, user=reader, role=ProjectUser.READER)
+
+        api_client.force_authenticate(user=reader)
+        response = api_client.get(reverse('project-list'))
+
+        assert [p['role'] for p in response.data['results']] == [ProjectUser.READER]
+
+    def test_comments_cursor_walks_all_pages(self, api_client, create_project):
+        project, owner = create_project()
+        comments = [Comment.objects.create(project=project, user=owner, text=f'Comment {i}') for i in range(7)]
+        # Identical timestamps must still be split deterministically by id
+        Comment.objects.filter(id__in=[c.id for c in comments[2:5]]).update(created_at=comments[2].created_at)
+
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-comments', args=[project.id]) + '?page_size=3'
+        seen = []
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data['results']) <= 3
+            seen.extend(c['id'] for c in response.data['results'])
+            url = response.data['next']
+
+        assert seen == [c.id for c in comments]
+
+    def test_invalid_cursor(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+
+        url = reverse('project-users', args=[project.id])
+        response = api_client.get(url, {'cursor': 'not-a-cursor'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+
+@pytest.mark.django_db
+class TestMembershipCache:
+    def test_warm_cache_costs_no_queries(self, create_project, django_assert_num_queries):
+        project, owner = create_project()
+
+        with django_assert_num_queries(1):
+            assert load_project_roles(owner) == {project.id: ProjectUser.OWNER}
+        with django_assert_num_queries(0):
+            assert load_project_roles(owner) == {project.id: ProjectUser.OWNER}
+
+    def test_permission_check_uses_warm_cache(self, api_client, create_project):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-detail', args=[project.id])
+
+        with CaptureQueriesContext(connection) as cold:
+            api_client.get(url)
+        with CaptureQueriesContext(connection) as warm:
+            response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(warm.captured_queries) == len(cold.captured_queries) - 1
+
+    def test_role_change_invalidates_cache(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        reader = create_user(username='reader')
+        ProjectUser.objects.create(project=project, user=reader, role=ProjectUser.READER)
+        url = reverse('project-add-comment', args=[project.id])
+
+        api_client.force_authenticate(user=reader)
+        response = api_client.post(url, {'text': 'Too early'}, format='json')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        api_client.force_authenticate(user=owner)
+        api_client.patch(reverse('project-update-role', args=[project.id, reader.id]), {'role': ProjectUser.EDITOR}, format='json')
+
+        api_client.force_authenticate(user=reader)
+        response = api_client.post(url, {'text': 'Now allowed'}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+
+    def test_cache_is_bounded(self):
+        from .membership import MembershipCache
+
+        cache = MembershipCache(maxsize=2, ttl=60)
+        for user_id in range(3):
+            cache.set(user_id, {}, cache.generation())
+
+        assert len(cache) == 2
+        assert cache.get(0) is None
+
+
+@pytest.mark.django_db
+class TestProjectOverview:
+    def test_overview_embeds_members_and_comments(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        editor = create_user(username='editor')
+        ProjectUser.objects.create(project=project, user=editor, role=ProjectUser.EDITOR)
+        Comment.objects.create(project=project, user=editor, text='Hello')
+
+        api_client.force_authenticate(user=owner)
+        response = api_client.get(reverse('project-overview', args=[project.id]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['title'] == project.title
+        assert response.data['role'] == ProjectUser.OWNER
+        assert [pu['user_details']['username'] for pu in response.data['users']['results']] == ['testuser', 'editor']
+        assert [c['text'] for c in response.data['comments']['results']] == ['Hello']
+
+    def test_overview_next_links_point_at_list_endpoints(self, api_client, create_project):
+        project, owner = create_project()
+        for i in range(3):
+            Comment.objects.create(project=project, user=owner, text=f'Comment {i}')
+
+        api_client.force_authenticate(user=owner)
+        response = api_client.get(reverse('project-overview', args=[project.id]), {'page_size': 2})
+
+        next_url = response.data['comments']['next']
+        assert reverse('project-comments', args=[project.id]) in next_url
+        assert len(api_client.get(next_url).data['results']) == 1
+
+    def test_overview_query_count_is_bounded(self, api_client, create_project, create_user, django_assert_max_num_queries):
+        project, owner = create_project()
+        for i in range(10):
+            member = create_user(username=f'member{i}')
+            ProjectUser.objects.create(project=project, user=member, role=ProjectUser.EDITOR)
+            Comment.objects.create(project=project, user=member, text=f'Comment {i}')
+
+        api_client.force_authenticate(user=owner)
+        # Project, owner, members page, comments page, the newest comment id
+        # and the membership map
+        with django_assert_max_num_queries(6):
+            api_client.get(reverse('project-overview', args=[project.id]))
+
+    def test_overview_requires_membership(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        api_client.force_authenticate(user=create_user(username='outsider'))
+
+        response = api_client.get(reverse('project-overview', args=[project.id]))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    def test_project_not_modified(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-detail', args=[project.id])
+
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response['ETag']
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response['ETag'] == etag
+
+        api_client.patch(url, {'title': 'Renamed'}, format='json')
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['title'] == 'Renamed'
+
+    def test_comments_not_modified_costs_one_query(self, api_client, create_project, django_assert_num_queries):
+        project, owner = create_project()
+        Comment.objects.create(project=project, user=owner, text='Comment 1')
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-comments', args=[project.id])
+
+        etag = api_client.get(url)['ETag']
+        with django_assert_num_queries(1):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        Comment.objects.create(project=project, user=owner, text='Comment 2')
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 2
+
+    def test_role_change_changes_users_etag(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        member = create_user(username='member')
+        ProjectUser.objects.create(project=project, user=member, role=ProjectUser.READER)
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-users', args=[project.id])
+
+        etag = api_client.get(url)['ETag']
+        api_client.patch(reverse('project-update-role', args=[project.id, member.id]), {'role': ProjectUser.EDITOR}, format='json')
+
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+    def test_list_changes_when_project_is_gained(self, api_client, create_project, create_user):
+        user = create_user()
+        create_project(title='Mine', owner=user)
+        api_client.force_authenticate(user=user)
+        url = reverse('project-list')
+
+        etag = api_client.get(url)['ETag']
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+        other, _ = create_project(title='Shared', owner=create_user(username='other'))
+        ProjectUser.objects.create(project=other, user=user, role=ProjectUser.READER)
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+    def test_deletions_are_not_hidden_by_if_modified_since(self, api_client, create_project, create_user):
+        from django.utils.http import http_date
+
+        project, owner = create_project()
+        member = create_user(username='member')
+        ProjectUser.objects.create(project=project, user=member, role=ProjectUser.READER)
+        first = Comment.objects.create(project=project, user=owner, text='Comment 1')
+        Comment.objects.create(project=project, user=owner, text='Comment 2')
+        api_client.force_authenticate(user=owner)
+        urls = [
+            reverse('project-list'),
+            reverse('project-users', args=[project.id]),
+            reverse('project-comments', args=[project.id]),
+        ]
+
+        assert 'Last-Modified' in api_client.get(reverse('project-detail', args=[project.id]))
+        for url in urls:
+            assert 'Last-Modified' not in api_client.get(url)
+
+        ProjectUser.objects.filter(user=member).delete()
+        first.delete()
+        since = http_date(timezone.now().timestamp() + 60)
+        for url in urls:
+            assert api_client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code == status.HTTP_200_OK
+
+    def test_role_change_is_not_hidden_by_if_modified_since(self, api_client, create_project, create_user):
+        from django.utils.http import http_date
+
+        project, owner = create_project()
+        member = create_user(username='member')
+        ProjectUser.objects.create(project=project, user=member, role=ProjectUser.READER)
+        api_client.force_authenticate(user=member)
+        url = reverse('project-detail', args=[project.id])
+        last_modified = api_client.get(url)['Last-Modified']
+
+        owner_client = APIClient()
+        owner_client.force_authenticate(user=owner)
+        owner_client.patch(reverse('project-update-role', args=[project.id, member.id]), {'role': ProjectUser.EDITOR},
+                           format='json')
+        # Last-Modified has a resolution of one second
+        promoted_at = timezone.now() + timedelta(seconds=2)
+        ProjectUser.objects.filter(user=member).update(updated_at=promoted_at)
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['role'] == ProjectUser.EDITOR
+        assert response['Last-Modified'] == http_date(promoted_at.timestamp())
+
+    def test_user_edits_change_etags(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        Comment.objects.create(project=project, user=owner, text='Comment 1')
+        api_client.force_authenticate(user=owner)
+        urls = [
+            reverse('project-list'),
+            reverse('project-detail', args=[project.id]),
+            reverse('project-users', args=[project.id]),
+            reverse('project-comments', args=[project.id]),
+        ]
+        etags = [api_client.get(url)['ETag'] for url in urls]
+
+        # Logging in changes nothing the responses show
+        owner.save(update_fields=['last_login'])
+        assert [api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code for url, etag in zip(urls, etags)] == [
+            status.HTTP_304_NOT_MODIFIED] * 4
+
+        owner.first_name = 'Renamed'
+        owner.save()
+        for url, etag in zip(urls, etags):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == status.HTTP_200_OK
+            assert 'Renamed' in response.content.decode()
+
+    def test_non_member_gets_404_not_304(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        api_client.force_authenticate(user=create_user(username='outsider'))
+
+        response = api_client.get(reverse('project-detail', args=[project.id]), HTTP_IF_NONE_MATCH='*')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestBulkMembership:
+    def test_bulk_add_users(self, api_client, create_project, create_user, django_assert_max_num_queries):
+        project, owner = create_project()
+        alice = create_user(username='alice')
+        bob = create_user(username='bob')
+        existing = create_user(username='existing')
+        ProjectUser.objects.create(project=project, user=existing, role=ProjectUser.READER)
+
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-bulk-add-users', args=[project.id])
+        data = {'users': ['alice', {'id': bob.id, 'role': ProjectUser.EDITOR}, 'existing', 'ghost', {'username': 'carol', 'role': 'owner'}]}
+
+        # Role map, project, user lookup, membership lookup, the insert and
+        # the members whose cached project lists go stale, plus the
+        # savepoint pair around them
+        with django_assert_max_num_queries(8):
+            response = api_client.post(url, data, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [r['status'] for r in response.data['results']] == ['added', 'added', 'error', 'error', 'error']
+        assert response.data['results'][0]['membership']['role'] == ProjectUser.READER
+        assert ProjectUser.objects.get(project=project, user=alice).role == ProjectUser.READER
+        assert ProjectUser.objects.get(project=project, user=bob).role == ProjectUser.EDITOR
+
+        # The membership cache is invalidated even though bulk_create sends no signals
+        api_client.force_authenticate(user=alice)
+        assert api_client.get(reverse('project-detail', args=[project.id])).status_code == status.HTTP_200_OK
+
+    def test_bulk_update_roles_protects_owner(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        members = [create_user(username=f'member{i}') for i in range(3)]
+        ProjectUser.objects.bulk_create([ProjectUser(project=project, user=m, role=ProjectUser.READER) for m in members])
+
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-bulk-update-roles', args=[project.id])
+        data = {'role': ProjectUser.EDITOR, 'users': [m.id for m in members] + [owner.id]}
+        response = api_client.post(url, data, format='json')
+
+        assert [r['status'] for r in response.data['results']] == ['updated', 'updated', 'updated', 'error']
+        assert response.data['results'][-1]['detail'] == "Cannot change the owner's role."
+        assert ProjectUser.objects.filter(project=project, role=ProjectUser.EDITOR).count() == 3
+        assert ProjectUser.objects.get(project=project, user=owner).role == ProjectUser.OWNER
+
+    def test_bulk_remove_users_protects_owner(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        members = [create_user(username=f'member{i}') for i in range(2)]
+        ProjectUser.objects.bulk_create([ProjectUser(project=project, user=m, role=ProjectUser.EDITOR) for m in members])
+
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-bulk-remove-users', args=[project.id])
+        response = api_client.post(url, ['member0', 'member1', owner.username], format='json')
+
+        assert [r['status'] for r in response.data['results']] == ['removed', 'removed', 'error']
+        assert list(ProjectUser.objects.filter(project=project).values_list('user', flat=True)) == [owner.id]
+
+    def test_bulk_actions_require_owner(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        editor = create_user(username='editor')
+        ProjectUser.objects.create(project=project, user=editor, role=ProjectUser.EDITOR)
+
+        api_client.force_authenticate(user=editor)
+        url = reverse('project-bulk-add-users', args=[project.id])
+        response = api_client.post(url, {'users': ['testuser']}, format='json')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestIndexes:
+    def _plan(self, queryset):
+        from django.db import connection
+
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def test_role_map_uses_covering_index(self):
+        plan = self._plan(ProjectUser.objects.filter(user_id=1).values_list('project_id', 'role'))
+        assert 'COVERING INDEX projectuser_user_proj_role_idx' in plan
+
+    def test_comment_page_needs_no_sort(self):
+        plan = self._plan(Comment.objects.filter(project_id=1).order_by('created_at', 'id')[:51])
+        assert 'comment_project_created_idx' in plan
+        assert 'TEMP B-TREE' not in plan
+
+    def test_comments_after_position_seeks_index(self):
+        from .pagination import SinceCursorPagination
+
+        paginator = SinceCursorPagination()
+        paginator.ordering = paginator.after_ordering
+        queryset = Comment.objects.filter(project_id=1).order_by(*paginator.ordering)
+        plan = self._plan(queryset.filter(paginator.get_keyset_filter([10]))[:51])
+        # The project_id index holds the rowid (id) as well
+        assert '(project_id=? AND rowid>?)' in plan
+        assert 'TEMP B-TREE' not in plan
+
+
+@pytest.mark.django_db
+class TestProjectActivity:
+    def test_add_comment_updates_activity(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+
+        api_client.post(reverse('project-add-comment', args=[project.id]), {'text': 'Hello'}, format='json')
+        api_client.post(reverse('project-add-comment', args=[project.id]), {'text': 'Again'}, format='json')
+
+        project.refresh_from_db()
+        newest = Comment.objects.filter(project=project).latest('created_at')
+        assert project.comment_count == 2
+        assert project.last_activity_at == newest.created_at
+
+        response = api_client.get(reverse('project-detail', args=[project.id]))
+        assert response.data['comment_count'] == 2
+        assert response.data['last_activity_at'] is not None
+
+    def test_delete_comment_updates_activity(self, create_project):
+        project, owner = create_project()
+        first = Comment.objects.create(project=project, user=owner, text='First')
+        second = Comment.objects.create(project=project, user=owner, text='Second')
+
+        second.delete()
+        project.refresh_from_db()
+        assert project.comment_count == 1
+        assert project.last_activity_at == first.created_at
+
+        first.delete()
+        project.refresh_from_db()
+        assert project.comment_count == 0
+        assert project.last_activity_at == project.created_at
+
+    def test_rebuild_command(self, create_project):
+        from django.core.management import call_command
+
+        project, owner = create_project()
+        comment = Comment.objects.create(project=project, user=owner, text='Comment')
+        Project.objects.filter(pk=project.pk).update(comment_count=7)
+
+        call_command('rebuild_project_activity', verbosity=0)
+        project.refresh_from_db()
+        assert project.comment_count == 1
+        assert project.last_activity_at == comment.created_at
+
+    def test_list_sorted_by_activity(self, api_client, create_project, create_user):
+        user = create_user()
+        quiet, _ = create_project(title='Quiet', owner=user)
+        busy, _ = create_project(title='Busy', owner=user)
+        newest, _ = create_project(title='Newest', owner=user)
+        Comment.objects.create(project=quiet, user=user, text='Latest activity')
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(reverse('project-list'), {'ordering': 'activity', 'page_size': 2})
+        assert [p['title'] for p in response.data['results']] == ['Quiet', 'Newest']
+
+        response = api_client.get(response.data['next'])
+        assert [p['title'] for p in response.data['results']] == ['Busy']
+
+    def test_new_comment_changes_list_etag(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-list')
+
+        etag = api_client.get(url)['ETag']
+        Comment.objects.create(project=project, user=owner, text='Comment')
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'][0]['comment_count'] == 1
+
+
+@pytest.mark.django_db
+class TestSearch:
+    def _search(self, api_client, q, **params):
+        response = api_client.get(reverse('project-search'), {'q': q, **params})
+        assert response.status_code == status.HTTP_200_OK
+        return response.data['results']
+
+    def test_finds_projects_and_comments(self, api_client, create_project):
+        project, owner = create_project(title='Apollo launch', description='Rocket schedule')
+        comment = Comment.objects.create(project=project, user=owner, text='The booster arrived today')
+        api_client.force_authenticate(user=owner)
+
+        results = self._search(api_client, 'apollo')
+        assert [(r['type'], r['project']) for r in results] == [('project', project.id)]
+
+        results = self._search(api_client, 'boost')
+        assert results[0]['type'] == 'comment'
+        assert results[0]['comment'] == comment.id
+        assert results[0]['project_title'] == 'Apollo launch'
+
+    def test_title_matches_rank_first(self, api_client, create_user, create_project):
+        user = create_user()
+        in_title, _ = create_project(title='Telescope', description='Optics', owner=user)
+        other, _ = create_project(title='Budget', description='Spend less on the telescope', owner=user)
+        api_client.force_authenticate(user=user)
+
+        results = self._search(api_client, 'telescope')
+        assert [r['project'] for r in results] == [in_title.id, other.id]
+
+    def test_only_accessible_projects(self, api_client, create_project, create_user):
+        create_project(title='Secret plans', owner=create_user(username='other'))
+        api_client.force_authenticate(user=create_user())
+
+        assert self._search(api_client, 'secret') == []
+
+    def test_index_follows_edits_and_deletes(self, api_client, create_project):
+        project, owner = create_project(title='Draft')
+        comment = Comment.objects.create(project=project, user=owner, text='Obsolete note')
+        api_client.force_authenticate(user=owner)
+
+        api_client.patch(reverse('project-detail', args=[project.id]), {'title': 'Final'}, format='json')
+        comment.delete()
+
+        assert self._search(api_client, 'draft') == []
+        assert self._search(api_client, 'obsolete') == []
+        assert len(self._search(api_client, 'final')) == 1
+
+    def test_project_delete_removes_its_comments(self, create_project):
+        from django.db import connection
+
+        project, owner = create_project()
+        Comment.objects.create(project=project, user=owner, text='One')
+        Comment.objects.create(project=project, user=owner, text='Two')
+        project.delete()
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM projects_search')
+            assert cursor.fetchone()[0] == 0
+
+    def test_query_syntax_is_escaped(self, api_client, create_project):
+        project, owner = create_project(title='Alpha')
+        api_client.force_authenticate(user=owner)
+
+        # Operators are searched as plain words instead of failing the query
+        assert self._search(api_client, 'alpha" OR NEAR(') == []
+        assert len(self._search(api_client, '"alph*')) == 1
+        assert self._search(api_client, '"*') == []
+        assert api_client.get(reverse('project-search')).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_rebuild_command(self, api_client, create_project):
+        from django.core.management import call_command
+        from django.db import connection
+
+        project, owner = create_project(title='Rebuilt')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM projects_search')
+        api_client.force_authenticate(user=owner)
+        assert self._search(api_client, 'rebuilt') == []
+
+        call_command('rebuild_search_index', verbosity=0)
+        assert len(self._search(api_client, 'rebuilt')) == 1
+
+
+class TestEventHub:
+    def test_publish_and_resume(self):
+        from .events import EventHub
+
+        hub = EventHub(buffer_size=2, queue_size=10)
+        hub.touch(1)
+        first = hub.publish(1, 'comment', {'id': 1})
+        second = hub.publish(1, 'comment', {'id': 2})
+        hub.publish(2, 'comment', {'id': 3})
+
+        assert hub.events_since(1, first.id) == [second]
+        assert hub.events_since(1, second.id) == []
+        # Ids from another process cannot be resumed
+        assert hub.events_since(1, 'deadbeef-1') is None
+
+        hub.publish(1, 'comment', {'id': 4})
+        assert [event.data['id'] for event in hub.events_since(1, first.id)] == [2, 4]
+        hub.publish(1, 'comment', {'id': 5})
+        # `second` has been evicted too, so the events after `first` are incomplete
+        assert hub.events_since(1, first.id) is None
+
+    def test_delivers_to_subscribers_across_threads(self):
+        import asyncio
+        import threading
+
+        from .events import EventHub
+
+        hub = EventHub(buffer_size=10, queue_size=10)
+
+        async def receive():
+            subscription, missed = hub.subscribe(1)
+            assert missed == []
+            threading.Thread(target=hub.publish, args=(1, 'comment', {'id': 1})).start()
+            event = await asyncio.wait_for(subscription.queue.get(), 5)
+            hub.unsubscribe(subscription)
+            return event
+
+        assert asyncio.run(receive()).data == {'id': 1}
+        assert hub.subscriber_count() == 0
+
+    def test_slow_subscriber_is_reset(self):
+        import asyncio
+
+        from .events import EventHub
+
+        hub = EventHub(buffer_size=10, queue_size=1)
+
+        async def overflow():
+            subscription, _ = hub.subscribe(1)
+            hub.publish(1, 'comment', {'id': 1})
+            hub.publish(1, 'comment', {'id': 2})
+            await asyncio.sleep(0)
+            return subscription.overflowed
+
+        assert asyncio.run(overflow())
+
+    def test_keeps_only_listened_projects(self, monkeypatch):
+        from . import events
+
+        clock = [1000.0]
+        monkeypatch.setattr(events.time, 'monotonic', lambda: clock[0])
+        hub = events.EventHub(buffer_size=10, queue_size=10, idle_ttl=60)
+
+        dropped = hub.publish(1, 'comment', {'id': 1})
+        assert hub.events_since(1, dropped.id) is None
+        assert not hub._buffers
+
+        hub.touch(1)
+        first = hub.publish(1, 'comment', {'id': 2})
+        second = hub.publish(1, 'comment', {'id': 3})
+        assert hub.events_since(1, first.id) == [second]
+        assert hub.events_since(1, dropped.id) == [first, second]
+        # Events before `dropped` may have been dropped too
+        assert hub.events_since(1, f'{hub.epoch}-0') is None
+
+        clock[0] += 61
+        hub.publish(2, 'comment', {'id': 4})
+        assert not hub._buffers and not hub._touched
+        assert hub.events_since(1, second.id) is None
+
+    def test_close_ends_the_streams_of_one_user(self):
+        import asyncio
+
+        from .events import EventHub
+
+        hub = EventHub(buffer_size=10, queue_size=10)
+
+        async def close():
+            removed, _ = hub.subscribe(1, user_id=2)
+            other, _ = hub.subscribe(1, user_id=3)
+            hub.close(1, user_id=2)
+            hub.publish(1, 'comment', {'id': 1})
+            await asyncio.sleep(0)
+            return [removed.queue.get_nowait() for _ in range(removed.queue.qsize())], other.queue.get_nowait()
+
+        removed, other = asyncio.run(close())
+        assert removed[0] is None
+        assert other.data == {'id': 1}
+
+
+@pytest.mark.django_db
+class TestProjectEvents:
+    @pytest.fixture(autouse=True)
+    def clear_hub(self):
+        from .events import hub
+
+        hub.clear()
+        yield
+        hub.clear()
+
+    def _events(self, project):
+        from .events import hub
+
+        return [(event.type, event.data) for _, event in hub._buffers.get(project.id, ())]
+
+    def test_signals_publish_on_commit(self, create_project, create_user, django_capture_on_commit_callbacks):
+        from .events import hub
+
+        project, owner = create_project()
+        member = create_user(username='member')
+        hub.touch(project.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            comment = Comment.objects.create(project=project, user=owner, text='Live')
+            membership = ProjectUser.objects.create(project=project, user=member, role=ProjectUser.READER)
+            membership.role = ProjectUser.EDITOR
+            membership.save()
+            membership.delete()
+
+        events = self._events(project)
+        assert [event_type for event_type, _ in events] == ['comment', 'member', 'member', 'member_removed']
+        assert events[0][1]['id'] == comment.id
+        assert events[2][1]['role'] == ProjectUser.EDITOR
+        assert events[3][1] == {'project': project.id, 'user': member.id}
+
+    def test_signals_skip_projects_nobody_listens_to(self, create_project, django_capture_on_commit_callbacks, monkeypatch):
+        from . import serializers
+
+        project, owner = create_project()
+        monkeypatch.setattr(serializers.CommentSerializer, 'to_representation', lambda *args: pytest.fail('serialized'))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Comment.objects.create(project=project, user=owner, text='Unheard')
+
+        assert self._events(project) == []
+
+    def test_bulk_changes_publish_members(self, api_client, create_project, create_user, django_capture_on_commit_callbacks):
+        from .events import hub
+
+        project, owner = create_project()
+        create_user(username='alice')
+        api_client.force_authenticate(user=owner)
+        hub.touch(project.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post(reverse('project-bulk-add-users', args=[project.id]), ['alice'], format='json')
+
+        assert [(t, d['user_details']['username']) for t, d in self._events(project)] == [('member', 'alice')]
+
+    def test_stream_replays_missed_events(self, create_project, create_user):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+
+        from .events import hub
+
+        project, owner = create_project()
+        client = AsyncClient()
+        client.force_login(owner)
+        url = f'/api/projects/{project.id}/events/'
+        hub.touch(project.id)
+        first = hub.publish(project.id, 'comment', {'id': 1})
+        hub.publish(project.id, 'comment', {'id': 2})
+
+        async def read(headers, until):
+            response = await client.get(url, headers=headers)
+            assert response.status_code == 200
+            assert response['Content-Type'] == 'text/event-stream'
+            body = b''
+            async for chunk in response.streaming_content:
+                body += chunk
+                if until in body:
+                    break
+            await response.streaming_content.aclose()
+            return body.decode()
+
+        body = async_to_sync(read)({'Last-Event-ID': first.id}, b'"id":2')
+        assert body.startswith('retry:')
+        assert '"id":1' not in body
+        assert 'event: comment\ndata: {"id":2}' in body
+
+        body = async_to_sync(read)({'Last-Event-ID': 'unknown-1'}, b'event: reset')
+        assert 'event: reset' in body
+
+        async def status_code():
+            return (await client.get(url)).status_code
+        client.force_login(create_user(username='outsider'))
+        assert async_to_sync(status_code)() == 404
+
+    def test_removing_a_member_closes_their_stream(self, create_project, create_user, django_capture_on_commit_callbacks):
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        from .async_views import event_stream
+
+        project, _ = create_project()
+        member = create_user(username='member')
+        membership = ProjectUser.objects.create(project=project, user=member, role=ProjectUser.READER)
+
+        def remove():
+            with django_capture_on_commit_callbacks(execute=True):
+                membership.delete()
+
+        async def read():
+            stream = event_stream(project.id, None, member.id)
+            chunks = [await stream.__anext__()]
+            await sync_to_async(remove)()
+            # The removal is sent, then the stream ends
+            chunks += [chunk async for chunk in stream]
+            return b''.join(chunks).decode()
+
+        body = async_to_sync(read)()
+        assert body.startswith('retry:')
+        assert 'event: member_removed' in body
+
+
+@pytest.mark.django_db
+class TestExport:
+    def _records(self, content):
+        import json
+
+        return [json.loads(line) for line in content.decode('utf-8').splitlines()]
+
+    def _project(self, create_project, create_user):
+        project, owner = create_project(title='Exported')
+        member = create_user(username='member')
+        ProjectUser.objects.create(project=project, user=member, role=ProjectUser.EDITOR)
+        for n in range(5):
+            Comment.objects.create(project=project, user=owner if n % 2 else member, text=f'Comment {n} \u2028 ü')
+        return project, owner
+
+    def test_streams_ndjson(self, api_client, create_project, create_user):
+        project, owner = self._project(create_project, create_user)
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-export', args=[project.id]))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Type'] == 'application/x-ndjson'
+
+        records = self._records(b''.join(response.streaming_content))
+        assert [r['type'] for r in records] == ['export', 'project', 'member', 'member'] + ['comment'] * 5
+        assert records[1]['title'] == 'Exported'
+        assert records[3]['user']['username'] == 'member'
+        assert records[3]['role'] == ProjectUser.EDITOR
+        assert [r['text'] for r in records[4:]] == [f'Comment {n} \u2028 ü' for n in range(5)]
+
+    def test_reads_in_chunks(self, create_project, create_user, django_assert_num_queries):
+        from .export import export_lines
+
+        project, _ = self._project(create_project, create_user)
+        # Chunked reads keep one cursor per table instead of loading every row
+        with django_assert_num_queries(2):
+            lines = list(export_lines(project, chunk_size=2))
+        assert len(lines) == 9
+
+    def test_requires_membership(self, api_client, create_project, create_user):
+        project, _ = create_project()
+        api_client.force_authenticate(user=create_user(username='outsider'))
+
+        response = api_client.get(reverse('project-export', args=[project.id]))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_streams_under_asgi(self, create_project, create_user):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+
+        project, owner = self._project(create_project, create_user)
+        client = AsyncClient()
+        client.force_login(owner)
+
+        async def export():
+            response = await client.get(reverse('project-export', args=[project.id]))
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        records = self._records(async_to_sync(export)())
+        assert len(records) == 9
+
+    def test_command(self, create_project, create_user, tmp_path):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        project, _ = self._project(create_project, create_user)
+        stdout = StringIO()
+        call_command('export_project', project.id, stdout=stdout)
+        assert len(self._records(stdout.getvalue().encode('utf-8'))) == 9
+
+        path = tmp_path / 'export.ndjson'
+        call_command('export_project', project.id, output=str(path))
+        assert self._records(path.read_bytes())[1:] == self._records(stdout.getvalue().encode('utf-8'))[1:]
+
+
+@pytest.mark.django_db
+class TestImport:
+    def _export(self, create_project, create_user):
+        from .export import export_lines
+
+        project, owner = create_project(title='Imported alpha')
+        member = create_user(username='member')
+        ProjectUser.objects.create(project=project, user=member, role=ProjectUser.EDITOR)
+        for n in range(5):
+            Comment.objects.create(project=project, user=owner if n % 2 else member, text=f'Comment {n}')
+        return project, [line.decode('utf-8') for line in export_lines(project)]
+
+    def _record(self, **fields):
+        import json
+
+        return json.dumps(fields) + '\n'
+
+    def test_round_trip(self, create_project, create_user):
+        from . import search
+        from .importer import ProjectImporter
+
+        source, lines = self._export(create_project, create_user)
+        stats = ProjectImporter(batch_size=3).run(lines)
+        assert (stats['projects'], stats['members'], stats['comments']) == (1, 2, 5)
+
+        imported = Project.objects.exclude(pk=source.pk).get()
+        assert imported.title == 'Imported alpha'
+        assert (imported.created_at, imported.updated_at) == (source.created_at, source.updated_at)
+        assert Project._meta.get_field('updated_at').auto_now
+        owner = imported.projectuser_set.get(role=ProjectUser.OWNER)
+        assert owner.created_at == source.projectuser_set.get(role=ProjectUser.OWNER).created_at
+        assert imported.owner.username == 'testuser'
+        assert imported.comment_count == 5
+        assert imported.last_activity_at == source.comments.latest('created_at').created_at
+        assert list(imported.comments.order_by('created_at', 'id').values_list('text', 'user__username', 'created_at')) == \
+            list(source.comments.order_by('created_at', 'id').values_list('text', 'user__username', 'created_at'))
+        assert imported.pk in load_project_roles(User.objects.get(username='member'))
+        assert {r['project'] for r in search.search(imported.owner, 'alpha', 10)} == {source.pk, imported.pk}
+
+    def test_one_owner_per_project(self, create_user):
+        from .importer import ProjectImporter
+
+        create_user(username='first')
+        create_user(username='second')
+        lines = [
+            self._record(type='project', title='Two owners'),
+            self._record(type='member', user={'username': 'first'}, role='owner'),
+            self._record(type='member', user={'username': 'second'}, role='owner'),
+            self._record(type='project', title='No owner'),
+            self._record(type='member', user={'username': 'first'}, role='reader'),
+            self._record(type='comment', user={'username': 'first'}, text='Dropped'),
+        ]
+        stats = ProjectImporter().run(lines)
+
+        assert stats['owners_demoted'] == 1
+        assert stats['skipped_projects'] == 1
+        project = Project.objects.get()
+        assert dict(project.projectuser_set.values_list('user__username', 'role')) == {
+            'first': ProjectUser.OWNER, 'second': ProjectUser.EDITOR,
+        }
+        assert not Comment.objects.exists()
+
+    def test_held_back_members_fill_batches(self, create_user):
+        from .importer import ProjectImporter
+
+        for n in range(7):
+            create_user(username=f'user{n}')
+        lines = [self._record(type='project', title='Crowded')] + [
+            self._record(type='member', user={'username': f'user{n}'}, role='owner' if n == 1 else 'reader')
+            for n in range(7)
+        ]
+        written = []
+        stats = ProjectImporter(batch_size=3, progress=lambda stats, _: written.append(stats['members'])).run(lines)
+
+        assert stats['members'] == 7
+        assert written[0] == 3
+        project = Project.objects.get()
+        assert project.owner.username == 'user1'
+
+    def test_default_owner_and_created_users(self, create_user):
+        from .importer import ProjectImporter
+
+        create_user(username='admin')
+        lines = [
+            self._record(type='project', title='Orphan'),
+            self._record(type='member', user={'username': 'newcomer', 'email': 'new@example.com'}, role='reader'),
+            self._record(type='comment', user={'username': 'ghost'}, text='Hello'),
+        ]
+        stats = ProjectImporter(create_users=True, default_owner='admin').run(lines)
+
+        assert stats['users_created'] == 2
+        assert Project.objects.get().owner.username == 'admin'
+        newcomer = User.objects.get(username='newcomer')
+        assert newcomer.email == 'new@example.com'
+        assert not newcomer.has_usable_password()
+        assert Comment.objects.get().user.username == 'ghost'
+
+    def test_unknown_users_are_skipped(self, create_user):
+        from .importer import ProjectImporter
+
+        create_user(username='owner')
+        lines = [
+            self._record(type='project', title='Project'),
+            self._record(type='member', user={'username': 'owner'}, role='owner'),
+            self._record(type='member', user={'username': 'missing'}, role='reader'),
+            self._record(type='comment', user={'username': 'missing'}, text='Lost'),
+        ]
+        stats = ProjectImporter().run(lines)
+        assert (stats['members'], stats['comments'], stats['skipped_records']) == (1, 0, 2)
+
+    def test_imported_projects_reach_delta_sync(self, api_client, create_project, create_user):
+        from .changes import encode_token
+        from .importer import ProjectImporter
+
+        source, lines = self._export(create_project, create_user)
+        api_client.force_authenticate(user=User.objects.get(username='member'))
+        # A token from a sync just before the import, past the sync margin
+        token = encode_token(timezone.now())
+
+        ProjectImporter().run(lines)
+        imported = Project.objects.exclude(pk=source.pk).get()
+        assert imported.created_at == source.created_at
+        changed = api_client.get(reverse('project-changes'), {'since': token}).data['changed']
+        assert [project['id'] for project in changed] == [imported.pk]
+
+    def test_resumes_from_checkpoint(self, create_project, create_user, tmp_path):
+        from .importer import ProjectImporter
+
+        source, lines = self._export(create_project, create_user)
+        checkpoint = tmp_path / 'import.json'
+
+        class Interrupted(Exception):
+            pass
+
+        def interrupt(stats, rows_per_second):
+            raise Interrupted
+
+        with pytest.raises(Interrupted):
+            ProjectImporter(batch_size=5, checkpoint_path=checkpoint, progress=interrupt).run(lines)
+        # The first batch was committed before the interruption
+        assert Comment.objects.count() == 5 + 2
+
+        stats = ProjectImporter(batch_size=5, checkpoint_path=checkpoint).run(lines, resume=True)
+        assert (stats['projects'], stats['members'], stats['comments']) == (1, 2, 5)
+        imported = Project.objects.exclude(pk=source.pk).get()
+        assert imported.comments.count() == 5
+        assert imported.comment_count == 5
+
+    def test_command(self, create_project, create_user, tmp_path):
+        from io import StringIO
+
+        from django.core.management import CommandError, call_command
+
+        _, lines = self._export(create_project, create_user)
+        path = tmp_path / 'export.ndjson'
+        path.write_text(''.join(lines), encoding='utf-8')
+
+        out = StringIO()
+        call_command('import_projects', str(path), '--batch-size', '4', stdout=out)
+        assert 'rows/s' in out.getvalue()
+        assert 'Imported 1 project(s), 2 member(s) and 5 comment(s)' in out.getvalue()
+        assert Project.objects.count() == 2
+
+        path.write_text('{"type": "comment"}\n', encoding='utf-8')
+        with pytest.raises(CommandError, match='before any project'):
+            call_command('import_projects', str(path), stdout=StringIO())
+
+
+@pytest.mark.django_db
+class TestSeedScale:
+    def _seed(self, seed=0):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        call_command('seed_scale', '--users', '40', '--projects', '25', '--members', '6', '--comments', '8',
+                     '--seed', str(seed), '--prefix', f'seed{seed}_', stdout=StringIO())
+
+    def test_generates_consistent_data(self):
+        from django.db.models import Count, Max, Q
+
+        self._seed()
+        assert User.objects.count() == 40
+        assert Project.objects.count() == 25
+        # Exactly one owner per project, and only owners and editors comment
+        owners = Project.objects.annotate(owners=Count('projectuser', filter=Q(projectuser__role='owner')))
+        assert set(owners.values_list('owners', flat=True)) == {1}
+        writers = set(ProjectUser.objects.exclude(role=ProjectUser.READER).values_list('project', 'user'))
+        assert set(Comment.objects.values_list('project', 'user')) <= writers
+        for project in Project.objects.annotate(count=Count('comments'), latest=Max('comments__created_at')):
+            assert project.comment_count == project.count
+            assert project.last_activity_at == (project.latest or project.created_at)
+        assert User.objects.get(username='seed0_0').check_password('password')
+
+    def test_is_reproducible(self):
+        def snapshot():
+            return (
+                list(Project.objects.order_by('pk').values_list('title', 'comment_count')),
+                sorted(ProjectUser.objects.values_list('user__username', 'role')),
+            )
+
+        self._seed(seed=1)
+        first = snapshot()
+        Project.objects.all().delete()
+        User.objects.all().delete()
+        self._seed(seed=1)
+        assert snapshot() == first
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    @pytest.fixture(autouse=True)
+    def clear_registry(self):
+        from core.metrics import registry
+
+        registry.clear()
+        yield
+        registry.clear()
+
+    def _metrics(self, client):
+        response = client.get('/metrics')
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        return response.content.decode()
+
+    def test_records_view_and_action(self, create_project):
+        from django.db import connection
+        from django.test import Client
+
+        project, owner = create_project()
+        client = Client(HTTP_ACCEPT='application/json')
+        client.force_login(owner)
+        captured = []
+
+        def count_query(execute, *args):
+            captured.append(args[0])
+            return execute(*args)
+
+        with connection.execute_wrapper(count_query):
+            response = client.get(reverse('project-list'))
+        client.get(reverse('project-detail', args=[project.id]))
+        client.get(reverse('project-detail', args=[project.id + 1]))
+
+        labels = 'view="projects.views.ProjectViewSet",action="list",method="GET"'
+        text = self._metrics(client)
+        assert f'http_requests_total{{{labels},status="200"}} 1' in text
+        assert f'http_request_db_queries_total{{{labels}}} {len(captured)}' in text
+        assert f'http_response_size_bytes_sum{{{labels}}} {len(response.content)}' in text
+        assert f'http_request_duration_seconds_count{{{labels}}} 1' in text
+        assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+        retrieve = 'view="projects.views.ProjectViewSet",action="retrieve",method="GET"'
+        assert f'http_requests_total{{{retrieve},status="200"}} 1' in text
+        assert f'http_requests_total{{{retrieve},status="404"}} 1' in text
+
+    def test_counts_queries_under_asgi(self, create_project):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient, Client
+
+        _, owner = create_project()
+        client = AsyncClient()
+        client.force_login(owner)
+
+        async def get():
+            return await client.get(reverse('project-list'))
+
+        assert async_to_sync(get)().status_code == status.HTTP_200_OK
+        text = self._metrics(Client())
+        labels = 'view="projects.views.ProjectViewSet",action="list",method="GET"'
+        assert f'http_requests_total{{{labels},status="200"}} 1' in text
+        queries = next(line for line in text.splitlines()
+                       if line.startswith(f'http_request_db_queries_total{{{labels}}}'))
+        assert int(queries.rsplit(' ', 1)[1]) > 0
+
+    def test_restricted_to_allowed_addresses(self, settings):
+        from django.test import Client
+
+        assert Client(REMOTE_ADDR='10.0.0.1').get('/metrics').status_code == status.HTTP_403_FORBIDDEN
+        settings.METRICS_ALLOWED_IPS = None
+        assert Client(REMOTE_ADDR='10.0.0.1').get('/metrics').status_code == status.HTTP_200_OK
+
+
+@pytest.fixture
+def replica(tmp_path):
+    """
+    A second SQLite file registered as the 'replica' alias. Rows are copied
+    into it by hand, so tests can tell which database answered a read.
+    """
+    from django.core.management import call_command
+    from django.db import connections
+
+    connections.settings['replica'] = {
+        **connections['default'].settings_dict, 'NAME': str(tmp_path / 'replica.sqlite3'),
+    }
+    call_command('migrate', database='replica', verbosity=0)
+    yield 'replica'
+    connections['replica'].close()
+    del connections['replica']
+    del connections.settings['replica']
+
+
+@pytest.mark.django_db
+class TestReplicaRouting:
+    def _copy(self, *objects, **changes):
+        # Save stale copies of primary rows into the replica
+        for obj in objects:
+            for field, value in changes.get(type(obj).__name__, {}).items():
+                setattr(obj, field, value)
+            obj.save(using='replica', force_insert=True)
+
+    def _setup(self, create_project):
+        project, owner = create_project(title='Fresh title')
+        membership = ProjectUser.objects.get(project=project)
+        stale = Project.objects.get(pk=project.pk)
+        self._copy(User.objects.get(pk=owner.pk), stale, membership, Project={'title': 'Stale title'})
+        return project, owner
+
+    def test_read_only_actions_use_replica(self, api_client, create_project, replica):
+        project, owner = self._setup(create_project)
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-detail', args=[project.id]))
+        assert response.data['title'] == 'Stale title'
+        response = api_client.get(reverse('project-list'))
+        assert [p['title'] for p in response.data['results']] == ['Stale title']
+        # Other actions read from the primary
+        response = api_client.get(reverse('project-overview', args=[project.id]))
+        assert response.data['title'] == 'Fresh title'
+
+    def test_lists_read_from_replica_are_not_cached(self, api_client, create_project, replica):
+        project, owner = self._setup(create_project)
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-list'))
+        assert [p['title'] for p in response.data['results']] == ['Stale title']
+        # The replica catches up
+        Project.objects.using('replica').filter(pk=project.pk).update(title='Fresh title')
+        response = api_client.get(reverse('project-list'))
+        assert [p['title'] for p in response.data['results']] == ['Fresh title']
+        assert project_list_cache.hits == 0
+
+    def test_user_list_uses_replica(self, api_client, create_user, replica):
+        user = create_user()
+        self._copy(User(username='replica-only'))
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(reverse('user-list'))
+        assert [u['username'] for u in response.data['results']] == ['replica-only']
+
+    def test_writer_is_pinned_to_primary(self, api_client, create_project, replica, settings):
+        from core.routers import PIN_COOKIE
+
+        project, owner = self._setup(create_project)
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.patch(reverse('project-detail', args=[project.id]), {'title': 'Newer title'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.cookies[PIN_COOKIE]['max-age'] == settings.REPLICA_PIN_SECONDS
+        # Read-your-writes while the cookie lasts
+        response = api_client.get(reverse('project-detail', args=[project.id]))
+        assert response.data['title'] == 'Newer title'
+
+        del api_client.cookies[PIN_COOKIE]
+        response = api_client.get(reverse('project-detail', args=[project.id]))
+        assert response.data['title'] == 'Stale title'
+        assert PIN_COOKIE not in response.cookies
+
+    def test_asgi_reads_use_replica(self, create_project, replica):
+        from asgiref.sync import async_to_sync
+        from django.contrib.sessions.models import Session
+        from django.test import AsyncClient
+
+        project, owner = self._setup(create_project)
+        client = AsyncClient()
+        client.force_login(owner)
+        # The session is read from the replica as well
+        self._copy(Session.objects.get())
+
+        async def get():
+            return await client.get(reverse('project-detail', args=[project.id]))
+
+        response = async_to_sync(get)()
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['title'] == 'Stale title'
+
+    def test_lagging_replica_does_not_restore_removed_member(self, api_client, create_project, create_user,
+                                                             replica):
+        project, owner = self._setup(create_project)
+        editor = create_user(username='editor', email='editor@example.com')
+        membership = ProjectUser.objects.create(project=project, user=editor, role=ProjectUser.EDITOR)
+        self._copy(User.objects.get(pk=editor.pk), ProjectUser.objects.get(pk=membership.pk))
+        # Removed on the primary only
+        membership.delete()
+        api_client.force_authenticate(user=editor)
+
+        # A replica read must not cache the stale role for later writes
+        assert api_client.get(reverse('project-list')).data['results'] == []
+        response = api_client.post(reverse('project-add-comment', args=[project.id]), {'text': 'Still here?'})
+        assert response.status_code in (status.HTTP_403_FORBIDDEN, status.HTTP_404_NOT_FOUND)
+        assert not Comment.objects.exists()
+
+    def test_lagging_replica_does_not_accept_revoked_token(self, create_project, replica):
+        from users.tokens import issue_token, revoke_tokens
+
+        project, owner = self._setup(create_project)
+        token, _ = issue_token(owner)
+        # The replica has not seen the version bump yet
+        revoke_tokens(owner)
+
+        response = APIClient().get(reverse('project-list'), HTTP_AUTHORIZATION=f'Token {token}')
+        assert response.status_code in (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+
+    def test_without_replica_reads_primary(self, api_client, create_project):
+        project, owner = create_project(title='Fresh title')
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-detail', args=[project.id]))
+        assert response.data['title'] == 'Fresh title'
+        assert not response.cookies
+
+
+@pytest.mark.django_db(transaction=True)
+class TestWriteCoalescer:
+    @pytest.fixture
+    def coalescer(self):
+        from .coalescer import WriteCoalescer
+
+        coalescer = WriteCoalescer(window=0.05, max_batch=100, timeout=10)
+        yield coalescer
+        coalescer.stop()
+
+    def _submit_all(self, coalescer, funcs):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def submit(func):
+            try:
+                return coalescer.submit(func)
+            except Exception as exc:
+                return exc
+
+        with ThreadPoolExecutor(len(funcs)) as pool:
+            return list(pool.map(submit, funcs))
+
+    def test_commits_concurrent_writes_together(self, coalescer, create_project):
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        project, owner = create_project()
+        started, release = threading.Event(), threading.Event()
+
+        def first():
+            # Holds the first batch open while the others queue up
+            started.set()
+            release.wait(5)
+            return Comment.objects.create(project=project, user=owner, text='first').text
+
+        def make(n):
+            return lambda: Comment.objects.create(project=project, user=owner, text=f'comment {n}').text
+
+        with ThreadPoolExecutor(11) as pool:
+            futures = [pool.submit(coalescer.submit, first)]
+            assert started.wait(5)
+            futures += [pool.submit(coalescer.submit, make(n)) for n in range(10)]
+            deadline = time.monotonic() + 5
+            while coalescer._queue.qsize() < 10 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            release.set()
+            results = [future.result() for future in futures]
+
+        assert results == ['first'] + [f'comment {n}' for n in range(10)]
+        assert coalescer.batches == 2
+        project.refresh_from_db()
+        assert project.comment_count == 11
+
+    def test_failed_write_is_rolled_back_alone(self, coalescer, create_project):
+        project, owner = create_project()
+
+        def fail():
+            Comment.objects.create(project=project, user=owner, text='rolled back')
+            raise ValueError('boom')
+
+        results = self._submit_all(coalescer, [
+            lambda: Comment.objects.create(project=project, user=owner, text='kept').pk,
+            fail,
+        ])
+        assert isinstance(results[0], int)
+        assert isinstance(results[1], ValueError)
+        assert list(Comment.objects.values_list('text', flat=True)) == ['kept']
+
+    def test_timed_out_write_is_withdrawn(self, create_project):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        from .coalescer import WriteCoalescer, WriteTimeout
+
+        project, owner = create_project()
+        coalescer = WriteCoalescer(window=0, max_batch=100, timeout=0.2)
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return Comment.objects.create(project=project, user=owner, text='slow').text
+
+        try:
+            with ThreadPoolExecutor(1) as pool:
+                running = pool.submit(coalescer.submit, slow)
+                assert started.wait(5)
+                with pytest.raises(WriteTimeout):
+                    coalescer.submit(lambda: Comment.objects.create(project=project, user=owner, text='withdrawn'))
+                release.set()
+                # Its batch had started, so it was waited for past the timeout
+                assert running.result() == 'slow'
+            assert coalescer.submit(lambda: 'after') == 'after'
+        finally:
+            coalescer.stop()
+        assert list(Comment.objects.values_list('text', flat=True)) == ['slow']
+
+    @pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+    def test_writes_fail_when_the_writer_dies(self, coalescer, monkeypatch):
+        from .coalescer import WriterStopped
+
+        def die(batch):
+            raise RuntimeError('writer bug')
+
+        monkeypatch.setattr(coalescer, '_commit', die)
+        with pytest.raises(WriterStopped):
+            coalescer.submit(lambda: 'lost')
+        monkeypatch.undo()
+        # A new writer takes over
+        assert coalescer.submit(lambda: 'kept') == 'kept'
+
+    def test_views_write_through_coalescer(self, api_client, create_project, create_user, settings):
+        from .coalescer import coalescer
+
+        settings.PROJECT_WRITE_COALESCING = True
+        project, owner = create_project()
+        member = create_user(username='member')
+        api_client.force_authenticate(user=owner)
+        try:
+            writes = coalescer.writes
+            response = api_client.post(reverse('project-add-comment', args=[project.id]), {'text': 'Batched'})
+            assert response.status_code == status.HTTP_201_CREATED
+            assert response.data['text'] == 'Batched'
+
+            url = reverse('project-add-user', args=[project.id])
+            response = api_client.post(url, {'username': 'member', 'role': ProjectUser.EDITOR})
+            assert response.status_code == status.HTTP_201_CREATED
+            response = api_client.post(url, {'username': 'member'})
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+            assert coalescer.writes == writes + 3
+        finally:
+            coalescer.stop()
+
+        project.refresh_from_db()
+        assert project.comment_count == 1
+        assert ProjectUser.objects.get(project=project, user=member).role == ProjectUser.EDITOR
+        assert project.pk in load_project_roles(member)
+
+
+@pytest.mark.django_db
+class TestWriteThrottling:
+    def test_comments_are_throttled_per_user(self, api_client, create_project, settings):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'project_write_user': '3/min'}}
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-add-comment', args=[project.id])
+
+        for i in range(3):
+            assert api_client.post(url, {'text': f'Comment {i}'}, format='json').status_code == status.HTTP_201_CREATED
+        response = api_client.post(url, {'text': 'One too many'}, format='json')
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        # One token refills every 20 seconds
+        assert 0 < int(response['Retry-After']) <= 20
+        assert Comment.objects.filter(project=project).count() == 3
+
+        # add_user shares the bucket; other users have their own
+        other = User.objects.create_user(username='other', password='testpassword123')
+        ProjectUser.objects.create(project=project, user=other, role=ProjectUser.EDITOR)
+        response = api_client.post(reverse('project-add-user', args=[project.id]),
+                                   {'username': 'nobody', 'role': 'reader'}, format='json')
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        api_client.force_authenticate(user=other)
+        assert api_client.post(url, {'text': 'Hello'}, format='json').status_code == status.HTTP_201_CREATED
+
+
+
+@pytest.mark.django_db
+class TestProjectListCache:
+    def test_repeated_list_is_served_from_cache(self, api_client, create_project, django_assert_max_num_queries):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        url = reverse('project-list')
+
+        first = api_client.get(url, HTTP_ACCEPT='application/json')
+        # Only the role map and the conditional GET validators
+        with django_assert_max_num_queries(2):
+            second = api_client.get(url, HTTP_ACCEPT='application/json')
+        assert second.content == first.content
+        assert (project_list_cache.hits, project_list_cache.misses) == (1, 1)
+
+        # Each cursor and ordering is cached on its own
+        api_client.get(url, {'ordering': 'activity'})
+        assert project_list_cache.misses == 2
+
+    def test_writes_make_lists_stale(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        member = create_user(username='member', email='member@example.com')
+        ProjectUser.objects.create(project=project, user=member, role=ProjectUser.EDITOR)
+        other, _ = create_project(title='Other project', owner=owner)
+        api_client.force_authenticate(user=member)
+        url = reverse('project-list')
+
+        def listed():
+            return {p['title']: p for p in api_client.get(url).data['results']}
+
+        assert list(listed()) == ['Test Project']
+        Comment.objects.create(project=project, user=owner, text='Hello')
+        assert listed()['Test Project']['comment_count'] == 1
+
+        project.title = 'Renamed'
+        project.save()
+        assert list(listed()) == ['Renamed']
+
+        ProjectUser.objects.create(project=other, user=member, role=ProjectUser.READER)
+        assert sorted(listed()) == ['Other project', 'Renamed']
+
+        owner.first_name = 'Owner'
+        owner.save()
+        assert listed()['Renamed']['owner']['first_name'] == 'Owner'
+
+        ProjectUser.objects.filter(project=other, user=member).delete()
+        ProjectUser.objects.get(project=project, user=member).delete()
+        assert listed() == {}
+
+    def test_comment_bumps_the_members(self, api_client, create_project, create_user, monkeypatch,
+                                       django_assert_num_queries):
+        project, owner = create_project()
+        members = {owner.pk}
+        for n in range(5):
+            member = create_user(username=f'member{n}')
+            ProjectUser.objects.create(project=project, user=member, role=ProjectUser.READER)
+            members.add(member.pk)
+        create_project(title='Other project', owner=create_user(username='outsider'))
+        bumps = []
+        monkeypatch.setattr(project_list_cache, 'bump', lambda user_ids: bumps.append(user_ids))
+
+        comment = Comment(project=project, user=owner, text='Hello')
+        # The insert, the project's activity, the search index and the members
+        with django_assert_num_queries(4):
+            comment.save()
+        assert bumps == [members]
+
+    def test_lookup_does_not_grow_with_projects(self, api_client, create_project, create_user, monkeypatch):
+        from django.core.cache import caches
+
+        user = create_user()
+        for n in range(5):
+            create_project(title=f'Project {n}', owner=user)
+        api_client.force_authenticate(user=user)
+        cache = caches[project_list_cache.alias]
+        api_client.get(reverse('project-list'))
+
+        reads = []
+        get, get_many = cache.get, cache.get_many
+        monkeypatch.setattr(cache, 'get', lambda key, *args: reads.append(key) or get(key, *args))
+        monkeypatch.setattr(cache, 'get_many', lambda keys, *args: reads.extend(keys) or get_many(keys, *args))
+        data, _ = project_list_cache.get(user.pk, 'http://testserver/api/projects/')
+        # The user's generation and the entry
+        assert data is not None
+        assert len(reads) == 2
+
+    def test_hits_and_misses_are_exported(self, api_client, create_project):
+        from django.test import Client
+
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        for _ in range(3):
+            api_client.get(reverse('project-list'))
+
+        text = Client().get('/metrics').content.decode()
+        assert 'project_list_cache_hits_total 2' in text
+        assert 'project_list_cache_misses_total 1' in text
+
+    def test_lru_file_cache_culls_least_recently_used(self, tmp_path):
+        import os
+        from core.cache import LRUFileBasedCache
+
+        cache = LRUFileBasedCache(str(tmp_path), {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3}})
+        for age, key in enumerate(['a', 'b', 'c']):
+            cache.set(key, key)
+            # Spread the modification times, as if written a second apart
+            os.utime(cache._key_to_file(key), (age, age))
+        assert cache.get('a') == 'a'
+
+        cache.set('d', 'd')
+        assert [cache.get(key) for key in 'abcd'] == ['a', None, 'c', 'd']
+
+
+@pytest.mark.django_db
+class TestRepresentations:
+    def test_match_serializers_byte_for_byte(self, create_project, create_user):
+        from django.test import RequestFactory
+        from rest_framework.renderers import JSONRenderer
+
+        from core.renderers import FastJSONRenderer
+        from . import representations
+        from .serializers import CommentSerializer, ProjectSerializer
+
+        project, owner = create_project(title='Ünïcode \u2028 project', description='"Quoted" \\ text 😀')
+        orphan = Project.objects.create(title='No owner', description='')
+        member = create_user(username='member', email='member@example.com')
+        ProjectUser.objects.create(project=project, user=member, role=ProjectUser.EDITOR)
+        Comment.objects.create(project=project, user=member, text='Line\u2029break\x1f')
+        Comment.objects.create(project=project, user=owner, text='Second')
+
+        request = RequestFactory().get('/api/projects/')
+        request._project_roles = roles = {project.pk: ProjectUser.OWNER}
+        ids = [project.pk, orphan.pk]
+        expected = ProjectSerializer(Project.objects.filter(pk__in=ids).with_owner().order_by('id'), many=True,
+                                     context={'request': request}).data
+        rows = Project.objects.filter(pk__in=ids).order_by('id').values(*representations.project_columns())
+        actual = representations.projects(rows, representations.owner_rows(ids), roles)
+        assert FastJSONRenderer().render(actual) == JSONRenderer().render(expected)
+
+        comments = Comment.objects.filter(project=project).order_by('id')
+        expected = CommentSerializer(comments.select_related('user'), many=True).data
+        actual = representations.comments(comments.values(*representations.comment_columns()))
+        assert FastJSONRenderer().render(actual) == JSONRenderer().render(expected)
+
+    def test_renderer_falls_back_to_json_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+
+        from core.renderers import FastJSONRenderer
+
+        data = {'big': 2 ** 70, 1: 'integer key'}
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+        indented = 'application/json; indent=2'
+        assert FastJSONRenderer().render({'a': [1]}, indented) == JSONRenderer().render({'a': [1]}, indented)
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    def test_fields_limit_list_and_detail(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-list'), {'fields': 'id,title'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == [{'id': project.id, 'title': project.title}]
+
+        response = api_client.get(reverse('project-detail', args=[project.id]), {'fields': 'title,role'})
+        assert response.data == {'title': project.title, 'role': ProjectUser.OWNER}
+
+    def test_unexpanded_relations_collapse_to_ids(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        member = create_user(username='member', email='member@example.com')
+        ProjectUser.objects.create(project=project, user=member, role=ProjectUser.READER)
+        Comment.objects.create(project=project, user=member, text='Hello')
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-list'), {'expand': ''})
+        assert response.data['results'][0]['owner'] == owner.id
+        response = api_client.get(reverse('project-detail', args=[project.id]), {'expand': ''})
+        assert response.data['owner'] == owner.id
+        response = api_client.get(reverse('project-comments', args=[project.id]), {'fields': 'text,user', 'expand': ''})
+        assert response.data['results'] == [{'user': member.id, 'text': 'Hello'}]
+        response = api_client.get(reverse('project-users', args=[project.id]), {'expand': ''})
+        assert all('user_details' not in row for row in response.data['results'])
+
+        response = api_client.get(reverse('project-comments', args=[project.id]), {'expand': 'user'})
+        assert response.data['results'][0]['user']['username'] == 'member'
+
+    def test_overview_can_leave_out_embedded_lists(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-overview', args=[project.id]), {'fields': 'id,users'})
+        assert set(response.data) == {'id', 'users'}
+        assert response.data['users']['results'][0]['user_details']['username'] == owner.username
+
+    def test_unknown_names_are_rejected(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-list'), {'fields': 'id,secret', 'expand': 'role'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data) == {'fields', 'expand'}
+
+    def test_default_output_is_unchanged(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-detail', args=[project.id]), {'fields': '', 'expand': 'owner'})
+        assert response.data == api_client.get(reverse('project-detail', args=[project.id])).data
+
+    def test_owner_is_not_fetched_unless_requested(self, api_client, create_project):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        api_client.get(reverse('project-list'))
+        project_list_cache.clear()
+
+        def queries(params):
+            with CaptureQueriesContext(connection) as ctx:
+                assert api_client.get(reverse('project-list'), params).status_code == status.HTTP_200_OK
+            return [query['sql'] for query in ctx.captured_queries]
+
+        full = queries({})
+        sparse = queries({'fields': 'id,title'})
+        assert len(sparse) == len(full) - 1
+        assert not any('projects_projectuser' in sql and '"auth_user"."username"' in sql for sql in sparse)
+
+
+class TestStaticAssets:
+    @pytest.fixture
+    def collected(self, tmp_path, settings):
+        from django.core.management import call_command
+
+        settings.STATIC_ROOT = str(tmp_path)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        return tmp_path
+
+    def test_collectstatic_writes_hashed_and_compressed_copies(self, collected):
+        import gzip
+        import json
+
+        manifest = json.loads((collected / 'staticfiles.json').read_text())
+        hashed = manifest['paths']['js/main.js']
+        assert hashed != 'js/main.js'
+        original = (collected / hashed).read_bytes()
+        assert gzip.decompress((collected / f'{hashed}.gz').read_bytes()) == original
+        assert (collected / 'js/main.js.gz').exists()
+
+    @pytest.mark.django_db
+    def test_index_references_hashed_names(self, collected, client):
+        import json
+
+        paths = json.loads((collected / 'staticfiles.json').read_text())['paths']
+        content = client.get(reverse('home')).content.decode()
+        assert f'/static/{paths["js/main.js"]}' in content
+        assert f'/static/{paths["css/main.css"]}' in content
+
+    def test_serves_precompressed_hashed_files_as_immutable(self, collected, client):
+        import gzip
+        import json
+
+        hashed = json.loads((collected / 'staticfiles.json').read_text())['paths']['js/main.js']
+        response = client.get(f'/static/{hashed}', headers={'Accept-Encoding': 'br;q=0, gzip'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Encoding'] == 'gzip'
+        assert response['Content-Type'].startswith('text/javascript')
+        assert 'immutable' in response['Cache-Control'] and 'max-age=31536000' in response['Cache-Control']
+        assert 'Accept-Encoding' in response['Vary']
+        assert gzip.decompress(b''.join(response.streaming_content)) == (collected / hashed).read_bytes()
+
+        response = client.get('/static/js/main.js')
+        assert 'Content-Encoding' not in response
+        assert response['Cache-Control'] == 'no-cache'
+        assert client.get('/static/js/main.js', headers={'If-Modified-Since': response['Last-Modified']}).status_code == 304
+
+    def test_missing_and_outside_paths_are_not_found(self, collected, client):
+        assert client.get('/static/js/missing.js').status_code == status.HTTP_404_NOT_FOUND
+        assert client.get('/static/%2E%2E/core/settings.py').status_code == status.HTTP_404_NOT_FOUND
+        assert client.get('/static/js/main.js.gz').status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestCommentsAfter:
+    def test_after_returns_only_newer_comments(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        for i in range(3):
+            Comment.objects.create(project=project, user=owner, text=f'Old {i}')
+        url = reverse('project-comments', args=[project.id])
+
+        page = api_client.get(url).data
+        assert [c['text'] for c in page['results']] == ['Old 0', 'Old 1', 'Old 2']
+        assert page['next'] is None
+        after = page['after']
+
+        # Nothing new: an empty page that hands the same cursor back
+        page = api_client.get(url, {'after': after}).data
+        assert page['results'] == [] and page['after'] == after
+
+        Comment.objects.create(project=project, user=owner, text='New 0')
+        Comment.objects.create(project=project, user=owner, text='New 1')
+        page = api_client.get(url, {'after': after, 'page_size': 1}).data
+        assert [c['text'] for c in page['results']] == ['New 0']
+        assert 'cursor=' not in page['next']
+        page = api_client.get(page['next']).data
+        assert [c['text'] for c in page['results']] == ['New 1']
+        assert page['next'] is None
+
+        page = api_client.get(url, {'after': page['after']}).data
+        assert page['results'] == []
+
+    def test_comment_committed_late_is_not_missed(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        Comment.objects.create(project=project, user=owner, text='Seen')
+        url = reverse('project-comments', args=[project.id])
+        after = api_client.get(url).data['after']
+
+        # Stamped before 'Seen', but committed after it was read
+        late = Comment.objects.create(project=project, user=owner, text='Late')
+        Comment.objects.filter(pk=late.pk).update(created_at=timezone.now() - timedelta(minutes=1))
+        page = api_client.get(url, {'after': after}).data
+        assert [c['text'] for c in page['results']] == ['Late']
+
+    def test_only_the_first_page_carries_after(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        for i in range(3):
+            Comment.objects.create(project=project, user=owner, text=f'Comment {i}')
+        url = reverse('project-comments', args=[project.id])
+
+        first = api_client.get(url, {'page_size': 2}).data
+        # Written while the client reads the rest of the list
+        Comment.objects.create(project=project, user=owner, text='Comment 3')
+        second = api_client.get(first['next']).data
+        assert [c['text'] for c in second['results']] == ['Comment 2', 'Comment 3']
+        assert second['after'] is None
+
+        # Comment 3 comes again; the client skips the ids it already has
+        page = api_client.get(url, {'after': first['after']}).data
+        assert [c['text'] for c in page['results']] == ['Comment 3']
+
+    def test_overview_carries_after(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+        Comment.objects.create(project=project, user=owner, text='First')
+
+        after = api_client.get(reverse('project-overview', args=[project.id])).data['comments']['after']
+        Comment.objects.create(project=project, user=owner, text='Second')
+        page = api_client.get(reverse('project-comments', args=[project.id]), {'after': after}).data
+        assert [c['text'] for c in page['results']] == ['Second']
+
+    def test_invalid_after_is_not_found(self, api_client, create_project):
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-comments', args=[project.id]), {'after': 'garbage'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestProjectChanges:
+    # Tokens and timestamps are moved back rather than sleeping past the
+    # sync margin
+    def _sync(self, api_client, token=None):
+        params = {} if token is None else {'since': token}
+        response = api_client.get(reverse('project-changes'), params)
+        assert response.status_code == status.HTTP_200_OK
+        return response.data
+
+    def _age(self, data, seconds):
+        # A token from `seconds` earlier, so writes made now are past it
+        from .changes import decode_token, encode_token
+
+        return encode_token(decode_token(data['token']) - timedelta(seconds=seconds))
+
+    def test_full_sync_then_deltas(self, api_client, create_project, create_user):
+        user = create_user(username='member', email='member@example.com')
+        kept, owner = create_project(title='Kept')
+        edited, _ = create_project(title='Edited', owner=owner)
+        ProjectUser.objects.create(project=kept, user=user, role=ProjectUser.READER)
+        ProjectUser.objects.create(project=edited, user=user, role=ProjectUser.READER)
+        api_client.force_authenticate(user=user)
+
+        data = self._sync(api_client)
+        assert [p['title'] for p in data['changed']] == ['Kept', 'Edited'] and data['removed'] == []
+        # Earlier than every write, so nothing has changed since yet
+        project_ids = [kept.pk, edited.pk]
+        Project.objects.filter(pk__in=project_ids).update(updated_at=timezone.now() - timedelta(minutes=1),
+                                                          last_activity_at=timezone.now() - timedelta(minutes=1))
+        ProjectUser.objects.filter(project_id__in=project_ids).update(updated_at=timezone.now() - timedelta(minutes=1))
+        token = self._age(data, 30)
+        assert self._sync(api_client, token)['changed'] == []
+
+        edited.title = 'Edited again'
+        edited.save()
+        gained, _ = create_project(title='Gained', owner=owner)
+        ProjectUser.objects.create(project=gained, user=user, role=ProjectUser.EDITOR)
+        deleted, _ = create_project(title='Deleted', owner=owner)
+        ProjectUser.objects.create(project=deleted, user=user, role=ProjectUser.READER)
+        deleted_id = deleted.pk
+        deleted.delete()
+        ProjectUser.objects.filter(project=kept, user=user).delete()
+
+        data = self._sync(api_client, token)
+        assert sorted(p['title'] for p in data['changed']) == ['Edited again', 'Gained']
+        assert data['removed'] == sorted([kept.pk, deleted_id])
+
+    def test_role_change_and_comment_count_as_changes(self, api_client, create_project, create_user):
+        project, owner = create_project()
+        editor = create_user(username='editor', email='editor@example.com')
+        membership = ProjectUser.objects.create(project=project, user=editor, role=ProjectUser.READER)
+        api_client.force_authenticate(user=editor)
+        token = self._age(self._sync(api_client), 0)
+        Project.objects.filter(pk=project.pk).update(updated_at=timezone.now() - timedelta(minutes=1),
+                                                     last_activity_at=timezone.now() - timedelta(minutes=1))
+        ProjectUser.objects.filter(project=project).update(updated_at=timezone.now() - timedelta(minutes=1))
+
+        membership.role = ProjectUser.EDITOR
+        membership.save()
+        assert [p['role'] for p in self._sync(api_client, token)['changed']] == [ProjectUser.EDITOR]
+
+        ProjectUser.objects.filter(project=project).update(updated_at=timezone.now() - timedelta(minutes=1))
+        Comment.objects.create(project=project, user=owner, text='Hello')
+        assert [p['comment_count'] for p in self._sync(api_client, token)['changed']] == [1]
+
+    def test_pages_keep_the_first_token(self, api_client, create_project):
+        project, owner = create_project(title='Project 0')
+        for i in range(1, 3):
+            create_project(title=f'Project {i}', owner=owner)
+        api_client.force_authenticate(user=owner)
+
+        first = api_client.get(reverse('project-changes'), {'page_size': 2}).data
+        assert [p['title'] for p in first['changed']] == ['Project 0', 'Project 1']
+        second = api_client.get(first['next']).data
+        assert [p['title'] for p in second['changed']] == ['Project 2']
+        assert second['next'] is None and second['token'] == first['token']
+
+    def test_roles_are_not_read_from_the_role_cache(self, api_client, create_project, create_user):
+        from .changes import encode_token
+
+        user = create_user(username='member', email='member@example.com')
+        gained, owner = create_project(title='Gained')
+        lost, _ = create_project(title='Lost', owner=owner)
+        ProjectUser.objects.create(project=lost, user=user, role=ProjectUser.READER)
+        api_client.force_authenticate(user=user)
+        token = encode_token(timezone.now() - timedelta(seconds=30))
+        # Cache the role map, then change the memberships the way another
+        # process would: without this process's signal handlers
+        assert list(load_project_roles(user)) == [lost.pk]
+        ProjectUser.objects.bulk_create([ProjectUser(project=gained, user=user, role=ProjectUser.READER)])
+        ProjectUser.objects.filter(project=lost, user=user)._raw_delete('default')
+        ProjectTombstone.objects.create(user=user, project_id=lost.pk)
+
+        data = self._sync(api_client, token)
+        assert [p['title'] for p in data['changed']] == ['Gained']
+        assert data['removed'] == [lost.pk]
+
+    def test_stale_and_invalid_tokens(self, api_client, create_project):
+        from .changes import encode_token
+
+        project, owner = create_project()
+        api_client.force_authenticate(user=owner)
+
+        response = api_client.get(reverse('project-changes'), {'since': encode_token(timezone.now() - timedelta(days=31))})
+        assert response.status_code == status.HTTP_410_GONE
+        response = api_client.get(reverse('project-changes'), {'since': 'garbage'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_compaction_removes_old_tombstones(self, create_project):
+        from io import StringIO
+        from django.core.management import call_command
+
+        project, owner = create_project()
+        project_id = project.pk
+        project.delete()
+        for old_id in (1001, 1002):
+            ProjectTombstone.objects.create(user=owner, project_id=old_id)
+        ProjectTombstone.objects.filter(project_id__gt=1000).update(created_at=timezone.now() - timedelta(days=31))
+
+        call_command('compact_project_changes', '--batch-size', '1', stdout=StringIO())
+        assert list(ProjectTombstone.objects.values_list('project_id', flat=True)) == [project_id]
@@ -1,49 +1,244 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.models import User
 
+from core.renderers import FastJSONRenderer
+from core.throttling import IPRateThrottle, UserRateThrottle
+
 from .models import Project, ProjectUser, Comment
 from .serializers import ProjectSerializer, ProjectUserSerializer, CommentSerializer
 from .permissions import IsProjectOwner, IsProjectOwnerOrEditor, HasProjectAccess
+from .membership import get_project_roles
+from . import bulk, changes, representations, search
+from .fieldsets import ALL, FieldSelection
+from .coalescer import coalescer
+from .list_cache import project_list_cache
+from .pagination import SinceCursorPagination
+from .export import export_response
+from .conditional import (
+    conditional,
+    project_comments_validators,
+    project_detail_validators,
+    project_list_validators,
+    project_users_validators,
+)
+
+# add_comment and add_user share the project_write buckets
+WRITE_THROTTLES = [IPRateThrottle, UserRateThrottle]
+# For the long lists built by .representations, which have no floats
+FAST_RENDERERS = [FastJSONRenderer, BrowsableAPIRenderer]
 
 
 class ProjectViewSet(viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Maximum number of entries accepted by the bulk membership actions
+    bulk_limit = 1000
+    # Default and maximum number of search results
+    search_limit = 20
+    max_search_limit = 100
+    # Keyset orderings the project list accepts through ?ordering=
+    list_orderings = {
+        'created': ('created_at', 'id'),
+        'activity': ('-last_activity_at', '-id'),
+    }
+    # Read-only actions served from the read replica (see core.routers)
+    replica_actions = {'list', 'retrieve', 'users', 'comments'}
+    # Set per action (see core.throttling)
+    throttle_scope = None
+    # Read actions accepting ?fields= and ?expand=, and the serializer whose
+    # fields they select from (see .fieldsets)
+    field_selection_serializers = {
+        'list': ProjectSerializer,
+        'retrieve': ProjectSerializer,
+        'overview': ProjectSerializer,
+        'users': ProjectUserSerializer,
+        'comments': CommentSerializer,
+    }
+
+    @property
+    def pagination_ordering(self):
+        ordering = None
+        if self.action == 'list':
+            ordering = self.list_orderings.get(self.request.query_params.get('ordering'))
+        return ordering or self.pagination_class.ordering
 
     def get_queryset(self):
         # Return only projects the user has access to
-        user = self.request.user
-        return Project.objects.filter(projectuser__user=user).distinct()
+        queryset = Project.objects.for_member(self.request.user.pk)
+        if self.action in ['list', 'retrieve', 'update', 'partial_update', 'overview']:
+            if self.get_field_selection().includes('owner'):
+                queryset = queryset.with_owner()
+        return queryset
+
+    def get_field_selection(self):
+        if not hasattr(self, '_field_selection'):
+            serializer_class = self.field_selection_serializers.get(self.action)
+            if serializer_class is None:
+                self._field_selection = ALL
+            else:
+                available = list(serializer_class.Meta.fields)
+                if self.action == 'overview':
+                    available += ['users', 'comments']
+                self._field_selection = FieldSelection.from_query(
+                    self.request.query_params, available, serializer_class.expandable
+                )
+        return self._field_selection
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_field_selection()
+        return context
 
     def get_permissions(self):
         if self.action in ['update', 'partial_update']:
             self.permission_classes = [permissions.IsAuthenticated, IsProjectOwnerOrEditor]
         elif self.action in ['destroy']:
             self.permission_classes = [permissions.IsAuthenticated, IsProjectOwner]
-        elif self.action in ['retrieve']:
+        elif self.action in ['retrieve', 'overview', 'export']:
             self.permission_classes = [permissions.IsAuthenticated, HasProjectAccess]
         return super().get_permissions()
 
+    def get_renderers(self):
+        if self.action in ['list', 'changes']:
+            return [renderer() for renderer in FAST_RENDERERS]
+        return super().get_renderers()
+
+    def write(self, func, *args, **kwargs):
+        # Small writes go through the group-commit coalescer when enabled
+        if getattr(settings, 'PROJECT_WRITE_COALESCING', False):
+            return coalescer.submit(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+    @conditional(project_list_validators)
+    def list(self, request, *args, **kwargs):
+        url = request.build_absolute_uri()
+        roles = get_project_roles(request)
+        data, generation = project_list_cache.get(request.user.pk, url)
+        if data is not None:
+            return Response(data)
+        # Built from values() rows rather than through ProjectSerializer
+        selection = self.get_field_selection()
+        queryset = self.filter_queryset(Project.objects.for_member(request.user.pk))
+        columns = representations.project_columns(selection, self.pagination_ordering)
+        # The role map, read from the primary, also leaves out projects a
+        # lagging replica still lists the user in
+        rows = [row for row in self.paginate_queryset(queryset.values(*columns)) if row['id'] in roles]
+        owners = ()
+        if selection.includes('owner'):
+            owners = representations.owner_rows([row['id'] for row in rows], selection)
+        response = self.get_paginated_response(representations.projects(rows, owners, roles, selection))
+        project_list_cache.set(request.user.pk, generation, url, response.data)
+        return response
+
+    @conditional(project_detail_validators)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         # Create the project and assign the current user as owner
         project = serializer.save()
-        ProjectUser.objects.create(
+        owner_membership = ProjectUser.objects.create(
             project=project,
             user=self.request.user,
             role=ProjectUser.OWNER
         )
+        # Seed the owner cache so the response needs no extra lookup
+        project.owner_memberships = [owner_membership]
+
+    def get_members_queryset(self, project, selection=ALL):
+        queryset = ProjectUser.objects.filter(project=project)
+        if selection.expands('user_details'):
+            queryset = queryset.select_related('user')
+        return queryset
+
+    def get_comments_queryset(self, project):
+        return Comment.objects.filter(project=project).select_related('user')
+
+    def get_embedded_page(self, queryset, serializer_class, url_name, project, pagination_class=None):
+        # Paginate a related list embedded in another response, with `next`
+        # pointing at the list's own endpoint
+        paginator = (pagination_class or self.pagination_class)()
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        paginator.base_url = self.request.build_absolute_uri(reverse(url_name, args=[project.pk]))
+        # The selection applies to the project, not to its embedded lists
+        serializer = serializer_class(page, many=True, context={**self.get_serializer_context(), 'fields': None})
+        return paginator.get_paginated_response(serializer.data).data
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over the titles, descriptions and comments of the
+        caller's projects, best matches first.
+        """
+        q = request.query_params.get('q', '').strip()
+        if not q:
+            return Response({"detail": "The q parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if not search.is_available():
+            return Response({"detail": "Search is not available."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        try:
+            limit = min(int(request.query_params.get('limit', self.search_limit)), self.max_search_limit)
+        except ValueError:
+            limit = self.search_limit
+        results = search.search(request.user, q, max(limit, 1))
+        return Response({"results": results})
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        What changed in the caller's project list since ``?since=<token>``:
+        the projects added or updated (paged, follow ``next``), the ids of
+        those deleted or no longer shared, and the token for the next sync.
+        Without ``since``, every project. An expired token is a 410: sync
+        again without it.
+        """
+        return Response(changes.get_changes(request))
+
+    @action(detail=True, methods=['get'])
+    def overview(self, request, pk=None):
+        """
+        The project together with the first page of its members and comments,
+        so the detail view needs one round trip instead of three.
+        """
+        project = self.get_object()
+        selection = self.get_field_selection()
+        data = self.get_serializer(project).data
+        if selection.includes('users'):
+            data['users'] = self.get_embedded_page(
+                self.get_members_queryset(project), ProjectUserSerializer, 'project-users', project
+            )
+        if selection.includes('comments'):
+            data['comments'] = self.get_embedded_page(
+                self.get_comments_queryset(project), CommentSerializer, 'project-comments', project,
+                pagination_class=SinceCursorPagination,
+            )
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """
+        The project, its members and all of its comments as streamed NDJSON.
+        """
+        return export_response(request, self.get_object())
 
     @action(detail=True, methods=['get'])
+    @conditional(project_users_validators)
     def users(self, request, pk=None):
         project = self.get_object()
-        project_users = ProjectUser.objects.filter(project=project)
-        serializer = ProjectUserSerializer(project_users, many=True)
-        return Response(serializer.data)
+        selection = self.get_field_selection()
+        project_users = self.paginate_queryset(self.get_members_queryset(project, selection))
+        serializer = ProjectUserSerializer(project_users, many=True, context={'fields': selection})
+        return self.get_paginated_response(serializer.data)
 
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsProjectOwner])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsProjectOwner],
+            throttle_classes=WRITE_THROTTLES, throttle_scope='project_write')
     def add_user(self, request, pk=None):
         project = self.get_object()
         
@@ -52,17 +247,17 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if username:
             try:
                 user = User.objects.get(username=username)
-                # Check if user is already in the project
-                if ProjectUser.objects.filter(project=project, user=user).exists():
-                    return Response({"detail": "User is already in the project."}, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Create project user with the provided role
                 role = request.data.get('role', ProjectUser.READER)
-                project_user = ProjectUser.objects.create(
-                    project=project,
-                    user=user,
-                    role=role
-                )
+
+                def create():
+                    # Check if user is already in the project
+                    if ProjectUser.objects.filter(project=project, user=user).exists():
+                        return None
+                    return ProjectUser.objects.create(project=project, user=user, role=role)
+
+                project_user = self.write(create)
+                if project_user is None:
+                    return Response({"detail": "User is already in the project."}, status=status.HTTP_400_BAD_REQUEST)
                 serializer = ProjectUserSerializer(project_user)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             except User.DoesNotExist:
@@ -71,7 +266,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         # If username is not provided, fall back to the original behavior
         serializer = ProjectUserSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(project=project)
+            self.write(serializer.save, project=project)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -106,19 +301,56 @@ class ProjectViewSet(viewsets.ModelViewSet):
         serializer = ProjectUserSerializer(project_user)
         return Response(serializer.data)
 
-    @action(detail=True, methods=['get'])
+    def run_bulk(self, request, operation, default_role=None):
+        # Accepts either a bare list of users or {"users": [...], "role": ...};
+        # each user is a username, an id, or {"username"/"id": ..., "role": ...}
+        project = self.get_object()
+
+        if isinstance(request.data, list):
+            users = request.data
+        else:
+            users = request.data.get('users')
+            default_role = request.data.get('role', default_role)
+        if not isinstance(users, list) or not users:
+            return Response({"detail": "Expected a non-empty list of users."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(users) > self.bulk_limit:
+            return Response({"detail": f"At most {self.bulk_limit} users per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            entries = bulk.parse_entries(users, default_role)
+            results = operation(project, entries)
+        return Response({"results": results})
+
+    @action(detail=True, methods=['post'], url_path='bulk-add-users', permission_classes=[permissions.IsAuthenticated, IsProjectOwner])
+    def bulk_add_users(self, request, pk=None):
+        return self.run_bulk(request, bulk.add_members, default_role=ProjectUser.READER)
+
+    @action(detail=True, methods=['post'], url_path='bulk-update-roles', permission_classes=[permissions.IsAuthenticated, IsProjectOwner])
+    def bulk_update_roles(self, request, pk=None):
+        return self.run_bulk(request, bulk.update_roles)
+
+    @action(detail=True, methods=['post'], url_path='bulk-remove-users', permission_classes=[permissions.IsAuthenticated, IsProjectOwner])
+    def bulk_remove_users(self, request, pk=None):
+        return self.run_bulk(request, bulk.remove_members)
+
+    @action(detail=True, methods=['get'], renderer_classes=FAST_RENDERERS, pagination_class=SinceCursorPagination)
+    @conditional(project_comments_validators)
     def comments(self, request, pk=None):
+        # ?after=<cursor> returns only the comments past it (see SinceCursorPagination)
         project = self.get_object()
-        comments = Comment.objects.filter(project=project)
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        # Built from values() rows rather than through CommentSerializer
+        selection = self.get_field_selection()
+        columns = representations.comment_columns(selection, self.pagination_ordering)
+        rows = self.paginate_queryset(Comment.objects.filter(project=project).values(*columns))
+        return self.get_paginated_response(representations.comments(rows, selection))
 
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsProjectOwnerOrEditor])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsProjectOwnerOrEditor],
+            throttle_classes=WRITE_THROTTLES, throttle_scope='project_write')
     def add_comment(self, request, pk=None):
         project = self.get_object()
         serializer = CommentSerializer(data=request.data)
         
         if serializer.is_valid():
-            serializer.save(project=project, user=request.user)
+            self.write(serializer.save, project=project, user=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST) 
\ No newline at end of file
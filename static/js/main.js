@@ -3,6 +3,16 @@ let currentUser = null;
 let currentProject = null;
 let csrfToken = null;
 
+// Lazy loaders for paginated lists
+let projectsLoader = null;
+let commentsLoader = null;
+let membersLoader = null;
+// Position of the newest comment when the list was first loaded, then of
+// the newest one fetched since; only comments past it are fetched again
+let commentsAfter = null;
+// Live updates for the open project
+let projectEvents = null;
+
 // DOM elements
 const userInfoElement = document.getElementById('user-info');
 const loginBtn = document.getElementById('login-btn');
@@ -35,6 +45,14 @@ document.addEventListener('DOMContentLoaded', () => {
     document.getElementById('edit-project-btn').addEventListener('click', handleEditProject);
     document.getElementById('delete-project-btn').addEventListener('click', handleDeleteProject);
     
+    // Fetch further pages as the user scrolls
+    projectsLoader = createLazyLoader('projects-sentinel', renderProjects);
+    commentsLoader = createLazyLoader('comments-sentinel', renderComments);
+    membersLoader = createLazyLoader('project-users-sentinel', renderUserManagement);
+
+    // Stop listening for live updates once the project is closed
+    document.getElementById('projectDetailModal').addEventListener('hidden.bs.modal', unsubscribeFromProject);
+
     // New project button
     document.getElementById('new-project-btn').addEventListener('click', () => {
         // Reset form when opening the modal
@@ -194,6 +212,7 @@ async function handleLogout() {
             },
             credentials: 'same-origin'
         });
+        unsubscribeFromProject();
         setCurrentUser(null);
     } catch (error) {
         console.error('Error during logout:', error);
@@ -227,8 +246,9 @@ async function fetchProjects() {
             credentials: 'same-origin'
         });
         if (response.ok) {
-            const projects = await response.json();
-            renderProjects(projects);
+            const page = await response.json();
+            renderProjects(page.results);
+            projectsLoader.reset(page.next);
         } else {
             console.error('Failed to fetch projects:', response.status);
         }
@@ -237,10 +257,12 @@ async function fetchProjects() {
     }
 }
 
-function renderProjects(projects) {
-    projectsList.innerHTML = '';
+function renderProjects(projects, append = false) {
+    if (!append) {
+        projectsList.innerHTML = '';
+    }
     
-    if (projects.length === 0) {
+    if (!append && projects.length === 0) {
         projectsList.innerHTML = '<div class="col-12"><p>No projects found. Create a new project to get started.</p></div>';
         return;
     }
@@ -268,43 +290,35 @@ function renderProjects(projects) {
 }
 
 async function fetchProjectDetails(projectId) {
+    if (await loadProjectDetails(projectId)) {
+        // Show the modal
+        const projectDetailModal = new bootstrap.Modal(document.getElementById('projectDetailModal'));
+        projectDetailModal.show();
+    }
+}
+
+async function loadProjectDetails(projectId) {
     try {
-        const response = await fetch(`/api/projects/${projectId}/`, {
+        // One request returns the project with the first page of its users and comments
+        const response = await fetch(`/api/projects/${projectId}/overview/`, {
             credentials: 'same-origin'
         });
         if (response.ok) {
             const project = await response.json();
             currentProject = project;
             
-            // Fetch project users
-            const usersResponse = await fetch(`/api/projects/${projectId}/users/`, {
-                credentials: 'same-origin'
-            });
-            const projectUsers = await usersResponse.json();
-            
-            // Fetch comments
-            const commentsResponse = await fetch(`/api/projects/${projectId}/comments/`, {
-                credentials: 'same-origin'
-            });
-            const comments = await commentsResponse.json();
-            
-            renderProjectDetails(project, projectUsers, comments);
-            
-            // Show the modal
-            const projectDetailModal = new bootstrap.Modal(document.getElementById('projectDetailModal'));
-            projectDetailModal.show();
+            renderProjectDetails(project, project.users, project.comments);
+            subscribeToProject(project.id);
+            return true;
         }
     } catch (error) {
         console.error('Error fetching project details:', error);
     }
+    return false;
 }
 
-function renderProjectDetails(project, projectUsers, comments) {
+function renderProjectDetails(project, usersPage, commentsPage) {
     const detailContent = document.getElementById('project-detail-content');
-    const commentsList = document.getElementById('comments-list');
-    const addCommentForm = document.getElementById('add-comment-form-container');
-    const editBtn = document.getElementById('edit-project-btn');
-    const deleteBtn = document.getElementById('delete-project-btn');
     
     // Set modal title
     document.getElementById('projectDetailModalLabel').textContent = project.title;
@@ -323,28 +337,29 @@ function renderProjectDetails(project, projectUsers, comments) {
     `;
     
     // Render comments
-    commentsList.innerHTML = '';
-    if (comments.length === 0) {
-        commentsList.innerHTML = '<p>No comments yet.</p>';
-    } else {
-        comments.forEach(comment => {
-            const commentElement = document.createElement('div');
-            commentElement.className = 'card mb-2';
-            commentElement.innerHTML = `
-                <div class="card-body">
-                    <p class="card-text">${comment.text}</p>
-                    <div class="d-flex justify-content-between">
-                        <small>By: ${comment.user.username}</small>
-                        <small>${new Date(comment.created_at).toLocaleString()}</small>
-                    </div>
-                </div>
-            `;
-            commentsList.appendChild(commentElement);
-        });
-    }
+    renderComments(commentsPage.results);
+    commentsAfter = commentsPage.after;
+    commentsLoader.reset(commentsPage.next);
     
-    // Check user role for permissions
-    const currentUserRole = getUserRoleInProject(projectUsers);
+    applyRole(project.role);
+    
+    // Add event listener to manage users button
+    document.getElementById('manage-users-btn').addEventListener('click', () => {
+        if (currentProject.role === 'owner') {
+            renderUserManagement(usersPage.results);
+            membersLoader.reset(usersPage.next);
+            const userManagementModal = new bootstrap.Modal(document.getElementById('userManagementModal'));
+            userManagementModal.show();
+        } else {
+            alert('Only project owners can manage users.');
+        }
+    });
+}
+
+function applyRole(currentUserRole) {
+    const addCommentForm = document.getElementById('add-comment-form-container');
+    const editBtn = document.getElementById('edit-project-btn');
+    const deleteBtn = document.getElementById('delete-project-btn');
     
     // Set button visibility based on role
     if (currentUserRole === 'owner') {
@@ -360,33 +375,50 @@ function renderProjectDetails(project, projectUsers, comments) {
         deleteBtn.classList.add('d-none');
         addCommentForm.classList.add('d-none');
     }
-    
-    // Add event listener to manage users button
-    document.getElementById('manage-users-btn').addEventListener('click', () => {
-        if (currentUserRole === 'owner') {
-            renderUserManagement(projectUsers);
-            const userManagementModal = new bootstrap.Modal(document.getElementById('userManagementModal'));
-            userManagementModal.show();
-        } else {
-            alert('Only project owners can manage users.');
-        }
-    });
 }
 
-function getUserRoleInProject(projectUsers) {
-    if (!currentUser) return null;
+function renderComments(comments, append = false) {
+    const commentsList = document.getElementById('comments-list');
+    if (!append) {
+        commentsList.innerHTML = '';
+        if (comments.length === 0) {
+            commentsList.innerHTML = '<p class="no-comments">No comments yet.</p>';
+            return;
+        }
+    }
     
-    const userEntry = projectUsers.find(pu => pu.user === currentUser.id);
-    return userEntry ? userEntry.role : null;
+    comments.forEach(comment => {
+        // A comment can arrive both live and in a page
+        if (commentsList.querySelector(`[data-comment-id="${comment.id}"]`)) {
+            return;
+        }
+        commentsList.querySelector('.no-comments')?.remove();
+        const commentElement = document.createElement('div');
+        commentElement.className = 'card mb-2';
+        commentElement.dataset.commentId = comment.id;
+        commentElement.innerHTML = `
+            <div class="card-body">
+                <p class="card-text">${comment.text}</p>
+                <div class="d-flex justify-content-between">
+                    <small>By: ${comment.user.username}</small>
+                    <small>${new Date(comment.created_at).toLocaleString()}</small>
+                </div>
+            </div>
+        `;
+        commentsList.appendChild(commentElement);
+    });
 }
 
-function renderUserManagement(projectUsers) {
+function renderUserManagement(projectUsers, append = false) {
     const usersList = document.getElementById('project-users-list');
-    usersList.innerHTML = '';
+    if (!append) {
+        usersList.innerHTML = '';
+    }
     
     projectUsers.forEach(pu => {
         const userElement = document.createElement('div');
         userElement.className = 'd-flex justify-content-between align-items-center mb-2';
+        userElement.dataset.userId = pu.user;
         
         // Don't allow removing or changing the owner
         if (pu.role === 'owner') {
@@ -413,11 +445,20 @@ function renderUserManagement(projectUsers) {
             `;
         }
         
-        usersList.appendChild(userElement);
+        // Replace the row of a user that is already listed
+        const existing = usersList.querySelector(`:scope > [data-user-id="${pu.user}"]`);
+        if (existing) {
+            existing.replaceWith(userElement);
+        } else {
+            usersList.appendChild(userElement);
+        }
+        attachUserManagementListeners(userElement);
     });
-    
+}
+
+function attachUserManagementListeners(userElement) {
     // Add event listeners for role changes and user removal
-    document.querySelectorAll('.role-select').forEach(select => {
+    userElement.querySelectorAll('.role-select').forEach(select => {
         select.addEventListener('change', async (event) => {
             const userId = event.target.dataset.userId;
             const newRole = event.target.value;
@@ -441,7 +482,7 @@ function renderUserManagement(projectUsers) {
         });
     });
     
-    document.querySelectorAll('.remove-user').forEach(button => {
+    userElement.querySelectorAll('.remove-user').forEach(button => {
         button.addEventListener('click', async () => {
             const userId = button.dataset.userId;
             
@@ -597,7 +638,13 @@ async function handleCommentSubmit(event) {
         
         if (response.ok) {
             document.getElementById('comment-text').value = '';
-            fetchProjectDetails(currentProject.id);
+            // New comments sort last; show it now if the list is fully loaded,
+            // along with any that others added since
+            const comment = await response.json();
+            if (!commentsLoader.next) {
+                renderComments([comment], true);
+                await fetchNewComments();
+            }
         } else {
             alert('Failed to add comment. Please try again.');
         }
@@ -642,7 +689,143 @@ async function handleAddUser(event) {
     }
 }
 
+async function fetchNewComments() {
+    // Append the comments added since commentsAfter; renderComments skips
+    // those already shown. Only for a fully loaded list: pages still to be
+    // loaded will include them anyway.
+    if (!currentProject || commentsLoader.next) {
+        return;
+    }
+    const projectId = currentProject.id;
+    let url = `/api/projects/${projectId}/comments/`;
+    if (commentsAfter) {
+        url += `?after=${encodeURIComponent(commentsAfter)}`;
+    }
+    try {
+        while (url) {
+            const response = await fetch(url, {
+                credentials: 'same-origin'
+            });
+            // Stop if the project was closed or reloaded meanwhile
+            if (!response.ok || !currentProject || currentProject.id !== projectId || commentsLoader.next) {
+                return;
+            }
+            const page = await response.json();
+            commentsAfter = page.after || commentsAfter;
+            renderComments(page.results, true);
+            url = page.next;
+        }
+    } catch (error) {
+        console.error('Error fetching new comments:', error);
+    }
+}
+
 // Utility functions
+function subscribeToProject(projectId) {
+    // Apply comments and membership changes of the open project as they
+    // happen. The stream is only served through ASGI; elsewhere the
+    // EventSource fails once and stays closed.
+    unsubscribeFromProject();
+    if (!window.EventSource) {
+        return;
+    }
+    const source = new EventSource(`/api/projects/${projectId}/events/`);
+    projectEvents = source;
+    const handle = (type, apply) => source.addEventListener(type, (event) => {
+        if (projectEvents === source && currentProject && currentProject.id === projectId) {
+            apply(JSON.parse(event.data));
+        }
+    });
+    
+    handle('comment', (comment) => {
+        // Further pages will include it when they are loaded
+        if (!commentsLoader.next) {
+            renderComments([comment], true);
+        }
+    });
+    handle('member', (membership) => {
+        if (currentUser && membership.user === currentUser.id) {
+            currentProject.role = membership.role;
+            applyRole(membership.role);
+        }
+        const usersList = document.getElementById('project-users-list');
+        if (usersList.querySelector(`:scope > [data-user-id="${membership.user}"]`) || !membersLoader.next) {
+            renderUserManagement([membership], true);
+        }
+    });
+    handle('member_removed', ({ user }) => {
+        if (currentUser && user === currentUser.id) {
+            closeProjectDetails();
+            return;
+        }
+        document.querySelector(`#project-users-list > [data-user-id="${user}"]`)?.remove();
+    });
+    handle('project_deleted', () => closeProjectDetails());
+    handle('reset', () => {
+        // Missed events can no longer be replayed; reload and listen afresh
+        loadProjectDetails(projectId);
+    });
+}
+
+function unsubscribeFromProject() {
+    if (projectEvents) {
+        projectEvents.close();
+        projectEvents = null;
+    }
+}
+
+function closeProjectDetails() {
+    // The project was deleted or the user lost access to it
+    unsubscribeFromProject();
+    const modal = bootstrap.Modal.getInstance(document.getElementById('projectDetailModal'));
+    if (modal) {
+        modal.hide();
+    }
+    fetchProjects();
+}
+
+function createLazyLoader(sentinelId, renderPage) {
+    // Loads the next page of a cursor-paginated list whenever the sentinel
+    // element below the list scrolls into view.
+    const sentinel = document.getElementById(sentinelId);
+    const loader = { next: null, loading: false };
+    
+    const observer = new IntersectionObserver(async (entries) => {
+        if (!entries.some(entry => entry.isIntersecting) || loader.loading || !loader.next) {
+            return;
+        }
+        
+        const url = loader.next;
+        loader.loading = true;
+        try {
+            const response = await fetch(url, {
+                credentials: 'same-origin'
+            });
+            // Ignore pages that arrive after the list was reset
+            if (response.ok && loader.next === url) {
+                const page = await response.json();
+                loader.next = page.next;
+                renderPage(page.results, true);
+            }
+        } catch (error) {
+            console.error('Error loading more results:', error);
+        } finally {
+            loader.loading = false;
+            // Re-arm so a sentinel that is still visible loads the next page
+            observer.unobserve(sentinel);
+            observer.observe(sentinel);
+        }
+    }, { rootMargin: '200px' });
+    
+    observer.observe(sentinel);
+    loader.reset = (next) => {
+        loader.next = next;
+        observer.unobserve(sentinel);
+        observer.observe(sentinel);
+    };
+    return loader;
+}
+
 function getCookie(name) {
     let cookieValue = null;
     if (document.cookie && document.cookie !== '') {
@@ -0,0 +1,35 @@
+from rest_framework import authentication, exceptions
+
+from .tokens import authenticate_token
+
+KEYWORD = 'Token'
+
+
+def get_token(request):
+    """The token in ``Authorization: Token <token>``, or None."""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    keyword, _, token = header.partition(' ')
+    if keyword != KEYWORD:
+        return None
+    return token.strip()
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticate ``Authorization: Token <token>`` headers with the signed
+    tokens issued by LoginView (see users.tokens).
+    """
+
+    def authenticate(self, request):
+        token = get_token(request)
+        if token is None:
+            return None
+        if not token:
+            raise exceptions.AuthenticationFailed('Invalid token header. No credentials provided.')
+        user = authenticate_token(token)
+        if user is None:
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+        return (user, token)
+
+    def authenticate_header(self, request):
+        return KEYWORD
@@ -1,5 +1,30 @@
 from django.db import models
 from django.contrib.auth.models import User
 
-# We'll use Django's built-in User model for authentication
-# No additional models needed for the users app 
\ No newline at end of file
+# We use Django's built-in User model for authentication
+
+
+class UserTokenVersion(models.Model):
+    """
+    Version embedded in a user's API tokens (see users.tokens). Bumping it
+    revokes every token issued before. Users without a row are at version 0.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='token_version')
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username} (v{self.version})"
+
+
+class UserStamp(models.Model):
+    """
+    When a user's details (name, email, ...) last changed. The conditional
+    GET validators of responses that embed users read it (see
+    projects.conditional). Users without a row have not changed since they
+    were created.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stamp')
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user.username} ({self.updated_at})"
@@ -0,0 +1,44 @@
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import UserStamp
+from .tokens import invalidate_user, revoke_tokens
+
+# Logging in only updates last_login
+LOGIN_FIELDS = frozenset({'last_login'})
+
+
+@receiver(pre_save, sender=User)
+def check_password_change(sender, instance, update_fields=None, **kwargs):
+    instance._password_changed = False
+    if instance._state.adding or (update_fields is not None and 'password' not in update_fields):
+        return
+    stored = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=instance.pk).values_list('password', flat=True).first()
+    instance._password_changed = stored is not None and stored != instance.password
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_password_change(sender, instance, **kwargs):
+    # Tokens issued under the old password must not outlive it
+    if getattr(instance, '_password_changed', False):
+        instance._password_changed = False
+        revoke_tokens(instance)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_token_cache(sender, instance, update_fields=None, **kwargs):
+    # Cached tokens hold the user; reload it after any change (is_active, ...)
+    if update_fields == LOGIN_FIELDS:
+        return
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def stamp_user(sender, instance, created, update_fields=None, **kwargs):
+    # No response shows last_login
+    if created or update_fields == LOGIN_FIELDS:
+        return
+    UserStamp.objects.update_or_create(user_id=instance.pk, defaults={'updated_at': timezone.now()})
@@ -1,9 +1,22 @@
+import time
+
 import pytest
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.throttling import anonymous_buckets, buckets
+
+
+@pytest.fixture(autouse=True)
+def clear_throttle_buckets():
+    buckets.clear()
+    anonymous_buckets.clear()
+    yield
+    buckets.clear()
+    anonymous_buckets.clear()
+
 
 @pytest.fixture
 def api_client():
@@ -129,4 +142,195 @@ class TestUserDetail:
         url = reverse('user-detail')
         response = api_client.get(url)
         
-        assert response.status_code == status.HTTP_403_FORBIDDEN 
\ No newline at end of file
+        assert response.status_code == status.HTTP_403_FORBIDDEN 
+
+@pytest.mark.django_db
+class TestUserList:
+    def test_list_users(self, api_client, create_user):
+        user = create_user()
+        create_user(username='other', email='other@example.com')
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(reverse('user-list'))
+        assert response.status_code == status.HTTP_200_OK
+        assert [u['username'] for u in response.data['results']] == ['testuser', 'other']
+
+        response = api_client.get(reverse('user-list'), {'username': 'other'})
+        assert [u['username'] for u in response.data['results']] == ['other']
+
+
+@pytest.mark.django_db
+class TestTokenAuthentication:
+    @pytest.fixture(autouse=True)
+    def clear_token_cache(self):
+        from users.tokens import token_cache
+        token_cache.clear()
+        yield
+        token_cache.clear()
+
+    def login(self, api_client):
+        response = api_client.post(reverse('login'), {'username': 'testuser', 'password': 'testpassword123'},
+                                   format='json')
+        assert response.status_code == status.HTTP_200_OK
+        return response.data['token']
+
+    def test_login_issues_a_token(self, api_client, create_user, django_assert_num_queries):
+        user = create_user()
+        token = self.login(api_client)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        response = client.get(reverse('user-detail'))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['username'] == user.username
+
+        # Verified once, then served from the cache
+        with django_assert_num_queries(0):
+            assert client.get(reverse('user-detail')).status_code == status.HTTP_200_OK
+
+    def test_rejects_forged_and_expired_tokens(self, api_client, create_user, settings):
+        create_user()
+        token = self.login(api_client)
+        rest = token.split(':', 1)[1]
+        other = create_user(username='other', email='other@example.com')
+
+        client = APIClient()
+        for bad in (token[:-1], f'{other.pk}:{rest}', ''):
+            client.credentials(HTTP_AUTHORIZATION=f'Token {bad}')
+            assert client.get(reverse('user-detail')).status_code == status.HTTP_403_FORBIDDEN
+
+        settings.AUTH_TOKEN_TTL = -1
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.login(api_client)}')
+        assert client.get(reverse('user-detail')).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_logout_revokes_tokens(self, api_client, create_user):
+        create_user()
+        token = self.login(api_client)
+        other_token = self.login(APIClient())
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        assert client.get(reverse('user-detail')).status_code == status.HTTP_200_OK
+        assert client.post(reverse('logout')).status_code == status.HTTP_200_OK
+
+        for revoked in (token, other_token):
+            client.credentials(HTTP_AUTHORIZATION=f'Token {revoked}')
+            assert client.get(reverse('user-detail')).status_code == status.HTTP_403_FORBIDDEN
+        assert self.login(api_client) != token
+
+    def test_password_change_revokes_tokens(self, api_client, create_user):
+        user = create_user()
+        token = self.login(api_client)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        assert client.get(reverse('user-detail')).status_code == status.HTTP_200_OK
+
+        # Other saves keep the tokens valid
+        user.first_name = 'Renamed'
+        user.save()
+        assert client.get(reverse('user-detail')).status_code == status.HTTP_200_OK
+
+        user.set_password('newpassword456')
+        user.save()
+        assert client.get(reverse('user-detail')).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_invalidating_a_user_keeps_other_users_cached(self):
+        from types import SimpleNamespace
+
+        from users.tokens import token_cache
+
+        for token, user_id in (('a1', 1), ('a2', 1), ('b1', 2)):
+            token_cache.set(token, SimpleNamespace(pk=user_id), time.time() + 60, token_cache.generation())
+        token_cache.invalidate_user(1)
+        assert token_cache.get('a1') is None and token_cache.get('a2') is None
+        assert token_cache.get('b1').pk == 2
+        assert token_cache._tokens_by_user == {2: {'b1'}}
+
+    def test_deactivated_user_is_rejected(self, api_client, create_user):
+        user = create_user()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.login(api_client)}')
+        assert client.get(reverse('user-detail')).status_code == status.HTTP_200_OK
+
+        user.is_active = False
+        user.save()
+        assert client.get(reverse('user-detail')).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_asgi_accepts_tokens(self, api_client, create_user):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+
+        create_user()
+        token = self.login(api_client)
+
+        async def get(authorization):
+            return await AsyncClient().get(reverse('user-detail'), headers={'Authorization': authorization})
+
+        response = async_to_sync(get)(f'Token {token}')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['username'] == 'testuser'
+        assert async_to_sync(get)(f'Token {token}x').status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestLoginThrottling:
+    def login(self, client, username, address='10.0.0.1'):
+        return client.post(reverse('login'), {'username': username, 'password': 'wrong'}, format='json',
+                           REMOTE_ADDR=address)
+
+    def test_attempts_are_throttled_per_address_and_username(self, api_client, create_user, settings):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'login_user': '2/min'}}
+        create_user()
+
+        assert self.login(api_client, 'testuser').status_code == status.HTTP_400_BAD_REQUEST
+        assert self.login(api_client, 'testuser').status_code == status.HTTP_400_BAD_REQUEST
+        response = self.login(api_client, 'testuser')
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert 0 < int(response['Retry-After']) <= 30
+        assert self.login(api_client, 'someone-else').status_code == status.HTTP_400_BAD_REQUEST
+        assert self.login(api_client, 'testuser', '10.0.0.2').status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_username_flood_does_not_evict_other_buckets(self, api_client, create_user, settings, monkeypatch):
+        from core import throttling
+
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'login_user': '1/min'}}
+        monkeypatch.setattr(throttling, 'buckets', throttling.MemoryBuckets(maxsize=10))
+        monkeypatch.setattr(throttling, 'anonymous_buckets', throttling.MemoryBuckets(maxsize=10))
+        throttling.buckets.take('victim', 1, 1 / 60, 0)
+
+        for i in range(20):
+            self.login(api_client, f'flood{i}', '10.0.0.66')
+        # The victim's bucket is still empty
+        assert throttling.buckets.take('victim', 1, 1 / 60, 0) == (False, 0)
+
+    def test_memory_buckets_drop_the_least_recently_used(self):
+        from core.throttling import MemoryBuckets
+
+        store = MemoryBuckets(maxsize=2)
+        store.take('a', 1, 0, 0)
+        store.take('b', 1, 0, 0)
+        store.take('a', 1, 0, 0)
+        store.take('c', 1, 0, 0)
+        # 'b' was used least recently; 'a' keeps its empty bucket
+        assert store.take('a', 1, 0, 0) == (False, 0)
+        assert store.take('b', 1, 0, 0) == (True, 0)
+
+    def test_memory_buckets_admit_exactly_the_burst_across_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from core.throttling import MemoryBuckets
+
+        store = MemoryBuckets(maxsize=10)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: store.take('key', 100, 0, 0)[0], range(1000)))
+        assert results.count(True) == 100
+
+    def test_attempts_are_throttled_per_address(self, api_client, settings):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'login_ip': '3/hour'}}
+
+        for i in range(3):
+            assert self.login(api_client, f'user{i}').status_code == status.HTTP_400_BAD_REQUEST
+        response = self.login(api_client, 'user3')
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert 0 < int(response['Retry-After']) <= 1200
+        assert self.login(api_client, 'user3', '10.0.0.9').status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,168 @@
+"""
+Stateless API tokens.
+
+A token is ``<user id>:<version>:<expiry>`` signed with an HMAC of
+``SECRET_KEY`` (``django.core.signing``), so checking one needs no token
+table. ``version`` is the user's UserTokenVersion: bumping it on logout or
+on a password change revokes every token issued before.
+
+Verified tokens are kept in a small per-process cache, so most requests
+authenticate without a query. Entries are dropped when the user logs out or
+is saved in this process; ``AUTH_TOKEN_CACHE_TTL`` bounds how long another
+process can still accept a revoked token.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+from .models import UserTokenVersion
+
+_signer = signing.Signer(salt='users.tokens')
+
+
+class TokenCache:
+    """
+    Bounded, thread-safe LRU cache of ``{token: (user, expires_at)}``.
+
+    ``expires_at`` is the sooner of the token's expiry and the cache TTL.
+    The tokens are also indexed by user id, so invalidating a user does not
+    scan the cache.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tokens_by_user = {}
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a verification that raced with a
+        # revocation does not store what it read before it.
+        self._invalidations = 0
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.time():
+                self._remove(token)
+                return None
+            self._entries.move_to_end(token)
+        # Views may change request.user; never hand out the cached instance
+        return copy.copy(user)
+
+    def set(self, token, user, expires, generation):
+        with self._lock:
+            if generation != self._invalidations:
+                return
+            self._entries[token] = (user, min(expires, time.time() + self.ttl))
+            self._entries.move_to_end(token)
+            self._tokens_by_user.setdefault(user.pk, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def generation(self):
+        return self._invalidations
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._invalidations += 1
+            for token in self._tokens_by_user.pop(user_id, ()):
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _remove(self, token):
+        user, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user[user.pk]
+        tokens.discard(token)
+        if not tokens:
+            del self._tokens_by_user[user.pk]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    maxsize=getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60),
+)
+
+
+def issue_token(user):
+    """Return a new token for ``user`` and its expiry as a Unix timestamp."""
+    version = UserTokenVersion.objects.using(DEFAULT_DB_ALIAS).filter(user=user).values_list(
+        'version', flat=True
+    ).first() or 0
+    expires = int(time.time()) + getattr(settings, 'AUTH_TOKEN_TTL', 60 * 60 * 24 * 14)
+    return _signer.sign(f'{user.pk}:{version}:{expires}'), expires
+
+
+def revoke_tokens(user):
+    """Revoke every token issued to ``user`` so far."""
+    UserTokenVersion.objects.get_or_create(user=user)
+    UserTokenVersion.objects.filter(user=user).update(version=F('version') + 1)
+    invalidate_user(user.pk)
+
+
+def invalidate_user(user_id):
+    token_cache.invalidate_user(user_id)
+    # Again on commit, so a request that verified a token while the
+    # transaction was open cannot leave it cached.
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
+
+
+def _unsign(token):
+    # (user_id, version, expires), or None if the token is forged or malformed
+    try:
+        user_id, version, expires = _signer.unsign(token).split(':')
+        return int(user_id), int(version), int(expires)
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def cached_user(token):
+    """The user of an already verified ``token``, without touching the database."""
+    return token_cache.get(token)
+
+
+def authenticate_token(token):
+    """
+    Return the active user ``token`` was issued to, or None if it is forged,
+    expired or revoked.
+    """
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    claims = _unsign(token)
+    if claims is None:
+        return None
+    user_id, version, expires = claims
+    if expires < time.time():
+        return None
+
+    generation = token_cache.generation()
+    # From the primary: a lagging replica could still hold the version a
+    # logout bumped, and the cache would keep accepting the token
+    users = User.objects.using(DEFAULT_DB_ALIAS).select_related('token_version')
+    user = users.filter(pk=user_id, is_active=True).first()
+    if user is None:
+        return None
+    current = user.token_version.version if hasattr(user, 'token_version') else 0
+    if version != current:
+        return None
+    token_cache.set(token, user, expires, generation)
+    return copy.copy(user)
@@ -6,17 +6,25 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import authenticate
 
+from core.throttling import IPRateThrottle, UserRateThrottle
+
 from .serializers import UserSerializer, RegisterSerializer
+from .tokens import issue_token, revoke_tokens
 
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [permissions.AllowAny]
     serializer_class = RegisterSerializer
+    throttle_classes = [IPRateThrottle]
+    throttle_scope = 'register'
 
 
 class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
+    # Every attempt costs a full password hash
+    throttle_classes = [IPRateThrottle, UserRateThrottle]
+    throttle_scope = 'login'
 
     def post(self, request):
         username = request.data.get('username')
@@ -26,13 +34,16 @@ class LoginView(APIView):
         
         if user:
             login(request, user)
+            token, expires = issue_token(user)
             serializer = UserSerializer(user)
-            return Response(serializer.data)
+            return Response({**serializer.data, 'token': token, 'token_expires': expires})
         return Response({"error": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class LogoutView(APIView):
     def post(self, request):
+        # Revokes every token of the user, not only the one in use
+        revoke_tokens(request.user)
         logout(request)
         return Response({"detail": "Successfully logged out."})
 
@@ -52,6 +63,10 @@ class UserListView(generics.ListAPIView):
     """
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Users have no created_at, the default keyset pagination key
+    pagination_ordering = ('id',)
+    # Served from the read replica (see core.routers)
+    replica_actions = {'get'}
 
     def get_queryset(self):
         queryset = User.objects.all()